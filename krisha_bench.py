@@ -0,0 +1,230 @@
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Callable, Tuple
+
+
+# офлайн-бенчмарк парсинга на сохранённых страницах
+# корпус: bench_corpus/ (обезличенные страницы объявлений и поиска + texts.json)
+# запуск: python krisha_bench.py            - сравнить с baseline.json
+#         python krisha_bench.py --save     - записать новый baseline
+#         python krisha_bench.py --imports  - только время старта
+
+ROOT_DIR = Path(__file__).resolve().parent
+CORPUS_DIR = ROOT_DIR / 'bench_corpus'
+BASELINE_PATH = CORPUS_DIR / 'baseline.json'
+
+# замедление больше чем на 20% считается регрессией
+REGRESSION_TOLERANCE = 0.20
+
+# сколько секунд крутить каждый замер
+MIN_SECONDS = 2.0
+
+# время старта (python -X importtime) модулей, которые импортируют ради функций разбора
+# браузерный стек, pandas, pyarrow и bs4 им при импорте не нужны: загрузка любого из них - регрессия
+IMPORT_ENTRY_POINTS = ['krisha_extract', 'krisha_parser', 'krisha_parser_phone', 'krisha_reparse']
+HEAVY_MODULES = ['selenium', 'webdriver_manager', 'selenium_stealth', 'pandas', 'pyarrow', 'bs4']
+IMPORT_RUNS = 5  # берётся лучший запуск
+IMPORT_SLACK_MS = 15.0  # к допуску: шум старта интерпретатора сравним с самим замером
+
+IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> Dict:
+    """страницы и тексты корпуса"""
+    listings = []
+    for path in sorted(corpus_dir.glob('listing_*.html')):
+        listing_id = re.search(r'(\d+)', path.stem).group(1)
+        listings.append((f'https://krisha.kz/a/show/{listing_id}', path.read_text(encoding='utf-8')))
+
+    searches = [path.read_bytes() for path in sorted(corpus_dir.glob('search_*.html'))]
+    texts = json.loads((corpus_dir / 'texts.json').read_text(encoding='utf-8'))
+    return {
+        'listings': listings,
+        'searches': searches,
+        'descriptions': texts['descriptions'],
+        'addresses': texts['addresses'],
+    }
+
+
+# записей в пачке для замера памяти RowBuffer (listing_batch)
+BATCH_ROWS = 500
+
+
+def build_batches(corpus: Dict) -> List[List[Dict]]:
+    """пачка словарей записей корпуса; строки копируются, как будто каждая запись разобрана заново"""
+    import krisha_extract
+
+    records = [krisha_extract.extract_listing(html, url, 'Алматы').to_dict() for url, html in corpus['listings']]
+    batch = []
+    for i in range(BATCH_ROWS):
+        record = records[i % len(records)]
+        batch.append({key: value.encode().decode() if isinstance(value, str) else value for key, value in record.items()})
+    return [batch]
+
+
+def fill_row_buffer(batch: List[Dict]):
+    """пачка записей в RowBuffer через Listing - как в ListingSink и krisha_reparse"""
+    from krisha_io import RowBuffer, Listing
+
+    buffer = RowBuffer(Listing.FIELDS)
+    for data in batch:
+        buffer.append(Listing.from_dict(data))
+    return buffer
+
+
+def build_benchmarks(corpus: Dict) -> Dict[str, Tuple[Callable, List]]:
+    """имя -> (функция одного элемента, элементы корпуса)
+    страничные замеры включают построение дерева - так страницы и обрабатываются
+    listing_batch - накладные расходы пачки из BATCH_ROWS записей сверх самих строк (тексты уже в памяти)
+    """
+    import krisha_extract
+    from krisha_search import scan_search_page
+
+    return {
+        # общее ядро обоих парсеров: HTML -> запись LISTING_SCHEMA
+        'extract_listing': (
+            lambda item: krisha_extract.extract_listing(item[1], item[0], 'Алматы'),
+            corpus['listings'],
+        ),
+        'scan_search_page': (scan_search_page, corpus['searches']),
+        'clean_description': (krisha_extract.clean_description, corpus['descriptions']),
+        # мимо lru_cache: корпус повторяется на каждом проходе, с кэшем мерились бы попадания в него
+        'district_slug': (krisha_extract.DISTRICT_RESOLVER._resolve, corpus['addresses']),
+        'listing_batch': (fill_row_buffer, build_batches(corpus)),
+    }
+
+
+def measure(func: Callable, items: List, min_seconds: float = MIN_SECONDS) -> Dict:
+    """элементов в секунду и пиковая память одного прохода по корпусу"""
+    # ленивые импорты (bs4 в make_soup и т.п.) - до замера памяти
+    func(items[0])
+    # прогрев + память
+    tracemalloc.start()
+    for item in items:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    done = 0
+    start = time.perf_counter()
+    while True:
+        for item in items:
+            func(item)
+        done += len(items)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+
+    return {'per_sec': round(done / elapsed, 1), 'peak_kb': round(peak / 1024, 1)}
+
+
+def run(only: List[str] = None, min_seconds: float = MIN_SECONDS) -> Dict[str, Dict]:
+    corpus = load_corpus()
+    results = {}
+    for name, (func, items) in build_benchmarks(corpus).items():
+        if only and name not in only:
+            continue
+        results[name] = measure(func, items, min_seconds)
+        print(f"{name:24} {results[name]['per_sec']:10.1f} /сек  пик {results[name]['peak_kb']:9.1f} КБ")
+    return results
+
+
+def measure_import(module: str, runs: int = IMPORT_RUNS) -> Dict:
+    """время импорта модуля в мс (накопленное, по -X importtime) и тяжёлые модули, которые он загрузил
+    каждый запуск - новый интерпретатор, иначе модули уже в кэше
+    """
+    best = None
+    heavy = set()
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                              cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        cumulative = {}
+        for line in proc.stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match:
+                cumulative[match.group(4)] = int(match.group(2))
+        best = min(best, cumulative[module]) if best is not None else cumulative[module]
+        heavy.update(name for name in HEAVY_MODULES if name in cumulative)
+    return {'ms': round(best / 1000, 1), 'heavy': sorted(heavy)}
+
+
+def run_imports(modules: List[str] = IMPORT_ENTRY_POINTS) -> Dict[str, Dict]:
+    results = {}
+    for module in modules:
+        results[module] = measure_import(module)
+        heavy = ', '.join(results[module]['heavy']) or '-'
+        print(f"import {module:20} {results[module]['ms']:8.1f} мс  тяжёлые: {heavy}")
+    return results
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> List[str]:
+    """замеры, ставшие медленнее или прожорливее baseline больше допустимого"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        ratio = result['per_sec'] / expected['per_sec']
+        if ratio < 1 - REGRESSION_TOLERANCE:
+            regressions.append(f"{name}: {result['per_sec']} /сек против {expected['per_sec']} ({ratio:.0%})")
+        if result['peak_kb'] > expected['peak_kb'] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{name}: пик {result['peak_kb']} КБ против {expected['peak_kb']} КБ")
+    return regressions
+
+
+def find_import_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> List[str]:
+    """модули, которые стали грузить тяжёлые зависимости или импортироваться заметно дольше"""
+    regressions = []
+    for module, result in results.items():
+        if result['heavy']:
+            regressions.append(f"import {module}: загружает {', '.join(result['heavy'])}")
+        expected = baseline.get(module)
+        if expected and result['ms'] > expected['ms'] * (1 + REGRESSION_TOLERANCE) + IMPORT_SLACK_MS:
+            regressions.append(f"import {module}: {result['ms']} мс против {expected['ms']} мс")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="бенчмарк парсинга krisha")
+    parser.add_argument("--save", action="store_true", help="сохранить результат как baseline")
+    parser.add_argument("--only", nargs='+', help="только указанные замеры")
+    parser.add_argument("--seconds", type=float, default=MIN_SECONDS, help="длительность каждого замера")
+    parser.add_argument("--imports", action="store_true", help="только время старта модулей")
+    args = parser.parse_args()
+
+    results = {} if args.imports else run(args.only, args.seconds)
+    imports = run_imports() if args.imports or not args.only else {}
+
+    if args.save:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baseline.update(results)
+        if imports:
+            baseline.setdefault('imports', {}).update(imports)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f"baseline сохранён: {BASELINE_PATH}")
+        return 0
+
+    if not BASELINE_PATH.exists():
+        print("baseline нет, сохраните его: python krisha_bench.py --save")
+        return 0
+
+    baseline = json.loads(BASELINE_PATH.read_text())
+    regressions = find_regressions(results, baseline)
+    regressions += find_import_regressions(imports, baseline.get('imports', {}))
+    if regressions:
+        print("\nрегрессии:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nрегрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+from typing import Any, Callable
+
+
+# пакетные версии разборщиков krisha_extract: колонка строк -> типизированные колонки
+# нужны для пересчёта производных полей по архиву целиком (миллионы строк) без цикла по записям
+# вход - pyarrow Array/ChunkedArray или pandas Series; выход того же вида:
+# Arrow -> pyarrow.Table / Array, pandas -> DataFrame / Series с nullable-типами (Int32, Float64, string)
+# результат совпадает с построчными функциями; пустое значение (null/NaN) даёт None во всех полях
+#
+# регулярки выполняет RE2 (pyarrow.compute.extract_regex), а не re, поэтому классы переписаны явно:
+# \d у re - любая цифра Юникода (Nd), \s - всё, для чего str.isspace(); у RE2 оба только ASCII
+# pyarrow и pandas импортируются при первом вызове, krisha_extract о них не знает
+
+DIGIT = r'\p{Nd}'  # набор цифр зависит от версии Юникода у Python и RE2, расходятся только новые письменности
+SPACE = r'\t-\r\x1c-\x1f\x85\p{Z}'  # str.isspace(): ASCII-пробелы, разделители 0x1c-0x1f, NEL и категория Z
+
+# те же паттерны, что в krisha_extract.parse_title / extract_district_clean / extract_microdistrict
+ROOMS_RE = rf'(?P<rooms>{DIGIT}+)[- ]комнат'
+AREA_RE = rf'(?P<area_total>{DIGIT}+(?:[.,]{DIGIT}+)?)[{SPACE}]*м²'
+FLOOR_RE = rf'(?P<floor>{DIGIT}+)[/из{SPACE}]+(?P<floors_total>{DIGIT}+)[{SPACE}]*(?:этаж|эт)'
+DISTRICT_BEFORE_RE = rf'(?P<district>[А-Яа-яЁё]+(?:ий|ый|ой|ы|а)?)[{SPACE}]*р-н'
+DISTRICT_AFTER_RE = rf'р-н[{SPACE}]+(?P<district>[А-Яа-яЁё]+)'
+MICRODISTRICT_RE = rf'(?i)мкр\.?[{SPACE}]*(?P<microdistrict>[А-Яа-яЁё0-9\-]+)'
+NOT_DIGITS_RE = rf'[^{DIGIT}]+'
+
+# типы колонок - как в LISTING_SCHEMA (krisha_io)
+TITLE_TYPES = {'rooms': 'int32', 'area_total': 'float64', 'floor': 'int32', 'floors_total': 'int32'}
+
+PANDAS_DTYPES = {'int32': 'Int32', 'int64': 'Int64', 'float64': 'Float64', 'string': 'string'}
+
+# целое вне диапазона типа колонки (20-значная "цена") - null, а не ошибка всей колонки
+# (построчные parse_price / parse_title вернут такое число, но в int32 / int64 оно не помещается)
+INT_RANGES = {'int32': (-2**31, 2**31 - 1), 'int64': (-2**63, 2**63 - 1)}
+
+
+def _is_pandas(column: Any) -> bool:
+    return type(column).__module__.partition('.')[0] == 'pandas'
+
+
+def _to_arrow(column: Any):
+    """pandas Series / список / Arrow -> Arrow-колонка строк (NaN -> null)"""
+    import pyarrow as pa
+
+    if isinstance(column, (pa.Array, pa.ChunkedArray)):
+        array = column
+    else:
+        array = pa.array(column, from_pandas=True)
+    if pa.types.is_null(array.type):
+        array = array.cast(pa.string())
+    return array
+
+
+def _to_pandas(array, kind: str, like):
+    return array.to_pandas().astype(PANDAS_DTYPES[kind]).set_axis(like.index)
+
+
+def _extract(array, pattern: str, name: str):
+    """группа name первого совпадения, null - если совпадения нет"""
+    import pyarrow.compute as pc
+    return pc.struct_field(pc.extract_regex(array, pattern), name)
+
+
+def _numbers(strings, kind: str, convert: Callable):
+    """строки цифр -> числа
+    Arrow понимает только ASCII-цифры; другие цифры Юникода (их принимают int() и float())
+    встречаются редко, такие колонки переводятся построчно - как и колонки с числом вне диапазона типа
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    target = {'int32': pa.int32(), 'int64': pa.int64(), 'float64': pa.float64()}[kind]
+    if pc.all(pc.string_is_ascii(strings)).as_py() is not False:
+        try:
+            return pc.cast(strings, target)
+        except pa.ArrowInvalid:
+            pass  # переполнение
+    return pa.array([_number(value, kind, convert) for value in strings.to_pylist()], type=target)
+
+
+def _number(value, kind: str, convert: Callable):
+    if value is None:
+        return None
+    number = convert(value)
+    if kind in INT_RANGES:
+        low, high = INT_RANGES[kind]
+        if not low <= number <= high:
+            return None
+    return number
+
+
+def _strings(array):
+    import pyarrow as pa
+    return array.cast(pa.string())
+
+
+def parse_title_batch(titles: Any):
+    """parse_title по колонке: rooms, area_total, floor, floors_total"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    array = _to_arrow(titles)
+    columns = {
+        'rooms': _numbers(_extract(array, ROOMS_RE, 'rooms'), 'int32', int),
+        'area_total': _numbers(pc.replace_substring(_extract(array, AREA_RE, 'area_total'), ',', '.'), 'float64', float),
+    }
+    floors = pc.extract_regex(array, FLOOR_RE)
+    columns['floor'] = _numbers(pc.struct_field(floors, 'floor'), 'int32', int)
+    columns['floors_total'] = _numbers(pc.struct_field(floors, 'floors_total'), 'int32', int)
+
+    if _is_pandas(titles):
+        import pandas as pd
+        return pd.DataFrame({name: _to_pandas(column, TITLE_TYPES[name], titles) for name, column in columns.items()},
+                            index=titles.index)
+    return pa.table(columns)
+
+
+def parse_price_batch(prices: Any):
+    """parse_price по колонке: '54 999 000〒' -> 54999000 (int64)"""
+    import pyarrow.compute as pc
+
+    array = _to_arrow(prices)
+    digits = pc.replace_substring_regex(array, NOT_DIGITS_RE, '')
+    # без цифр (и пустая строка) - None
+    digits = pc.if_else(pc.equal(pc.utf8_length(digits), 0), None, digits)
+    result = _numbers(digits, 'int64', int)
+    return _to_pandas(result, 'int64', prices).rename(prices.name) if _is_pandas(prices) else result
+
+
+def extract_district_clean_batch(addresses: Any):
+    """extract_district_clean по колонке: сначала формат "Алматы р-н", потом "р-н Байконур"
+    """
+    import pyarrow.compute as pc
+
+    array = _to_arrow(addresses)
+    result = _strings(pc.coalesce(_extract(array, DISTRICT_BEFORE_RE, 'district'),
+                                  _extract(array, DISTRICT_AFTER_RE, 'district')))
+    return _to_pandas(result, 'string', addresses).rename(addresses.name) if _is_pandas(addresses) else result
+
+
+def extract_microdistrict_batch(texts: Any):
+    """extract_microdistrict по колонке (в krisha_reparse текст - title_raw + ' ' + address)"""
+    array = _to_arrow(texts)
+    result = _strings(_extract(array, MICRODISTRICT_RE, 'microdistrict'))
+    return _to_pandas(result, 'string', texts).rename(texts.name) if _is_pandas(texts) else result
+
@@ -0,0 +1,124 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+
+# сопоставление названий районов для обоих парсеров
+# таблицы строятся один раз при импорте, поиск - словарём вместо циклов по алиасам
+
+# ё и казахские буквы сводим к русским: "Сарайшық" == "Сарайшык"
+FOLD = str.maketrans('ёәғқңөұүһі', 'еагкноуухи')
+
+
+def normalize(text: str) -> str:
+    """нижний регистр + ё→е + казахские буквы→русские"""
+    return text.lower().translate(FOLD)
+
+
+class DistrictResolver:
+    """алиасы районов -> порядковые номера районов
+    хранит все подстроки всех алиасов, поэтому "токен входит в алиас"
+    и "алиас входит в токен" решаются поиском в словаре
+    """
+
+    def __init__(self, districts: Dict[str, Iterable[str]]):
+        self.keys = list(districts)
+        self._aliases = {}     # алиас -> номера районов
+        self._substrings = {}  # подстрока алиаса -> номера районов
+        for order, aliases in enumerate(districts.values()):
+            for alias in aliases:
+                alias = normalize(alias)
+                self._add(self._aliases, alias, order)
+                for i in range(len(alias)):
+                    for j in range(i + 1, len(alias) + 1):
+                        self._add(self._substrings, alias[i:j], order)
+        self._freeze(self._aliases)
+        self._freeze(self._substrings)
+
+    @staticmethod
+    def _add(index: Dict, key: str, order: int):
+        orders = index.setdefault(key, [])
+        if not orders or orders[-1] != order:
+            orders.append(order)
+
+    @staticmethod
+    def _freeze(index: Dict):
+        for key, orders in index.items():
+            index[key] = tuple(orders)
+
+    def containing(self, token: str) -> Tuple[int, ...]:
+        """районы, у которых какой-то алиас содержит токен"""
+        return self._substrings.get(normalize(token), ())
+
+    def contained_in(self, token: str) -> Tuple[int, ...]:
+        """районы, у которых какой-то алиас целиком входит в токен"""
+        token = normalize(token)
+        found = set()
+        for i in range(len(token)):
+            for j in range(i + 1, len(token) + 1):
+                found.update(self._aliases.get(token[i:j], ()))
+        return tuple(sorted(found))
+
+    def first(self, *orders: Tuple[int, ...]) -> Optional[str]:
+        """ключ района с наименьшим номером среди найденных"""
+        candidates = [o[0] for o in orders if o]
+        if candidates:
+            return self.keys[min(candidates)]
+        return None
+
+
+# форматы адреса krisha.kz
+DISTRICT_AFTER_RE = re.compile(r'р-н\s+(\w+)')                     # "р-н Байконур"
+DISTRICT_BEFORE_RE = re.compile(r'(\w+)\s+р-н')                    # "Алматы р-н"
+DISTRICT_ADJ_RE = re.compile(r'(\w+(?:ий|ый|ой))\s*(?:район|р-н)?')  # "Есильский район"
+
+
+class AddressResolver:
+    """адрес -> слаг района (krisha_parser_phone)
+    форматы проверяются по очереди, первый район в таблице побеждает
+    """
+
+    def __init__(self, districts: Dict[str, Iterable[str]]):
+        self.districts = DistrictResolver(districts)
+        self.resolve = lru_cache(maxsize=65536)(self._resolve)
+
+    def _resolve(self, address: str) -> Optional[str]:
+        match = DISTRICT_AFTER_RE.search(address)
+        if match:
+            name = match.group(1)
+            slug = self.districts.first(self.districts.containing(name), self.districts.contained_in(name))
+            if slug:
+                return slug
+
+        match = DISTRICT_BEFORE_RE.search(address)
+        if match:
+            slug = self.districts.first(self.districts.containing(match.group(1)))
+            if slug:
+                return slug
+
+        match = DISTRICT_ADJ_RE.search(address)
+        if match:
+            slug = self.districts.first(self.districts.containing(match.group(1)))
+            if slug:
+                return slug
+
+        return None
+
+
+class DistrictMatcher:
+    """название района с сайта -> ключи районов, которым оно подходит (krisha_parser)
+    совпадение: название района содержит распознанное или наоборот,
+    либо в распознанном есть один из алиасов
+    """
+
+    def __init__(self, names: Dict[str, str], aliases: Dict[str, Iterable[str]]):
+        self.names = DistrictResolver({key: [name] for key, name in names.items()})
+        self.aliases = DistrictResolver(aliases)
+        self.match = lru_cache(maxsize=65536)(self._match)
+
+    def _match(self, parsed_district: str) -> frozenset:
+        keys = set()
+        for orders in (self.names.containing(parsed_district), self.names.contained_in(parsed_district)):
+            keys.update(self.names.keys[o] for o in orders)
+        keys.update(self.aliases.keys[o] for o in self.aliases.contained_in(parsed_district))
+        return frozenset(keys)
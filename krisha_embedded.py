@@ -0,0 +1,100 @@
+import re
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    import json
+    HAS_ORJSON = False
+
+
+# состояние объявления, которое krisha.kz встраивает в страницу:
+# <script id="jsdata">window.data = {"advert": {...}, ...};</script>
+# скрипт находится в общем проходе по дереву (krisha_extract.locate_blocks) - без извлечения текста всей страницы
+
+STATE_MARKER = 'window.data'
+STATE_START_RE = re.compile(r'window\.data\s*=\s*')
+
+
+def _text(value: Any) -> str:
+    """непустая строка; число или объект на месте текста - не значение поля"""
+    if not isinstance(value, str):
+        raise TypeError(f"ожидалась строка: {value!r}")
+    value = value.strip()
+    if not value:
+        raise ValueError("пустая строка")
+    return value
+
+
+# поле -> (путь внутри advert, приведение типа)
+EMBEDDED_FIELDS = {
+    'title': (('title',), _text),
+    'price_kzt': (('price',), int),
+    'rooms': (('rooms',), int),
+    'area_total': (('square',), float),
+    'floor': (('floor',), int),
+    'floors_total': (('floorsCount',), int),
+    'latitude': (('map', 'lat'), float),
+    'longitude': (('map', 'lon'), float),
+    'city': (('address', 'city'), _text),
+    'district': (('address', 'district'), _text),
+    'address': (('addressTitle',), _text),
+    'year_built': (('building', 'year'), int),
+    'building_type': (('building', 'type'), lambda value: _text(value).lower()),
+    'complex_name': (('building', 'complex'), _text),
+}
+
+
+def _loads(text: str) -> Any:
+    if HAS_ORJSON:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _state_text(script: str) -> Optional[str]:
+    """JSON после "window.data =" до конца скрипта"""
+    match = STATE_START_RE.search(script)
+    if not match:
+        return None
+    return script[match.end():].strip().rstrip(';').strip() or None
+
+
+def is_state_script(tag) -> bool:
+    return tag.name == 'script' and bool(tag.string) and STATE_MARKER in tag.string
+
+
+def parse_state_script(text: str) -> Optional[Dict]:
+    """текст скрипта "window.data = {...};" -> состояние"""
+    return _decode(_state_text(text))
+
+
+def _decode(text: Optional[str]) -> Optional[Dict]:
+    if not text:
+        return None
+    try:
+        state = _loads(text)
+    except ValueError as e:
+        print(f"[WARN] не удалось разобрать window.data: {e}")
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def advert_fields(state: Optional[Dict]) -> Dict:
+    """поля объявления из состояния, только найденные и приводимые к типу"""
+    advert = state.get('advert') if state else None
+    if not isinstance(advert, dict):
+        return {}
+
+    fields = {}
+    for name, (path, convert) in EMBEDDED_FIELDS.items():
+        value = advert
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None or value == '':
+            continue
+        try:
+            fields[name] = convert(value)
+        except (TypeError, ValueError):
+            continue
+    return fields
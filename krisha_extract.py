@@ -0,0 +1,647 @@
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from krisha_html import make_soup
+from krisha_io import LISTING_SCHEMA, Listing, schema_fields
+from krisha_districts import AddressResolver
+from krisha_embedded import is_state_script, parse_state_script, advert_fields
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+
+# общее ядро извлечения: страница объявления -> Listing (запись по схеме LISTING_SCHEMA, krisha_io)
+# krisha_parser и krisha_parser_phone вызывают одно и то же и получают одинаковые поля и типы:
+# id - int, district - название района с сайта, district_slug - слаг района krisha.kz
+# разбор страницы - extract_listing(html, url), по готовому дереву - parse_listing_page
+# пакетные версии parse_title / parse_price / extract_district_clean / extract_microdistrict - krisha_columns
+
+RECORD_FIELDS = schema_fields(LISTING_SCHEMA)
+
+# время scraped_at
+ALMATY_TZ = ZoneInfo('Asia/Almaty')
+
+# слаг района -> как район пишут в адресе
+# порядок важен: при нескольких совпадениях побеждает первый (сначала Алматы, потом Астана)
+SLUG_ALIASES = {
+    # Алматы
+    'almaty-alatauskij': ['Алатауский', 'Алатауский район', 'Алатауский р-н'],
+    'almaty-almalinskij': ['Алмалинский', 'Алмалинский район', 'Алмалинский р-н'],
+    'almaty-aujezovskij': ['Ауэзовский', 'Ауэзовский район', 'Ауэзовский р-н'],
+    'almaty-bostandykskij': ['Бостандыкский', 'Бостандыкский район', 'Бостандыкский р-н'],
+    'almaty-zhetysuskij': ['Жетысуский', 'Жетысуский район', 'Жетысуский р-н'],
+    'almaty-medeuskij': ['Медеуский', 'Медеуский район', 'Медеуский р-н'],
+    'almaty-nauryzbajskiy': ['Наурызбайский', 'Наурызбайский район', 'Наурызбайский р-н'],
+    'almaty-turksibskij': ['Турксибский', 'Турксибский район', 'Турксибский р-н'],
+    # Астана
+    'astana-almatinskij': ['Алматы', 'Алматы район', 'Алматы р-н'],
+    'astana-esilskij': ['Есильский', 'Есильский район', 'Есильский р-н', 'Есиль'],
+    'astana-nura': ['Нуринский', 'Нуринский район', 'Нуринский р-н', 'Нура'],
+    'astana-saryarkinskij': ['Сарыаркинский', 'Сарыаркинский район', 'Сарыаркинский р-н', 'Сарыарка'],
+    'r-n-bajkonur': ['Байконурский', 'Байконурский район', 'Байконурский р-н', 'Байконур'],
+    'astana-saraishyk': ['Сарайшық', 'Сарайшықский', 'Сарайшық район', 'Сарайшық р-н'],
+}
+
+DISTRICT_RESOLVER = AddressResolver(SLUG_ALIASES)
+
+
+# функции очистки данных
+
+def extract_id_from_url(url: str) -> Optional[int]:
+    """извлекает ID объявления из URL"""
+    match = re.search(r'/a/show/(\d+)', url)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def parse_title(title: str) -> Dict:
+    """парсит title в структурированные поля
+    пример: '3-комнатная квартира · 107 м² · 4/10 этаж'
+    """
+    result = {
+        'rooms': None,
+        'area_total': None,
+        'floor': None,
+        'floors_total': None
+    }
+    
+    # комнаты: "3-комнатная" или "3 комнатная"
+    rooms_match = re.search(r'(\d+)[- ]комнат', title)
+    if rooms_match:
+        result['rooms'] = int(rooms_match.group(1))
+    
+    # площадь: "107 м²" или "107.5 м²"
+    area_match = re.search(r'(\d+(?:[.,]\d+)?)\s*м²', title)
+    if area_match:
+        result['area_total'] = float(area_match.group(1).replace(',', '.'))
+    
+    # этаж: "4/10 этаж" или "4 из 10"
+    floor_match = re.search(r'(\d+)[/из\s]+(\d+)\s*(?:этаж|эт)', title)
+    if floor_match:
+        result['floor'] = int(floor_match.group(1))
+        result['floors_total'] = int(floor_match.group(2))
+    
+    return result
+
+
+def parse_price(price_str: str) -> Optional[int]:
+    """парсит цену в число
+    пример: '54 999 000〒' -> 54999000
+    """
+    if not price_str:
+        return None
+    
+    # убираем все кроме цифр
+    digits = re.sub(r'[^\d]', '', price_str)
+    if digits:
+        return int(digits)
+    return None
+
+
+# мусор krisha в описании: (паттерн, литералы, без которых он не может совпасть)
+# паттерны применяются по очереди, как и раньше: одна альтернация всех паттернов дала бы другой
+# результат там, где вырезание одного куска склеивает совпадение следующего паттерна
+# литералы позволяют не гонять по тексту паттерн, которому нечего удалять;
+# их наличие проверяется отдельными `in` по тексту в нижнем регистре - это быстрее,
+# чем один проход регуляркой со всеми литералами
+GARBAGE_PATTERNS = [
+    (r'Оставить заметку.*?В Избранном', ['Оставить заметку', 'В Избранном']),
+    (r'Связывайтесь с продавцом.*?Скрыть подсказку', ['Связывайтесь с продавцом', 'Скрыть подсказку']),
+    (r'Автор объявления.*?Написать сообщение', ['Автор объявления', 'Написать сообщение']),
+    (r'Продлить.*?〒', ['Продлить', '〒']),
+    (r'Отправить в ТОП.*?〒', ['Отправить в ТОП', '〒']),
+    (r'В горячие.*?〒', ['В горячие', '〒']),
+    (r'Срочно, торг.*?〒', ['Срочно, торг', '〒']),
+    (r'Объявление на карте.*', ['Объявление на карте']),
+    (r'Пожаловаться на.*', ['Пожаловаться на']),
+    (r'Полезные статьи.*', ['Полезные статьи']),
+    (r'Объявление посмотрели.*', ['Объявление посмотрели']),
+    (r'Город.*?показать на карте', ['Город', 'показать на карте']),
+    (r'Тип дома.*?Бывшее общежитие.*?нет', ['Тип дома', 'Бывшее общежитие', 'нет']),
+    (r'О квартире.*?Описание', ['О квартире', 'Описание']),
+    (r'Перевести.*?Показать оригинал', ['Перевести', 'Показать оригинал']),
+    (r'Перевод может быть неточным', ['Перевод может быть неточным']),
+    (r'\d+ мин\. на чтение', ['мин. на чтение']),
+    (r'Все статьи', ['Все статьи']),
+    (r'〒', ['〒']),
+]
+
+GARBAGE_LITERALS = sorted({lit.lower() for _, lits in GARBAGE_PATTERNS for lit in lits})
+
+
+def _closing_literal(pattern: str, literals: List[str]) -> Optional[int]:
+    """индекс литерала, которым кончается каждое совпадение ленивого паттерна "A.*?B" (B), иначе None"""
+    if '.*?' in pattern and pattern.rsplit('.*?', 1)[1] == literals[-1]:
+        return GARBAGE_LITERALS.index(literals[-1].lower())
+    return None
+
+
+# паттерн -> (индексы его литералов, индекс закрывающего литерала)
+GARBAGE_RULES = [
+    (re.compile(pattern, re.IGNORECASE | re.DOTALL), [GARBAGE_LITERALS.index(lit.lower()) for lit in lits],
+     _closing_literal(pattern, lits))
+    for pattern, lits in GARBAGE_PATTERNS
+]
+
+# буквы, которые re с IGNORECASE считает равными буквам литералов,
+# хотя lower() их не переводит (кириллица Extended-C)
+CASE_FOLD_EXTRA = str.maketrans('ᲀᲁᲂᲃᲄᲅᲆ', 'вдостть')
+CASE_FOLD_EXTRA_RE = re.compile('[ᲀ-ᲆ]')
+
+
+def _present_literals(text: str) -> dict:
+    """индекс литерала мусора -> конец его последнего вхождения в текст (без учёта регистра)"""
+    lowered = text.lower()
+    if CASE_FOLD_EXTRA_RE.search(lowered):
+        lowered = lowered.translate(CASE_FOLD_EXTRA)
+    # lower() может изменить длину (İ -> i̇), тогда позиции в тексте неизвестны - считаем концом текст
+    exact = len(lowered) == len(text)
+    present = {}
+    for idx, lit in enumerate(GARBAGE_LITERALS):
+        pos = lowered.rfind(lit)
+        if pos >= 0:
+            present[idx] = pos + len(lit) if exact else len(text)
+    return present
+
+
+def clean_description(desc: str) -> str:
+    """очищает description от мусора krisha"""
+    if not desc:
+        return ""
+    
+    clean = desc
+    present = _present_literals(clean)
+    for pattern, literals, closing in GARBAGE_RULES:
+        if not all(idx in present for idx in literals):
+            continue
+        if closing is None or present[closing] >= len(clean):
+            clean, removed = pattern.subn('', clean)
+        else:
+            # совпадение "A.*?B" кончается на B: после последнего B совпадений нет,
+            # и каждое A там без этого ограничения просматривало бы текст до конца
+            end = present[closing]
+            head, removed = pattern.subn('', clean[:end])
+            if removed:
+                clean = head + clean[end:]
+        if removed:
+            # после вырезания на стыке мог сложиться новый литерал
+            present = _present_literals(clean)
+    
+    # убираем лишние пробелы (split без аргументов режет по тем же пробельным, что и \s)
+    clean = ' '.join(clean.split())
+    
+    # если текст слишком короткий после очистки - вернём пустую строку
+    if len(clean) < 20:
+        return ""
+    
+    return clean
+
+
+# поля из блока характеристик: (поле, паттерн, приведение типа)
+# паттерны компилируются один раз при импорте
+FIELD_PATTERNS = [
+    ('year_built', re.compile(r'Год постройки\s*(\d{4})'), int),
+    ('building_type', re.compile(r'Тип дома\s*(\w+)'), str.lower),
+    ('ceiling_height', re.compile(r'Высота потолков\s*(\d+(?:[.,]\d+)?)'), lambda v: float(v.replace(',', '.'))),
+    ('area_kitchen', re.compile(r'(?:Площадь кухни|кухн[яи])\s*[—-]?\s*(\d+(?:[.,]\d+)?)\s*м²'), lambda v: float(v.replace(',', '.'))),
+    ('condition', re.compile(r'Состояние квартиры\s*([^\n]+)'), str.strip),
+    ('complex_name', re.compile(r'Жилой комплекс\s*([^\n]+)'), str.strip),
+    ('bathroom', re.compile(r'Санузел\s*(\w+)'), str.lower),
+    ('parking', re.compile(r'Парковка\s*(\w+)'), str.lower),
+    ('furnished', re.compile(r'Квартира меблирована\s*(\w+)'), str.lower),
+]
+
+# метка в тексте -> индексы полей, паттерн которых начинается с этой метки
+FIELD_LABELS = {
+    'Год постройки': (0,),
+    'Тип дома': (1,),
+    'Высота потолков': (2,),
+    'Площадь кухни': (3,),
+    'кухн': (3,),
+    'Состояние квартиры': (4,),
+    'Жилой комплекс': (5,),
+    'Санузел': (6,),
+    'Парковка': (7,),
+    'Квартира меблирована': (8,),
+}
+
+# нулевой ширины: finditer проверяет каждую позицию и не съедает текст,
+# поэтому первое совпадение каждого поля то же, что дал бы re.search
+FIELD_LABELS_RE = re.compile('(?=(' + '|'.join(map(re.escape, FIELD_LABELS)) + '))')
+
+
+def _check_year(year: int) -> Optional[int]:
+    if 1900 < year <= 2030:
+        return year
+    return None
+
+
+def extract_fields(text: str) -> Dict:
+    """извлекает все характеристики за один проход по тексту
+    возвращает то же, что отдельные extract_* функции
+    """
+    result = {name: None for name, _, _ in FIELD_PATTERNS}
+    pending = set(range(len(FIELD_PATTERNS)))
+    
+    for label_match in FIELD_LABELS_RE.finditer(text):
+        pos = label_match.start()
+        for idx in FIELD_LABELS[label_match.group(1)]:
+            if idx not in pending:
+                continue
+            name, pattern, convert = FIELD_PATTERNS[idx]
+            match = pattern.match(text, pos)
+            if match:
+                result[name] = convert(match.group(1))
+                pending.discard(idx)
+        if not pending:
+            break
+    
+    if result['year_built'] is not None:
+        result['year_built'] = _check_year(result['year_built'])
+    return result
+
+
+def _extract_field(text: str, idx: int):
+    _, pattern, convert = FIELD_PATTERNS[idx]
+    match = pattern.search(text)
+    if match:
+        return convert(match.group(1))
+    return None
+
+
+def extract_year_built(text: str) -> Optional[int]:
+    """извлекает год постройки"""
+    year = _extract_field(text, 0)
+    if year is not None:
+        return _check_year(year)
+    return None
+
+
+def extract_building_type(text: str) -> Optional[str]:
+    """извлекает тип дома"""
+    return _extract_field(text, 1)
+
+
+def extract_ceiling_height(text: str) -> Optional[float]:
+    """извлекает высоту потолков"""
+    return _extract_field(text, 2)
+
+
+def extract_condition(text: str) -> Optional[str]:
+    """извлекает состояние квартиры"""
+    return _extract_field(text, 4)
+
+
+def extract_complex_name(text: str) -> Optional[str]:
+    """извлекает название ЖК"""
+    return _extract_field(text, 5)
+
+
+def extract_kitchen_area(text: str) -> Optional[float]:
+    """извлекает площадь кухни"""
+    return _extract_field(text, 3)
+
+
+def extract_bathroom(text: str) -> Optional[str]:
+    """извлекает тип санузла"""
+    return _extract_field(text, 6)
+
+
+def extract_parking(text: str) -> Optional[str]:
+    """извлекает парковку"""
+    return _extract_field(text, 7)
+
+
+def extract_furnished(text: str) -> Optional[str]:
+    """извлекает меблировку"""
+    return _extract_field(text, 8)
+
+
+def extract_district_clean(address: str) -> Optional[str]:
+    """извлекает чистое название района - поддержка всех форматов krisha.kz"""
+    
+    # Формат 1: "Алматы р-н" или "Бостандыкский р-н" (название перед р-н)
+    match = re.search(r'([А-Яа-яЁё]+(?:ий|ый|ой|ы|а)?)\s*р-н', address)
+    if match:
+        return match.group(1)
+    
+    # Формат 2: "р-н Байконур" (р-н перед названием)
+    match = re.search(r'р-н\s+([А-Яа-яЁё]+)', address)
+    if match:
+        return match.group(1)
+    
+    return None
+
+
+def extract_microdistrict(text: str) -> Optional[str]:
+    """извлекает микрорайон"""
+    match = re.search(r'мкр\.?\s*([А-Яа-яЁё0-9\-]+)', text, re.IGNORECASE)
+    if match:
+        return match.group(1)
+    return None
+
+
+def district_slug(address: str) -> Optional[str]:
+    """слаг района из адреса: 'Бостандыкский р-н, ...' -> 'almaty-bostandykskij'"""
+    return DISTRICT_RESOLVER.resolve(address)
+
+
+# локаторы: классы блоков известной разметки krisha.kz
+# все блоки находятся за один проход по дереву (soupsieve-селекторы в разы медленнее),
+# обход всего дерева эвристикой - только если блок не нашёлся
+LOCATORS = {
+    'price': 'offer__price',
+    'description': 'offer__description',
+    'parameters': 'offer__parameters',
+    'address': 'offer__short-description',
+}
+
+# (поле, 'json' | 'css' | 'scan') -> сколько страниц разобрано этим путём
+# страницы разбирают потоки Pipeline, поэтому счётчик меняется и читается только под LOCATOR_LOCK
+LOCATOR_STATS = Counter()
+LOCATOR_LOCK = threading.Lock()
+
+
+def _count_locator(field: str, path: str):
+    with LOCATOR_LOCK:
+        LOCATOR_STATS[(field, path)] += 1
+
+
+def locator_stats() -> Dict:
+    """копия LOCATOR_STATS, которую можно обходить, пока потоки разбирают страницы"""
+    with LOCATOR_LOCK:
+        return dict(LOCATOR_STATS)
+
+
+def _is_price(text: str) -> bool:
+    return '〒' in text and len(text) < 50 and any(c.isdigit() for c in text)
+
+
+def _address_line(lines: List[str]) -> Optional[str]:
+    """первая строка с р-н, без служебного текста 'показать на карте'"""
+    for line in lines:
+        line = line.strip()
+        if line and 'р-н' in line:
+            candidate = re.sub(r'показать на карте', '', line, flags=re.IGNORECASE).strip()
+            if candidate:
+                return candidate
+    return None
+
+
+def locate_blocks(soup: 'BeautifulSoup') -> Dict:
+    """локатор -> первый найденный блок, ключи в порядке документа
+    тем же проходом ищется скрипт с window.data (ключ 'state')
+    """
+    from bs4 import Tag
+
+    names = {cls: name for name, cls in LOCATORS.items()}
+    blocks = {}
+    # обход descendants напрямую: фильтры find_all на каждом теге заметно дороже
+    for tag in soup.descendants:
+        if not isinstance(tag, Tag):
+            continue
+        if tag.name == 'script' and 'state' not in blocks and is_state_script(tag):
+            blocks['state'] = tag
+        for cls in tag.attrs.get('class', ()):
+            name = names.get(cls)
+            if name and name not in blocks:
+                blocks[name] = tag
+    return blocks
+
+
+def locate_price(blocks: Dict) -> Optional[str]:
+    tag = blocks.get('price')
+    if tag:
+        text = tag.get_text(strip=True)
+        if _is_price(text):
+            return text
+    return None
+
+
+def locate_description(blocks: Dict) -> Optional[str]:
+    """текст объявления без заголовка блока"""
+    tag = blocks.get('description')
+    if tag:
+        tag = tag.find(class_='text') or tag
+        return tag.get_text(strip=True) or None
+    return None
+
+
+def locate_address(blocks: Dict) -> Optional[str]:
+    """значение пункта "Город" в коротком описании"""
+    tag = blocks.get('address')
+    if not tag:
+        return None
+    for item in tag.find_all(class_='offer__info-item'):
+        title = item.find(class_='offer__info-title')
+        value = item.find(class_='offer__advert-short-info')
+        if title and value and title.get_text(strip=True) == 'Город':
+            return _address_line(value.get_text(separator='\n').split('\n'))
+    return None
+
+
+def locate_parameters(blocks: Dict) -> Optional[str]:
+    """текст блоков характеристик, описания и короткого описания в порядке документа"""
+    tags = [tag for name, tag in blocks.items() if name in ('parameters', 'description', 'address')]
+    if 'parameters' in blocks or 'address' in blocks:
+        return '\n'.join(tag.get_text(separator='\n') for tag in tags)
+    return None
+
+
+def locator_summary() -> str:
+    """например: price json 38 / css 2, description css 40"""
+    stats = locator_stats()
+    parts = []
+    for field in LOCATORS:
+        paths = [f"{path} {stats[(field, path)]}" for path in ('json', 'css', 'scan') if stats.get((field, path))]
+        if paths:
+            parts.append(f"{field} {' / '.join(paths)}")
+    return ', '.join(parts)
+
+
+def parse_listing_page(soup: 'BeautifulSoup', city: str, url: str, scraped_at: Optional[str] = None) -> Listing:
+    """парсит страницу в запись: все поля RECORD_FIELDS, ненайденные - None или ''
+    scraped_at - время загрузки страницы (по умолчанию - сейчас)
+    """
+    
+    # базовые поля
+    data = {
+        'id': extract_id_from_url(url),
+        'url': url,
+        'city': city,
+        'scraped_at': scraped_at or datetime.now(ALMATY_TZ),
+        
+        # из title
+        'rooms': None,
+        'area_total': None,
+        'floor': None,
+        'floors_total': None,
+        
+        # цена
+        'price_kzt': None,
+        'price_raw': '',
+        
+        # локация
+        'district': None,
+        'district_slug': None,
+        'microdistrict': None,
+        'address': '',
+        'latitude': None,
+        'longitude': None,
+        
+        # характеристики
+        'year_built': None,
+        'building_type': None,
+        'ceiling_height': None,
+        'area_kitchen': None,
+        'condition': None,
+        'complex_name': None,
+        'bathroom': None,
+        'parking': None,
+        'furnished': None,
+        
+        # тексты
+        'title_raw': '',
+        'description_raw': '',
+        'description_clean': '',
+    }
+    
+    blocks = locate_blocks(soup)
+    
+    # встроенный window.data: его поля важнее текстовых эвристик
+    embedded = {}
+    try:
+        if 'state' in blocks:
+            embedded = advert_fields(parse_state_script(blocks['state'].string))
+    except Exception as e:
+        print(f"ошибка window.data: {e}")
+    if not data['city'] and embedded.get('city'):
+        data['city'] = embedded['city']
+    
+    # title
+    try:
+        title_tag = soup.find('h1')
+        if title_tag:
+            data['title_raw'] = title_tag.get_text(strip=True)
+        else:
+            title_tag = soup.find('title')
+            if title_tag:
+                data['title_raw'] = title_tag.get_text(strip=True).split(' — ')[0]
+        if not data['title_raw']:
+            data['title_raw'] = embedded.get('title', '')
+        
+        # парсим структурированные поля из title
+        if data['title_raw']:
+            title_parsed = parse_title(data['title_raw'])
+            data.update(title_parsed)
+        for key in ('rooms', 'area_total', 'floor', 'floors_total'):
+            if key in embedded:
+                data[key] = embedded[key]
+    except Exception as e:
+        print(f"ошибка title: {e}")
+    
+    # price
+    try:
+        price_text = locate_price(blocks)
+        if 'price_kzt' in embedded:
+            _count_locator('price', 'json')
+        elif price_text:
+            _count_locator('price', 'css')
+        else:
+            _count_locator('price', 'scan')
+            for tag in soup.find_all(['div', 'span']):
+                text = tag.get_text(strip=True)
+                if _is_price(text):
+                    price_text = text
+                    break
+        if price_text:
+            data['price_raw'] = price_text
+            data['price_kzt'] = parse_price(price_text)
+        if 'price_kzt' in embedded:
+            data['price_kzt'] = embedded['price_kzt']
+    except Exception as e:
+        print(f"ошибка price: {e}")
+    
+    # description
+    try:
+        desc_text = locate_description(blocks)
+        if desc_text:
+            _count_locator('description', 'css')
+        else:
+            _count_locator('description', 'scan')
+            desc_text = ""
+            for div in soup.find_all(['div', 'p']):
+                text = div.get_text(strip=True)
+                if len(text) > 100 and any(word in text.lower() for word in ['квартир', 'комнат', 'ремонт', 'этаж', 'район', 'дом']):
+                    if len(text) > len(desc_text):
+                        desc_text = text
+        
+        data['description_raw'] = desc_text[:5000] if desc_text else ""
+        data['description_clean'] = clean_description(desc_text)
+    except Exception as e:
+        print(f"ошибка description: {e}")
+    
+    # весь текст страницы нужен только эвристикам, считаем его по требованию
+    full_text = None
+    
+    # address & district
+    try:
+        # в колонке address "Город, район" - собираем так же из window.data
+        address = None
+        if embedded.get('district'):
+            address = ', '.join(v for v in (embedded.get('city'), embedded['district']) if v)
+            _count_locator('address', 'json')
+        else:
+            address = locate_address(blocks)
+            if address:
+                _count_locator('address', 'css')
+            else:
+                _count_locator('address', 'scan')
+                full_text = soup.get_text(separator='\n')
+                if 'Город' in full_text:
+                    idx = full_text.find('Город')
+                    chunk = full_text[idx:idx+300]
+                    # ищем в первых 15 строках (много пустых строк из-за HTML)
+                    address = _address_line(chunk.split('\n')[1:15])
+        if address:
+            data['address'] = address
+            data['district'] = extract_district_clean(address)
+            data['district_slug'] = district_slug(address)
+        data['latitude'] = embedded.get('latitude')
+        data['longitude'] = embedded.get('longitude')
+    except Exception as e:
+        print(f"ошибка address: {e}")
+    
+    # дополнительные поля из текста
+    try:
+        params_text = locate_parameters(blocks)
+        if params_text:
+            _count_locator('parameters', 'css')
+        else:
+            _count_locator('parameters', 'scan')
+            if full_text is None:
+                full_text = soup.get_text(separator='\n')
+            params_text = full_text
+        data.update(extract_fields(params_text))
+        # год из состояния - с той же проверкой, что и из текста; негодный не затирает текстовый
+        year = _check_year(embedded['year_built']) if 'year_built' in embedded else None
+        if year is not None:
+            data['year_built'] = year
+        for key in ('building_type', 'complex_name'):
+            if key in embedded:
+                data[key] = embedded[key]
+        data['microdistrict'] = extract_microdistrict(data['title_raw'] + ' ' + data['address'])
+    except Exception as e:
+        print(f"ошибка доп полей: {e}")
+    
+    return Listing.from_dict(data)
+
+
+def extract_listing(html: str, url: str, city: str = '', scraped_at: Optional[str] = None) -> Listing:
+    """разбирает HTML страницы объявления в запись"""
+    return parse_listing_page(make_soup(html), city, url, scraped_at)
@@ -0,0 +1,177 @@
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+# bs4 импортируется в первом make_soup: модули, которым нужны только
+# текстовые функции (районы, цены, заголовки), стартуют без него
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+
+# парсер HTML для обоих модулей: бэкенд выбирается через KRISHA_HTML_BACKEND
+# html.parser - встроенный и медленный, lxml - на C, html5lib - как в браузере
+
+BACKENDS = ['html.parser', 'lxml', 'html5lib']
+
+
+def available_backends() -> List[str]:
+    """бэкенды, для которых установлены библиотеки"""
+    result = ['html.parser']
+    for name in BACKENDS[1:]:
+        try:
+            __import__(name)
+            result.append(name)
+        except ImportError:
+            pass
+    return result
+
+
+def resolve_backend(name: str) -> str:
+    """проверяет имя бэкенда, при отсутствии библиотеки откатывается на html.parser"""
+    if name not in BACKENDS:
+        raise ValueError(f"неизвестный HTML бэкенд: {name} (доступны: {', '.join(BACKENDS)})")
+    if name not in available_backends():
+        print(f"[WARN] {name} не установлен, используется html.parser")
+        return 'html.parser'
+    return name
+
+
+HTML_BACKEND = resolve_backend(os.getenv('KRISHA_HTML_BACKEND', 'html.parser'))
+
+
+def set_backend(name: str):
+    """переключает бэкенд для всех последующих make_soup"""
+    global HTML_BACKEND
+    HTML_BACKEND = resolve_backend(name)
+
+
+def make_soup(html: str, backend: Optional[str] = None) -> 'BeautifulSoup':
+    """разбирает HTML выбранным бэкендом"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, backend or HTML_BACKEND)
+
+
+# сравнение бэкендов на сохранённых страницах
+# запуск: python krisha_html.py <папка с *.html>, например bench_corpus (его же проверяет tests/test_html.py)
+# ID объявления берётся из имени файла: 681234567.html или listing_681234567.html;
+# страницы поиска - search_*.html
+
+SHOW_ID_RE = re.compile(r'/a/show/(\d+)')
+PAGE_RE = re.compile(r'[?&]page=(\d+)')
+
+
+def search_page_view(soup: 'BeautifulSoup') -> Tuple:
+    """страница поиска по дереву: то же, что krisha_search.scan_search_page достаёт из байтов
+    (ID по порядку, карточки, пагинация)
+    """
+    ids, cards = [], {}
+    card = None
+    for tag in soup.find_all(True):
+        classes = tag.get('class') or []
+        found = SHOW_ID_RE.search(tag.get('href', ''))
+        if found and int(found.group(1)) not in ids:
+            ids.append(int(found.group(1)))
+        if tag.name == 'div' and 'a-card' in classes and (tag.get('data-id') or '').isdigit():
+            card_id = int(tag['data-id'])
+            if card_id not in ids:
+                ids.append(card_id)
+            card = cards.setdefault(card_id, {})
+        for field in ('title', 'price', 'subtitle'):
+            if f'a-card__{field}' in classes and card is not None and field not in card:
+                # как у сканера: текст до первого вложенного тега
+                first = next(iter(tag.children), None)
+                card[field] = ' '.join(first.split()) if isinstance(first, str) else ''
+    records = []
+    for listing_id in ids:
+        if listing_id not in cards:
+            continue
+        card = cards[listing_id]
+        digits = re.sub(r'\D', '', card.get('price', ''))
+        records.append({'id': listing_id, 'title_raw': card.get('title', ''),
+                        'price_kzt': int(digits) if digits else None, 'address': card.get('subtitle', '')})
+    next_page = None
+    button = soup.find('a', class_='paginator__btn--next')
+    has_next = button is not None and not button.has_attr('disabled')
+    if has_next:
+        page = PAGE_RE.search(button.get('href', ''))
+        next_page = int(page.group(1)) if page else None
+    return ids, records, has_next, next_page
+
+
+def compare_search_pages(paths: List[Path], backends: List[str]) -> bool:
+    """сверяет разбор страниц поиска каждым бэкендом со сканером krisha_search"""
+    from krisha_search import scan_search_page
+
+    identical = True
+    for path in paths:
+        html = path.read_text(encoding='utf-8')
+        scanner = scan_search_page(html)
+        expected = (scanner.ids, scanner.card_records(), scanner.has_next, scanner.next_page)
+        for backend in backends:
+            got = search_page_view(make_soup(html, backend))
+            if got != expected:
+                identical = False
+                diff = [name for name, a, b in zip(('ids', 'cards', 'has_next', 'next_page'), expected, got) if a != b]
+                print(f"расхождение {backend}: {path.name} -> {', '.join(diff)}")
+    return identical
+
+
+def compare_backends(pages_dir: str) -> bool:
+    """парсит корпус всеми бэкендами, сверяет словари и печатает скорость
+    возвращает True, если все бэкенды дали одинаковый результат
+    """
+    import krisha_extract
+
+    default_backend = HTML_BACKEND
+    pages = []
+    for path in sorted(Path(pages_dir).glob('*.html')):
+        match = re.fullmatch(r'(?:listing_)?(\d+)', path.stem)
+        if match:
+            pages.append((path.read_text(encoding='utf-8'), f"https://krisha.kz/a/show/{match.group(1)}"))
+    search_pages = sorted(Path(pages_dir).glob('search_*.html'))
+    if not pages:
+        print(f"в {pages_dir} нет страниц объявлений")
+        return False
+
+    backends = available_backends()
+    results = {}
+
+    for backend in backends:
+        set_backend(backend)
+        start = time.perf_counter()
+        parsed = []
+        for html, url in pages:
+            record = krisha_extract.extract_listing(html, url)
+            record.scraped_at = None
+            parsed.append(record)
+        results[backend] = parsed
+        elapsed = time.perf_counter() - start
+        print(f"{backend:12} {len(pages) / elapsed:8.1f} стр/сек ({elapsed:.2f} сек на {len(pages)})")
+
+    set_backend(default_backend)
+
+    identical = True
+    reference = results['html.parser']
+    for backend in backends[1:]:
+        for (html, url), expected, got in zip(pages, reference, results[backend]):
+            if expected != got:
+                identical = False
+                diff = [k for k in expected.FIELDS if getattr(expected, k) != getattr(got, k)]
+                print(f"расхождение {backend}: {url} -> {', '.join(diff)}")
+
+    if search_pages:
+        identical = compare_search_pages(search_pages, backends) and identical
+        print(f"страниц поиска: {len(search_pages)}")
+
+    print("результаты совпадают" if identical else "есть расхождения")
+    return identical
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("использование: python krisha_html.py <папка с *.html>")
+        sys.exit(2)
+    sys.exit(0 if compare_backends(sys.argv[1]) else 1)
@@ -0,0 +1,128 @@
+import time
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+
+# brotli нужен только для Content-Encoding: br (urllib3 распаковывает его сам, если модуль есть)
+try:
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+
+# HTTP-слой краулера: сжатие, условные запросы и повторы с backoff
+
+ACCEPT_ENCODING = 'br, gzip, deflate' if HAS_BROTLI else 'gzip, deflate'
+
+# временные ответы: повторяем, остальные 4xx/5xx - сразу ошибка
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError)
+
+
+def retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число или HTTP-дата"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """экспоненциальная пауза с полным джиттером: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def conditional_headers(entry: Optional[Dict]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since из валидаторов прошлой загрузки (запись PageStore)"""
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def response_validators(response: requests.Response) -> Dict[str, str]:
+    """ETag / Last-Modified ответа для сохранения рядом со страницей"""
+    validators = {}
+    if response.headers.get('ETag'):
+        validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['last_modified'] = response.headers['Last-Modified']
+    return validators
+
+
+class Fetcher:
+    """GET через общую сессию: Accept-Encoding, условные заголовки и повторы
+    временные ошибки повторяются attempts раз с паузой backoff_delay
+    или Retry-After, если сервер его прислал (но не дольше max_wait)
+    после последней попытки исключение requests поднимается как обычно
+    """
+
+    def __init__(self, session: requests.Session, attempts: int = 4, backoff: float = 5.0,
+                 backoff_max: float = 300.0, max_wait: float = 900.0):
+        self.session = session
+        self.attempts = max(attempts, 1)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.stats = Counter()  # ok, not_modified, retry, failed
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 30,
+            stream: bool = False, validators: Optional[Dict] = None) -> requests.Response:
+        """ответ 2xx или 304 (только если переданы validators)"""
+        headers = {'Accept-Encoding': ACCEPT_ENCODING, **(headers or {}), **conditional_headers(validators)}
+
+        for attempt in range(self.attempts):
+            last = attempt + 1 == self.attempts
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout, stream=stream)
+            except RETRY_ERRORS as e:
+                if last:
+                    self.stats['failed'] += 1
+                    raise
+                wait = backoff_delay(attempt, self.backoff, self.backoff_max)
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code == 304:
+                        self.stats['not_modified'] += 1
+                    else:
+                        response.raise_for_status()
+                        self.stats['ok'] += 1
+                    return response
+                if last:
+                    self.stats['failed'] += 1
+                    response.raise_for_status()
+                wait = retry_after(response.headers.get('Retry-After'))
+                if wait is None:
+                    wait = backoff_delay(attempt, self.backoff, self.backoff_max)
+                wait = min(wait, self.max_wait)
+                reason = f"HTTP {response.status_code}"
+                response.close()
+
+            self.stats['retry'] += 1
+            print(f"{reason}, повтор {attempt + 1}/{self.attempts - 1} через {wait:.1f} сек")
+            time.sleep(wait)
+
+    def summary(self) -> str:
+        return ', '.join(f"{key} {self.stats[key]}" for key in ('ok', 'not_modified', 'retry', 'failed') if self.stats[key])
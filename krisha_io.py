@@ -0,0 +1,565 @@
+import io
+import os
+import re
+import csv
+import sys
+import json
+import time
+import argparse
+import importlib.util
+from abc import ABC, abstractmethod
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Sequence, List, Tuple
+
+# pyarrow нужен только для Parquet; он тяжёлый (~0.1 сек на импорт),
+# поэтому здесь только проверяется наличие, а импорт - в ParquetSink
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# zstandard нужен только для сжатого JSONL
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+
+# общая запись результатов для krisha_parser и krisha_parser_phone
+
+# схемы выходных таблиц: (колонка, тип)
+# category - строка со словарным кодированием в Parquet
+# LISTING_SCHEMA - запись объявления, которую оба парсера получают из krisha_extract
+LISTING_SCHEMA = [
+    ('id', 'int64'),
+    ('url', 'string'),
+    ('city', 'category'),
+    ('scraped_at', 'timestamp'),
+    ('rooms', 'int32'),
+    ('area_total', 'float64'),
+    ('floor', 'int32'),
+    ('floors_total', 'int32'),
+    ('price_kzt', 'int64'),
+    ('price_raw', 'string'),
+    ('district', 'category'),
+    ('district_slug', 'category'),
+    ('microdistrict', 'string'),
+    ('address', 'string'),
+    ('year_built', 'int32'),
+    ('building_type', 'category'),
+    ('ceiling_height', 'float64'),
+    ('area_kitchen', 'float64'),
+    ('condition', 'category'),
+    ('complex_name', 'string'),
+    ('bathroom', 'category'),
+    ('parking', 'category'),
+    ('furnished', 'category'),
+    ('title_raw', 'string'),
+    ('description_raw', 'string'),
+    ('description_clean', 'string'),
+    ('latitude', 'float64'),
+    ('longitude', 'float64'),
+]
+
+# вывод krisha_parser_phone: та же запись + результат запроса телефона
+PHONE_SCHEMA = LISTING_SCHEMA + [
+    ('phones', 'string'),
+    ('phone_status', 'category'),
+]
+
+SCHEMAS = {
+    'listing': (LISTING_SCHEMA, 'scraped_at'),
+    'phone': (PHONE_SCHEMA, 'scraped_at'),
+}
+
+
+def schema_fields(schema: List[Tuple[str, str]]) -> List[str]:
+    return [name for name, _ in schema]
+
+
+# записи
+
+class Record:
+    """запись со схемой SCHEMA: поля - атрибуты (__slots__), а не ключи словаря
+    категории интернируются (одна строка на значение на весь процесс), timestamp - datetime
+    row() / to_dict() отдают поля в порядке схемы одним attrgetter, без поиска по ключам
+    экономия - только накладные расходы словаря и повторы категорий (~15% записи корпуса):
+    ~85% занимают description_raw и description_clean, их запись хранит как есть
+    """
+
+    __slots__ = ()
+    SCHEMA: List[Tuple[str, str]] = []
+    FIELDS: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = tuple(schema_fields(cls.SCHEMA))
+        cls._kinds = tuple(kind for _, kind in cls.SCHEMA)
+        cls._timestamps = tuple(i for i, kind in enumerate(cls._kinds) if kind == 'timestamp')
+        cls._getter = attrgetter(*cls.FIELDS)
+
+    def __init__(self, **fields):
+        self._assign(fields)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Record':
+        """запись из словаря (парсер, JSONL, CSV), ключи вне схемы игнорируются"""
+        record = cls.__new__(cls)
+        record._assign(data)
+        return record
+
+    @classmethod
+    def extend(cls, base: 'Record', **fields) -> 'Record':
+        """запись подкласса из записи базового класса + новые поля"""
+        record = cls.__new__(cls)
+        for name, value in zip(base.FIELDS, base._getter(base)):
+            setattr(record, name, value)
+        for name, kind in cls.SCHEMA[len(base.FIELDS):]:
+            setattr(record, name, _typed(fields.get(name), kind))
+        return record
+
+    def _assign(self, data: Dict):
+        for name, kind in zip(self.FIELDS, self._kinds):
+            setattr(self, name, _typed(data.get(name), kind))
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """как dict.get - для кода, который принимает и запись, и словарь (карточки поиска)"""
+        return getattr(self, name) if name in self.FIELDS else default
+
+    def row(self) -> tuple:
+        """значения в порядке FIELDS, время - ISO-строкой (CSV, RowBuffer)"""
+        values = self._getter(self)
+        if self._timestamps:
+            values = list(values)
+            for i in self._timestamps:
+                if values[i] is not None:
+                    values[i] = values[i].isoformat()
+        return tuple(values)
+
+    def to_dict(self) -> Dict:
+        """словарь для JSON"""
+        return dict(zip(self.FIELDS, self.row()))
+
+    @classmethod
+    def to_arrow(cls, records: Sequence['Record']):
+        """pyarrow.Table со схемой SCHEMA (категории - словарные колонки)"""
+        import pyarrow as pa
+        columns = list(zip(*(record._getter(record) for record in records))) or [()] * len(cls.FIELDS)
+        arrays = [pa.array(list(values), type=_arrow_type(kind)) for values, kind in zip(columns, cls._kinds)]
+        return pa.Table.from_arrays(arrays, names=list(cls.FIELDS))
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._getter(self) == other._getter(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={value!r}' for name, value in zip(self.FIELDS, self._getter(self)) if value is not None)
+        return f'{type(self).__name__}({fields})'
+
+
+def _typed(value, kind: str):
+    """значение к типу колонки: строки из CSV/JSONL приводятся, категории интернируются"""
+    if value is None:
+        return None
+    if kind == 'category':
+        return sys.intern(value) if isinstance(value, str) and value else (value or None)
+    if kind == 'timestamp':
+        return datetime.fromisoformat(value) if isinstance(value, str) else value
+    return coerce_value(value, kind)
+
+
+class Listing(Record):
+    """запись объявления по LISTING_SCHEMA (krisha_extract)"""
+
+    __slots__ = tuple(schema_fields(LISTING_SCHEMA))
+    SCHEMA = LISTING_SCHEMA
+
+
+class PhoneListing(Listing):
+    """Listing + результат запроса телефона (PHONE_SCHEMA, krisha_parser_phone)"""
+
+    __slots__ = tuple(schema_fields(PHONE_SCHEMA)[len(LISTING_SCHEMA):])
+    SCHEMA = PHONE_SCHEMA
+
+
+class RowBuffer:
+    """буфер строк с фиксированной схемой
+    хранит значения по колонкам в списках: добавление строки - O(1),
+    таблица (pandas) собирается один раз при сбросе
+    """
+
+    def __init__(self, fields: Sequence[str]):
+        self.fields = list(fields)
+        self._key = tuple(self.fields)
+        self._columns = [[] for _ in self.fields]
+
+    def __len__(self) -> int:
+        return len(self._columns[0]) if self._columns else 0
+
+    def append(self, row: Dict):
+        """добавляет строку (словарь или Record), ключи вне схемы игнорируются"""
+        if isinstance(row, Record) and row.FIELDS == self._key:
+            values = row.row()
+        elif isinstance(row, Record):
+            # через row(): время ISO-строкой, как у записи той же схемы
+            record = dict(zip(row.FIELDS, row.row()))
+            values = [record.get(name) for name in self.fields]
+        else:
+            values = [row.get(name) for name in self.fields]
+        for column, value in zip(self._columns, values):
+            column.append(value)
+
+    def extend(self, rows: Iterable[Dict]):
+        for row in rows:
+            self.append(row)
+
+    def rows(self) -> Iterable[tuple]:
+        """строки в порядке схемы"""
+        return zip(*self._columns)
+
+    def column(self, name: str) -> list:
+        return self._columns[self.fields.index(name)]
+
+    def to_frame(self):
+        """собирает pandas DataFrame из колонок"""
+        import pandas as pd
+        return pd.DataFrame(dict(zip(self.fields, self._columns)), columns=self.fields)
+
+    def clear(self):
+        for column in self._columns:
+            column.clear()
+
+
+def start_csv(filepath: str, fields: Sequence[str]) -> bool:
+    """готовит CSV к дописыванию, True - файл новый и нужен заголовок
+    если колонки в файле другие (схема выросла), строки под старым заголовком съедут:
+    такой файл переименовывается в <имя>.<время изменения>.csv, а запись идёт в новый
+    """
+    if not os.path.isfile(filepath) or os.path.getsize(filepath) == 0:
+        return True
+    with open(filepath, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), None)
+    if header == list(fields):
+        return False
+    stamp = datetime.fromtimestamp(os.path.getmtime(filepath)).strftime('%Y%m%dT%H%M%S')
+    root, ext = os.path.splitext(filepath)
+    old_path = f'{root}.{stamp}{ext}'
+    n = 1
+    while os.path.exists(old_path):
+        n += 1
+        old_path = f'{root}.{stamp}-{n}{ext}'
+    os.rename(filepath, old_path)
+    print(f"колонки {filepath} не совпадают со схемой, старый файл: {old_path}")
+    return True
+
+
+def write_csv(filepath: str, fields: Sequence[str], rows: Iterable[Sequence], encoding: str = 'utf-8', mode: str = 'a') -> bool:
+    """дописывает строки в CSV, заголовок пишется только в новый файл
+    возвращает True, если файл был создан (в т.ч. вместо файла со старыми колонками)
+    """
+    created = mode == 'w' or start_csv(filepath, fields)
+    with open(filepath, mode, newline='', encoding=encoding) as f:
+        writer = csv.writer(f)
+        if created:
+            writer.writerow(fields)
+        writer.writerows(rows)
+    return created
+
+
+class BufferedWriter(ABC):
+    """долгоживущий писатель: файл открыт всё время работы,
+    строки копятся в памяти и сбрасываются по размеру буфера или по времени
+    формат строки задаёт подкласс (_encode), сам BufferedWriter не создаётся
+    """
+
+    def __init__(self, filepath: str, flush_bytes: int = 1 << 20, flush_seconds: float = 30.0):
+        self.filepath = filepath
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self._buffer = io.StringIO()
+        self._last_flush = time.monotonic()
+        self._file = None
+
+    def _open(self):
+        return open(self.filepath, 'a', encoding='utf-8')
+
+    @abstractmethod
+    def _encode(self, record: Dict):
+        """дописывает запись в self._buffer"""
+
+    def _write_out(self, text: str):
+        self._file.write(text)
+
+    def write(self, record: Dict):
+        self._encode(record)
+        if self._buffer.tell() >= self.flush_bytes or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self, sync: bool = False):
+        """сбрасывает буфер в файл; sync=True - ещё и fsync (для чекпоинтов)"""
+        text = self._buffer.getvalue()
+        if text:
+            if self._file is None:
+                self._file = self._open()
+            self._write_out(text)
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if self._file is not None:
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush(sync=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlWriter(BufferedWriter):
+    """JSONL, опционально со сжатием zstd (*.jsonl.zst)
+    каждый сброс - отдельный zstd-фрейм, склеенные фреймы читаются как один поток
+    """
+
+    def __init__(self, filepath: str, compress: bool = False, **kwargs):
+        if compress:
+            if not HAS_ZSTD:
+                raise RuntimeError("для сжатого JSONL нужен zstandard: pip install zstandard")
+            if not filepath.endswith('.zst'):
+                filepath += '.zst'
+        super().__init__(filepath, **kwargs)
+        self.compress = compress
+        self._compressor = zstandard.ZstdCompressor(level=3) if compress else None
+
+    def _open(self):
+        if self.compress:
+            return open(self.filepath, 'ab')
+        return super()._open()
+
+    def _encode(self, record: Dict):
+        if isinstance(record, Record):
+            record = record.to_dict()
+        self._buffer.write(json.dumps(record, ensure_ascii=False))
+        self._buffer.write('\n')
+
+    def _write_out(self, text: str):
+        if self.compress:
+            self._file.write(self._compressor.compress(text.encode('utf-8')))
+        else:
+            self._file.write(text)
+
+
+class CsvWriter(BufferedWriter):
+    """CSV с фиксированными колонками, заголовок только в новый файл
+    файл с другими колонками откладывается в сторону (start_csv)
+    """
+
+    def __init__(self, filepath: str, fields: Sequence[str], encoding: str = 'utf-8', **kwargs):
+        super().__init__(filepath, **kwargs)
+        self.fields = list(fields)
+        self._key = tuple(self.fields)
+        self.encoding = encoding
+        self._csv = csv.writer(self._buffer)
+        if start_csv(filepath, self.fields):
+            self._csv.writerow(self.fields)
+
+    def _open(self):
+        return open(self.filepath, 'a', newline='', encoding=self.encoding)
+
+    def _encode(self, record: Dict):
+        if isinstance(record, Record) and record.FIELDS == self._key:
+            self._csv.writerow(record.row())
+        else:
+            self._csv.writerow([record.get(name) for name in self.fields])
+
+
+# Parquet
+
+def _to_timestamp(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    # время без зоны считаем локальным
+    return value if value.tzinfo else value.astimezone()
+
+
+def _arrow_type(kind: str):
+    import pyarrow as pa
+    return {
+        'int32': pa.int32(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }[kind]
+
+
+class ParquetSink:
+    """пишет пачки строк в Parquet-датасет с партициями
+    root/city=.../district=.../date=YYYY-MM-DD/part-....parquet
+    каждый сброс - новый файл в своей партиции, старые не переписываются
+    """
+
+    NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+    def __init__(self, root: str, schema: List[Tuple[str, str]], date_column: str,
+                 partition_columns: Sequence[str] = ('city', 'district')):
+        if not HAS_PYARROW:
+            raise RuntimeError("для Parquet нужен pyarrow: pip install pyarrow")
+        import pyarrow as pa
+        self.root = root
+        self.schema = schema
+        self.date_column = date_column
+        self.partition_columns = list(partition_columns)
+        self.data_schema = pa.schema([
+            (name, _arrow_type(kind)) for name, kind in schema if name not in self.partition_columns
+        ])
+        self._seq = 0
+
+    def _partition_dir(self, key: tuple) -> str:
+        parts = [
+            f"{name}={value if value not in (None, '') else self.NULL_PARTITION}"
+            for name, value in zip(self.partition_columns + ['date'], key)
+        ]
+        return os.path.join(self.root, *parts)
+
+    def write(self, buffer: RowBuffer) -> int:
+        """сбрасывает буфер (не очищая его), возвращает число строк"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        count = len(buffer)
+        if not count:
+            return 0
+
+        kinds = dict(self.schema)
+        timestamps = [_to_timestamp(v) for v in buffer.column(self.date_column)]
+        arrays = []
+        for field in self.data_schema:
+            if field.name == self.date_column:
+                values = timestamps
+            elif kinds[field.name] == 'string':
+                values = buffer.column(field.name)
+            else:
+                # ID в phone-парсере строкой, в CSV всё строками
+                values = [coerce_value(v, kinds[field.name]) for v in buffer.column(field.name)]
+            arrays.append(pa.array(values, type=field.type))
+        table = pa.Table.from_arrays(arrays, schema=self.data_schema)
+
+        # раскладываем строки по партициям
+        groups = {}
+        partition_values = [buffer.column(name) for name in self.partition_columns]
+        for i in range(count):
+            ts = timestamps[i]
+            key = tuple(values[i] for values in partition_values) + (ts.date().isoformat() if ts else None,)
+            groups.setdefault(key, []).append(i)
+
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        for key, indices in groups.items():
+            part_dir = self._partition_dir(key)
+            os.makedirs(part_dir, exist_ok=True)
+            self._seq += 1
+            path = os.path.join(part_dir, f'part-{stamp}-{os.getpid()}-{self._seq}.parquet')
+            pq.write_table(table.take(pa.array(indices)), path, compression='zstd')
+        return count
+
+
+# конвертация старых CSV/JSONL в Parquet
+
+def coerce_value(value, kind: str):
+    """приводит значение из CSV (всё строки) к типу колонки"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if kind in ('int32', 'int64'):
+            # старые CSV из pandas хранят целые как 3.0
+            return int(float(value)) if value else None
+        if kind == 'float64':
+            return float(value) if value else None
+        if kind == 'category':
+            return value or None
+    return value
+
+
+def read_archive(filepath: str) -> Iterable[Dict]:
+    """читает записи из CSV, JSONL или JSONL.zst"""
+    if filepath.endswith('.jsonl.zst'):
+        with open(filepath, 'rb') as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            for line in io.TextIOWrapper(reader, encoding='utf-8'):
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    elif filepath.endswith('.jsonl'):
+        with open(filepath, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(filepath, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+
+
+# слаг района krisha.kz: almaty-bostandykskij, r-n-bajkonur
+SLUG_RE = re.compile(r'[a-z0-9-]+')
+
+
+def upgrade_record(record: Dict) -> Dict:
+    """запись архива старого формата -> поля LISTING_SCHEMA
+    до общей схемы krisha_parser_phone писал parsed_at вместо scraped_at и слаг района в district
+    """
+    if 'parsed_at' not in record or 'scraped_at' in record:
+        return record
+    record = dict(record)
+    record['scraped_at'] = record.pop('parsed_at')
+    district = record.get('district')
+    if district and 'district_slug' not in record and SLUG_RE.fullmatch(district):
+        record['district_slug'] = district
+        record['district'] = None
+    return record
+
+
+def convert_archive(filepath: str, sink: ParquetSink, batch_size: int = 50000) -> int:
+    """переливает CSV/JSONL в Parquet через тот же sink, что и краулеры"""
+    kinds = dict(sink.schema)
+    buffer = RowBuffer(schema_fields(sink.schema))
+    total = 0
+    for record in read_archive(filepath):
+        record = upgrade_record(record)
+        buffer.append({name: coerce_value(record.get(name), kind) for name, kind in kinds.items()})
+        if len(buffer) >= batch_size:
+            total += sink.write(buffer)
+            buffer.clear()
+    total += sink.write(buffer)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="конвертация CSV/JSONL архива в Parquet")
+    parser.add_argument("files", nargs='+', help="CSV или JSONL файлы")
+    parser.add_argument("--out", default="./krisha_parquet", help="папка Parquet-датасета")
+    parser.add_argument("--schema", choices=sorted(SCHEMAS), default='listing',
+                        help="listing - krisha_parser, phone - krisha_parser_phone")
+    args = parser.parse_args()
+
+    schema, date_column = SCHEMAS[args.schema]
+    sink = ParquetSink(args.out, schema, date_column)
+    for filepath in args.files:
+        count = convert_archive(filepath, sink)
+        print(f"{filepath}: {count} записей -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+
+# метрики обхода: гистограммы времени по стадиям и счётчики
+# выгрузка - текстовый файл Prometheus (node_exporter --collector.textfile) и JSON-итог запуска
+
+# границы корзин в секундах: от разбора страницы (мс) до загрузки с повторами (минуты)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: Tuple, extra: Optional[Tuple] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_le(bound: float) -> str:
+    return f'{bound:g}'
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            total += n
+            yield bound, total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """верхняя граница корзины, в которую попадает квантиль (оценка сверху)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return round(min(bound, self.max), 6)
+        return round(self.max, 6)
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'max': round(self.max, 6),
+        }
+
+
+class Metrics:
+    """счётчики и гистограммы одного запуска; пишутся из любых потоков конвейера
+    имена без префикса: prefix='krisha' даёт krisha_pages_total, krisha_stage_seconds и т.д.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.started_at = datetime.now().astimezone()
+        self.info = {}  # произвольные поля для JSON-итога (город, районы, ...)
+        self._lock = threading.Lock()
+        self._counters = {}    # имя -> {метки -> значение}
+        self._histograms = {}  # имя -> {метки -> Histogram}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """значение счётчика, который ведётся в другом месте (например Fetcher.stats)"""
+        with self._lock:
+            self._counters.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, stage: str):
+        """время блока в гистограмму stage_seconds{stage=...}, в т.ч. если блок упал"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def error(self, e: BaseException, stage: str = ''):
+        self.inc('errors_total', type=type(e).__name__, stage=stage)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                full = f'{self.prefix}_{name}'
+                lines.append(f'# TYPE {full} counter')
+                for key, value in sorted(series.items()):
+                    lines.append(f'{full}{_format_labels(key)} {value:g}')
+            for name, series in sorted(self._histograms.items()):
+                full = f'{self.prefix}_{name}'
+                lines.append(f'# TYPE {full} histogram')
+                for key, histogram in sorted(series.items()):
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{full}_bucket{_format_labels(key, ("le", _format_le(bound)))} {total}')
+                    lines.append(f'{full}_bucket{_format_labels(key, ("le", "+Inf"))} {histogram.count}')
+                    lines.append(f'{full}_sum{_format_labels(key)} {histogram.sum:.6f}')
+                    lines.append(f'{full}_count{_format_labels(key)} {histogram.count}')
+        lines.append(f'# TYPE {self.prefix}_run_started_timestamp_seconds gauge')
+        lines.append(f'{self.prefix}_run_started_timestamp_seconds {self.started_at.timestamp():.0f}')
+        lines.append(f'# TYPE {self.prefix}_last_export_timestamp_seconds gauge')
+        lines.append(f'{self.prefix}_last_export_timestamp_seconds {time.time():.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> Dict:
+        """итог запуска: счётчики по меткам и сводка гистограмм"""
+        now = datetime.now().astimezone()
+        with self._lock:
+            counters = {
+                name: {','.join(f'{k}={v}' for k, v in key) or 'total': value for key, value in sorted(series.items())}
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: {','.join(f'{k}={v}' for k, v in key) or 'total': histogram.summary()
+                       for key, histogram in sorted(series.items())}
+                for name, series in sorted(self._histograms.items())
+            }
+        return {
+            'started_at': self.started_at.isoformat(),
+            'finished_at': now.isoformat(),
+            'duration_seconds': round((now - self.started_at).total_seconds(), 3),
+            **self.info,
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def export(self, textfile: Optional[str] = None, summary_path: Optional[str] = None):
+        """пишет файлы атомарно (tmp + os.replace): коллектор не увидит половину файла"""
+        if textfile:
+            _write_atomic(textfile, self.to_prometheus())
+        if summary_path:
+            _write_atomic(summary_path, json.dumps(self.summary(), ensure_ascii=False, indent=2) + '\n')
+
+
+def _write_atomic(path: str, text: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
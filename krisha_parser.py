@@ -1,12 +1,31 @@
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 import time
 import random
 import re
 import os
-import json
-from typing import List, Dict, Optional
+import argparse
+from collections import Counter
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterator, List, Dict, Optional, Tuple
+
+# bs4 грузится при первом разборе страницы (make_soup), а не при импорте:
+# parse_title, extract_district_clean и т.п. нужны и без него
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+from krisha_html import make_soup
+from krisha_io import RowBuffer, JsonlWriter, ParquetSink, Listing, LISTING_SCHEMA, schema_fields, write_csv
+from krisha_store import PageStore, SeenIndex, Checkpoint
+from krisha_districts import DistrictMatcher
+# разбор страниц и текстов - общее ядро krisha_extract; функции доступны и отсюда
+from krisha_extract import (
+    extract_listing, parse_listing_page, extract_id_from_url, parse_title, parse_price, clean_description, extract_fields,
+    extract_district_clean, extract_microdistrict, LOCATOR_STATS, locator_stats, locator_summary,
+)
+from krisha_search import SearchScanner, listing_url
+from krisha_pipeline import Pipeline, Writer
+from krisha_http import Fetcher, response_validators
+from krisha_metrics import Metrics
 
 
 # конфиг
@@ -50,6 +69,32 @@ ASTANA_DISTRICTS = {
     'saraishyk': ('Сарайшык р-н', 'astana-saraishyk'),
 }
 
+# альтернативные названия для матчинга
+DISTRICT_ALIASES = {
+    # Алматы
+    'alatauskij': ['алатау'],
+    'almalinskij': ['алмалин'],
+    'aujezovskij': ['ауэзов'],
+    'bostandykskij': ['бостандык', 'бостандыкс'],
+    'zhetysuskij': ['жетысу'],
+    'medeuskij': ['медеу'],
+    'nauryzbajskij': ['наурызбай'],
+    'turksibskij': ['турксиб'],
+    # Астана
+    'almatinskij': ['алматы'],  # на сайте "Алматы р-н"
+    'esilskij': ['есиль', 'есил', 'есильск'],
+    'nura': ['нура'],
+    'saryarkinskij': ['сарыарк', 'сарыарка'],  # на сайте "Сарыарка р-н"
+    'bajkonur': ['байконыр', 'байконур'],  # на сайте "р-н Байконур"
+    'saraishyk': ['сарайшык'],
+}
+
+# строится один раз: название с сайта -> подходящие ключи районов
+DISTRICT_MATCHER = DistrictMatcher(
+    {key: name for key, (name, _) in {**ALMATY_DISTRICTS, **ASTANA_DISTRICTS}.items()},
+    DISTRICT_ALIASES,
+)
+
 BASE_URLS = {
     'almaty': 'https://krisha.kz/prodazha/kvartiry/almaty/',
     'astana': 'https://krisha.kz/prodazha/kvartiry/astana/'
@@ -65,6 +110,15 @@ USER_AGENTS = [
 MAX_PAGES = 100
 REQUEST_TIMEOUT = 30
 
+# повторы временных ошибок (таймаут, обрыв, 429/5xx): пауза 0..min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2^n)
+# или Retry-After от сервера
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF = 5
+RETRY_BACKOFF_MAX = 300
+
+# If-None-Match / If-Modified-Since по валидаторам из page_store: на 304 берём сохранённую копию
+CONDITIONAL_REQUESTS = True
+
 # паузы как в kolesa
 MIN_DELAY = 45
 MAX_DELAY = 80
@@ -79,209 +133,58 @@ BREAK_AFTER_MAX = 7
 
 SAVE_EVERY = 5
 
+# сырые HTML сохраняются сюда для --replay (None - не сохранять)
+PAGE_STORE_DIR = './krisha_pages'
 
-# глобальные переменные
-
-session = requests.Session()
-df = pd.DataFrame()
-iteration_cnt = 0
-save_cnt = 0
-overall_cnt = 0
-break_threshold = random.randint(BREAK_AFTER_MIN, BREAK_AFTER_MAX)
+# уже собранные ID не загружаются повторно (None - собирать всё заново)
+SEEN_INDEX_PATH = './krisha_seen.sqlite'
 
+# состояние обхода для --resume
+CHECKPOINT_PATH = './krisha_checkpoint.json'
 
-# функции очистки данных
-
-def extract_id_from_url(url: str) -> Optional[int]:
-    """извлекает ID объявления из URL"""
-    match = re.search(r'/a/show/(\d+)', url)
-    if match:
-        return int(match.group(1))
-    return None
+# инкрементальный режим: район заканчивается после N страниц подряд,
+# где все ID уже есть в seen_index (0 - листать до последней страницы)
+INCREMENTAL_PAGES = 0
 
+# колонки CSV/Parquet - поля записи krisha_extract
+LISTING_FIELDS = schema_fields(LISTING_SCHEMA)
 
-def parse_title(title: str) -> Dict:
-    """парсит title в структурированные поля
-    пример: '3-комнатная квартира · 107 м² · 4/10 этаж'
-    """
-    result = {
-        'rooms': None,
-        'area_total': None,
-        'floor': None,
-        'floors_total': None
-    }
-    
-    # комнаты: "3-комнатная" или "3 комнатная"
-    rooms_match = re.search(r'(\d+)[- ]комнат', title)
-    if rooms_match:
-        result['rooms'] = int(rooms_match.group(1))
-    
-    # площадь: "107 м²" или "107.5 м²"
-    area_match = re.search(r'(\d+(?:[.,]\d+)?)\s*м²', title)
-    if area_match:
-        result['area_total'] = float(area_match.group(1).replace(',', '.'))
-    
-    # этаж: "4/10 этаж" или "4 из 10"
-    floor_match = re.search(r'(\d+)[/из\s]+(\d+)\s*(?:этаж|эт)', title)
-    if floor_match:
-        result['floor'] = int(floor_match.group(1))
-        result['floors_total'] = int(floor_match.group(2))
-    
-    return result
+# форматы вывода: 'csv', 'parquet' (JSONL пишется всегда)
+OUTPUT_FORMATS = ['csv']
+PARQUET_DIR = './krisha_parquet'
+JSONL_ZSTD = False  # True - писать *.jsonl.zst (нужен zstandard)
 
+# метрики: текстовый файл для node_exporter (textfile collector) и JSON-итог запуска (None - не писать)
+# обновляются после каждой страницы поиска и в конце запуска
+METRICS_TEXTFILE = './krisha_metrics.prom'
+RUN_SUMMARY_PATH = './krisha_run_summary.json'
 
-def parse_price(price_str: str) -> Optional[int]:
-    """парсит цену в число
-    пример: '54 999 000〒' -> 54999000
-    """
-    if not price_str:
-        return None
-    
-    # убираем все кроме цифр
-    digits = re.sub(r'[^\d]', '', price_str)
-    if digits:
-        return int(digits)
-    return None
+# конвейер: загрузка -> разбор в PIPELINE_WORKERS потоках -> запись в одном потоке (ListingSink),
+# между стадиями не больше PIPELINE_QUEUE страниц
+PIPELINE_WORKERS = 2
+PIPELINE_QUEUE = 8
 
 
-def clean_description(desc: str) -> str:
-    """очищает description от мусора krisha"""
-    if not desc:
-        return ""
-    
-    # паттерны мусора
-    garbage_patterns = [
-        r'Оставить заметку.*?В Избранном',
-        r'Связывайтесь с продавцом.*?Скрыть подсказку',
-        r'Автор объявления.*?Написать сообщение',
-        r'Продлить.*?〒',
-        r'Отправить в ТОП.*?〒',
-        r'В горячие.*?〒',
-        r'Срочно, торг.*?〒',
-        r'Объявление на карте.*',
-        r'Пожаловаться на.*',
-        r'Полезные статьи.*',
-        r'Объявление посмотрели.*',
-        r'Город.*?показать на карте',
-        r'Тип дома.*?Бывшее общежитие.*?нет',
-        r'О квартире.*?Описание',
-        r'Перевести.*?Показать оригинал',
-        r'Перевод может быть неточным',
-        r'\d+ мин\. на чтение',
-        r'Все статьи',
-        r'〒',
-    ]
-    
-    clean = desc
-    for pattern in garbage_patterns:
-        clean = re.sub(pattern, '', clean, flags=re.IGNORECASE | re.DOTALL)
-    
-    # убираем лишние пробелы
-    clean = re.sub(r'\s+', ' ', clean).strip()
-    
-    # если текст слишком короткий после очистки - вернём пустую строку
-    if len(clean) < 20:
-        return ""
-    
-    return clean
-
-
-def extract_year_built(text: str) -> Optional[int]:
-    """извлекает год постройки"""
-    match = re.search(r'Год постройки\s*(\d{4})', text)
-    if match:
-        year = int(match.group(1))
-        if 1900 < year <= 2030:
-            return year
-    return None
-
-
-def extract_building_type(text: str) -> Optional[str]:
-    """извлекает тип дома"""
-    match = re.search(r'Тип дома\s*(\w+)', text)
-    if match:
-        return match.group(1).lower()
-    return None
-
-
-def extract_ceiling_height(text: str) -> Optional[float]:
-    """извлекает высоту потолков"""
-    match = re.search(r'Высота потолков\s*(\d+(?:[.,]\d+)?)', text)
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    return None
-
-
-def extract_condition(text: str) -> Optional[str]:
-    """извлекает состояние квартиры"""
-    match = re.search(r'Состояние квартиры\s*([^\n]+)', text)
-    if match:
-        return match.group(1).strip()
-    return None
-
-
-def extract_complex_name(text: str) -> Optional[str]:
-    """извлекает название ЖК"""
-    match = re.search(r'Жилой комплекс\s*([^\n]+)', text)
-    if match:
-        return match.group(1).strip()
-    return None
-
-
-def extract_kitchen_area(text: str) -> Optional[float]:
-    """извлекает площадь кухни"""
-    match = re.search(r'(?:Площадь кухни|кухн[яи])\s*[—-]?\s*(\d+(?:[.,]\d+)?)\s*м²', text)
-    if match:
-        return float(match.group(1).replace(',', '.'))
-    return None
-
-
-def extract_bathroom(text: str) -> Optional[str]:
-    """извлекает тип санузла"""
-    match = re.search(r'Санузел\s*(\w+)', text)
-    if match:
-        return match.group(1).lower()
-    return None
-
-
-def extract_parking(text: str) -> Optional[str]:
-    """извлекает парковку"""
-    match = re.search(r'Парковка\s*(\w+)', text)
-    if match:
-        return match.group(1).lower()
-    return None
-
-
-def extract_furnished(text: str) -> Optional[str]:
-    """извлекает меблировку"""
-    match = re.search(r'Квартира меблирована\s*(\w+)', text)
-    if match:
-        return match.group(1).lower()
-    return None
-
+# глобальные переменные
 
-def extract_district_clean(address: str) -> Optional[str]:
-    """извлекает чистое название района - поддержка всех форматов krisha.kz"""
-    
-    # Формат 1: "Алматы р-н" или "Бостандыкский р-н" (название перед р-н)
-    match = re.search(r'([А-Яа-яЁё]+(?:ий|ый|ой|ы|а)?)\s*р-н', address)
-    if match:
-        return match.group(1)
-    
-    # Формат 2: "р-н Байконур" (р-н перед названием)
-    match = re.search(r'р-н\s+([А-Яа-яЁё]+)', address)
-    if match:
-        return match.group(1)
-    
-    return None
+session = requests.Session()
+fetcher = None  # создаётся при первом запросе (get_fetcher) - из настроек повторов на тот момент
+metrics = Metrics('krisha')
+page_store = None
+seen_index = None
+# (район, ID) объявлений другого района, встреченных в этом запуске
+# в seen_index они не попадают: там только сохранённые, иначе район объявления его пропустит
+wrong_district_ids = set()
+checkpoint = None
+parquet_sink = None
+jsonl_writers = {}
+listing_sinks = []  # открытые ListingSink: after_output ждёт сброса пачки текущего
+iteration_cnt = 0
+break_threshold = random.randint(BREAK_AFTER_MIN, BREAK_AFTER_MAX)
 
 
-def extract_microdistrict(text: str) -> Optional[str]:
-    """извлекает микрорайон"""
-    match = re.search(r'мкр\.?\s*([А-Яа-яЁё0-9\-]+)', text, re.IGNORECASE)
-    if match:
-        return match.group(1)
-    return None
+class CrawlStopped(Exception):
+    """обход района прерван, позиция сохранена в чекпоинте"""
 
 
 # вспомогательные функции
@@ -302,191 +205,184 @@ def random_delay(min_d=None, max_d=None):
         max_d = MAX_DELAY
     delay = random.uniform(min_d, max_d)
     print(f"ожидание {delay:.1f} сек...")
-    time.sleep(delay)
+    with metrics.stage('delay'):
+        time.sleep(delay)
 
 
 def long_break():
     delay = random.uniform(LONG_BREAK_MIN, LONG_BREAK_MAX)
     print(f"\nдлинный перерыв {delay/60:.1f} мин...")
-    time.sleep(delay)
+    with metrics.stage('delay'):
+        time.sleep(delay)
 
 
-def save_jsonl(data: Dict, filepath: str):
-    """сохраняет одну запись в JSONL"""
-    with open(filepath, 'a', encoding='utf-8') as f:
-        f.write(json.dumps(data, ensure_ascii=False) + '\n')
+def save_jsonl(data: Listing, filepath: str):
+    """сохраняет одну запись в JSONL (файл открыт до close_writers)"""
+    writer = jsonl_writers.get(filepath)
+    if writer is None:
+        writer = jsonl_writers[filepath] = JsonlWriter(filepath, compress=JSONL_ZSTD)
+    writer.write(data)
 
 
-def save_csv(dataframe, csv_file):
-    if dataframe.empty:
-        return
-    if not os.path.isfile(csv_file):
-        dataframe.to_csv(csv_file, mode='w', index=False, header=True, encoding='utf-8-sig')
-        print(f'создан {csv_file}')
+def after_output(action: Callable):
+    """выполняет action (чекпоинт, отметка в seen_index), когда всё уже отданное в вывод будет на диске:
+    сразу, если несброшенных строк нет, иначе - после ближайшего сброса пачки
+    пачки не сбрасываются досрочно, поэтому чекпоинт может отставать от вывода на SAVE_EVERY - 1 записей
+    """
+    if listing_sinks:
+        listing_sinks[-1].after_flush(action)
     else:
-        dataframe.to_csv(csv_file, mode='a', index=False, header=False, encoding='utf-8-sig')
-    print(f'сохранено {len(dataframe)} записей\n')
+        action()
+
+
+def close_writers():
+    for writer in jsonl_writers.values():
+        writer.close()
+    jsonl_writers.clear()
+
+
+def save_rows(buffer: RowBuffer, csv_file):
+    """сбрасывает буфер строк в CSV и/или Parquet и очищает его"""
+    count = len(buffer)
+    if not count:
+        return
+    if 'csv' in OUTPUT_FORMATS:
+        if write_csv(csv_file, buffer.fields, buffer.rows(), encoding='utf-8-sig'):
+            print(f'создан {csv_file}')
+    if parquet_sink:
+        parquet_sink.write(buffer)
+    buffer.clear()
+    print(f'сохранено {count} записей\n')
+
+
+def get_fetcher() -> Fetcher:
+    """общий Fetcher запуска; RETRY_* читаются при создании, а не при импорте модуля"""
+    global fetcher
+    if fetcher is None:
+        fetcher = Fetcher(session, RETRY_ATTEMPTS, RETRY_BACKOFF, RETRY_BACKOFF_MAX)
+    return fetcher
+
+
+def cached_page(url: str) -> Optional[Dict]:
+    """прошлая загрузка URL из page_store - для условного запроса"""
+    if page_store and CONDITIONAL_REQUESTS:
+        return page_store.latest(url)
+    return None
 
 
-def make_request(url: str) -> Optional[BeautifulSoup]:
-    global session
+def fetch_page(url: str, city: str = None) -> Optional[str]:
+    """загружает страницу и возвращает HTML без разбора (стадия загрузки конвейера)
+    на 304 возвращает сохранённую копию из page_store
+    """
     try:
-        headers = get_random_headers()
-        response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        response.encoding = 'utf-8'
-        return BeautifulSoup(response.text, 'html.parser')
+        with metrics.stage('fetch'):
+            cached = cached_page(url)
+            response = get_fetcher().get(url, get_random_headers(), REQUEST_TIMEOUT, validators=cached)
+            if response.status_code == 304 and cached:
+                return page_store.get(cached['sha256'])
+            response.encoding = 'utf-8'
+            if page_store:
+                page_store.put(url, response.text, city=city, **response_validators(response))
+            return response.text
     except requests.exceptions.RequestException as e:
         print(f"ошибка: {e}")
+        metrics.error(e, 'fetch')
         return None
 
 
-def build_url(base_url: str, district: str = None) -> str:
-    """строит URL с фильтром по району
-    на krisha.kz районы фильтруются через путь: /almaty/bostandykskij-r-n/
-    """
-    if district:
-        return f"{base_url}{district}-r-n/"
-    return base_url
+def make_request(url: str, city: str = None) -> Optional['BeautifulSoup']:
+    html = fetch_page(url, city)
+    return make_soup(html) if html is not None else None
 
 
-def get_listing_links(soup: BeautifulSoup) -> List[str]:
-    links = []
-    seen = set()
-    html_text = str(soup)
-    pattern = r'href=["\']([^"\']*?/a/show/(\d+))[^"\']*["\']'
-    matches = re.findall(pattern, html_text)
-    
-    for href, listing_id in matches:
-        clean_url = f'https://krisha.kz/a/show/{listing_id}'
-        if clean_url not in seen:
-            seen.add(clean_url)
-            links.append(clean_url)
-    return links
+def fetch_search_page(url: str) -> Optional[SearchScanner]:
+    """загружает страницу поиска потоком и разбирает байты по мере получения, без дерева"""
+    try:
+        with metrics.stage('search'):
+            scanner = SearchScanner()
+            chunks = []
+            cached = cached_page(url)
+            with get_fetcher().get(url, get_random_headers(), REQUEST_TIMEOUT, stream=True, validators=cached) as response:
+                if response.status_code == 304 and cached:
+                    scanner.feed(page_store.get(cached['sha256']).encode('utf-8'))
+                    return scanner.close()
+                for chunk in response.iter_content(chunk_size=65536):
+                    scanner.feed(chunk)
+                    if page_store:
+                        chunks.append(chunk)
+            if page_store:
+                page_store.put(url, b''.join(chunks).decode('utf-8', errors='replace'), **response_validators(response))
+            return scanner.close()
+    except requests.exceptions.RequestException as e:
+        print(f"ошибка: {e}")
+        metrics.error(e, 'search')
+        return None
 
 
-def parse_listing_page(soup: BeautifulSoup, city: str, url: str) -> Dict:
-    """парсит страницу в структурированные данные"""
-    
-    # получаем весь текст для извлечения данных
-    full_text = soup.get_text(separator='\n')
-    
-    # базовые поля
+def card_listing(card: Dict, city: str) -> Dict:
+    """частичная запись объявления из карточки поиска"""
     data = {
-        'id': extract_id_from_url(url),
-        'url': url,
+        'id': card['id'],
+        'url': listing_url(card['id']),
         'city': city,
-        'scraped_at': pd.Timestamp.now(tz="Asia/Almaty").isoformat(),
-        
-        # из title
-        'rooms': None,
-        'area_total': None,
-        'floor': None,
-        'floors_total': None,
-        
-        # цена
-        'price_kzt': None,
-        'price_raw': '',
-        
-        # локация
-        'district': None,
-        'microdistrict': None,
-        'address': '',
-        
-        # характеристики
-        'year_built': None,
-        'building_type': None,
-        'ceiling_height': None,
-        'area_kitchen': None,
-        'condition': None,
-        'complex_name': None,
-        'bathroom': None,
-        'parking': None,
-        'furnished': None,
-        
-        # тексты
-        'title_raw': '',
-        'description_raw': '',
-        'description_clean': '',
+        'price_kzt': card['price_kzt'],
+        'address': card['address'],
+        'district': extract_district_clean(card['address']) if card['address'] else None,
+        'title_raw': card['title_raw'],
     }
+    data.update(parse_title(card['title_raw']))
+    return data
+
+
+def plan_detail_fetches(search: SearchScanner, city: str, district_key: str = None, all_districts: Dict = None) -> Tuple[List[str], set, Dict[str, int]]:
+    """по карточкам решает, какие страницы объявлений загружать
+    загружаются новые ID и ID с изменившейся ценой; у остальных в seen_index обновляется last_seen
+    возвращает (URL к загрузке, ID с новой ценой, счётчики)
+    """
+    cards = {card['id']: card_listing(card, city) for card in search.card_records()}
+    links = []
+    repriced = set()
+    counts = {'new': 0, 'repriced': 0, 'unchanged': 0, 'wrong_district': 0}
     
-    # title
-    try:
-        title_tag = soup.find('h1')
-        if title_tag:
-            data['title_raw'] = title_tag.get_text(strip=True)
-        else:
-            title_tag = soup.find('title')
-            if title_tag:
-                data['title_raw'] = title_tag.get_text(strip=True).split(' — ')[0]
+    for listing_id in search.ids:
+        if (district_key, listing_id) in wrong_district_ids:
+            counts['wrong_district'] += 1
+            continue
         
-        # парсим структурированные поля из title
-        if data['title_raw']:
-            title_parsed = parse_title(data['title_raw'])
-            data.update(title_parsed)
-    except Exception as e:
-        print(f"ошибка title: {e}")
-    
-    # price
-    try:
-        for tag in soup.find_all(['div', 'span']):
-            text = tag.get_text(strip=True)
-            if '〒' in text and len(text) < 50 and any(c.isdigit() for c in text):
-                data['price_raw'] = text
-                data['price_kzt'] = parse_price(text)
-                break
-    except Exception as e:
-        print(f"ошибка price: {e}")
-    
-    # description
-    try:
-        desc_text = ""
-        for div in soup.find_all(['div', 'p']):
-            text = div.get_text(strip=True)
-            if len(text) > 100 and any(word in text.lower() for word in ['квартир', 'комнат', 'ремонт', 'этаж', 'район', 'дом']):
-                if len(text) > len(desc_text):
-                    desc_text = text
+        card = cards.get(listing_id)
+        if card is None:
+            # ссылка без карточки - решаем как раньше, по одному seen_index
+            links.append(listing_url(listing_id))
+            continue
         
-        data['description_raw'] = desc_text[:5000] if desc_text else ""
-        data['description_clean'] = clean_description(desc_text)
-    except Exception as e:
-        print(f"ошибка description: {e}")
-    
-    # address & district
-    try:
-        if 'Город' in full_text:
-            idx = full_text.find('Город')
-            chunk = full_text[idx:idx+300]
-            lines = chunk.split('\n')
-            # ищем в первых 15 строках (много пустых строк из-за HTML)
-            for line in lines[1:15]:
-                line = line.strip()
-                if line and 'р-н' in line:
-                    # убираем служебный текст "показать на карте"
-                    candidate = re.sub(r'показать на карте', '', line, flags=re.IGNORECASE).strip()
-                    if candidate:
-                        data['address'] = candidate
-                        data['district'] = extract_district_clean(candidate)
-                        break
-    except Exception as e:
-        print(f"ошибка address: {e}")
-    
-    # дополнительные поля из текста
-    try:
-        data['year_built'] = extract_year_built(full_text)
-        data['building_type'] = extract_building_type(full_text)
-        data['ceiling_height'] = extract_ceiling_height(full_text)
-        data['area_kitchen'] = extract_kitchen_area(full_text)
-        data['condition'] = extract_condition(full_text)
-        data['complex_name'] = extract_complex_name(full_text)
-        data['bathroom'] = extract_bathroom(full_text)
-        data['parking'] = extract_parking(full_text)
-        data['furnished'] = extract_furnished(full_text)
-        data['microdistrict'] = extract_microdistrict(data['title_raw'] + ' ' + data['address'])
-    except Exception as e:
-        print(f"ошибка доп полей: {e}")
+        # район виден уже в карточке - чужие не загружаем
+        if district_key and card['district'] and not matches_district(card, district_key, all_districts):
+            counts['wrong_district'] += 1
+            wrong_district_ids.add((district_key, listing_id))
+            continue
+        
+        known = seen_index.get(listing_id) if seen_index else None
+        if known is None:
+            counts['new'] += 1
+        elif card['price_kzt'] is not None and known[1] != card['price_kzt']:
+            counts['repriced'] += 1
+            repriced.add(listing_id)
+        else:
+            counts['unchanged'] += 1
+            seen_index.mark(listing_id, known[1])
+            continue
+        links.append(listing_url(listing_id))
     
-    return data
+    return links, repriced, counts
+
+
+def build_url(base_url: str, district: str = None) -> str:
+    """строит URL с фильтром по району
+    на krisha.kz районы фильтруются через путь: /almaty/bostandykskij-r-n/
+    """
+    if district:
+        return f"{base_url}{district}-r-n/"
+    return base_url
 
 
 def matches_district(data: Dict, target_district: str, all_districts: Dict) -> bool:
@@ -498,71 +394,136 @@ def matches_district(data: Dict, target_district: str, all_districts: Dict) -> b
     if not parsed_district:
         return False
     
-    # all_districts[key] = (название, слаг) - берём название
-    district_info = all_districts.get(target_district)
-    if district_info:
-        target_name = district_info[0].lower()  # первый элемент - название
-    else:
-        target_name = ''
-    
-    parsed_lower = parsed_district.lower()
-    
-    # проверяем совпадение названий
-    if target_name and target_name in parsed_lower:
-        return True
-    if parsed_lower in target_name:
-        return True
-    
-    # альтернативные названия для матчинга
-    district_aliases = {
-        # Алматы
-        'alatauskij': ['алатау'],
-        'almalinskij': ['алмалин'],
-        'aujezovskij': ['ауэзов'],
-        'bostandykskij': ['бостандык', 'бостандыкс'],
-        'zhetysuskij': ['жетысу'],
-        'medeuskij': ['медеу'],
-        'nauryzbajskij': ['наурызбай'],
-        'turksibskij': ['турксиб'],
-        # Астана
-        'almatinskij': ['алматы'],  # на сайте "Алматы р-н"
-        'esilskij': ['есиль', 'есил', 'есильск'],
-        'nura': ['нура'],
-        'saryarkinskij': ['сарыарк', 'сарыарка'],  # на сайте "Сарыарка р-н"
-        'bajkonur': ['байконыр', 'байконур'],  # на сайте "р-н Байконур"
-        'saraishyk': ['сарайшык'],
-    }
-    
-    aliases = district_aliases.get(target_district, [])
-    for alias in aliases:
-        if alias in parsed_lower:
-            return True
-    
-    return False
+    # all_districts оставлен в сигнатуре: названия и алиасы обоих городов уже в DISTRICT_MATCHER
+    return target_district in DISTRICT_MATCHER.match(parsed_district)
 
 
-def check_next_page(soup: BeautifulSoup) -> bool:
-    pagination = soup.find('nav', class_='paginator')
-    if pagination:
-        next_link = pagination.find('a', class_='paginator__btn--next')
-        if next_link and not next_link.get('disabled'):
-            return True
-    return False
+def export_metrics():
+    """дописывает счётчики, которые ведутся отдельно, и выгружает метрики в файлы"""
+    if fetcher:
+        for result, value in fetcher.stats.items():
+            metrics.set('http_requests_total', value, result=result)
+    for (field, path), value in locator_stats().items():
+        metrics.set('locator_total', value, field=field, path=path)
+    metrics.export(METRICS_TEXTFILE, RUN_SUMMARY_PATH)
 
 
 # основной функционал
 
-def parse_city_district(city_key: str, city_name: str, district_key: str = None, district_name: str = None, district_slug: str = None, all_districts: Dict = None) -> List[Dict]:
-    global df, iteration_cnt, save_cnt, overall_cnt, break_threshold
-    
-    all_listings = []
-    skipped_wrong_district = 0
-    page = 1
-    
+# город -> (название, районы)
+CITIES = {
+    'almaty': ('Алматы', ALMATY_DISTRICTS),
+    'astana': ('Астана', ASTANA_DISTRICTS),
+}
+
+
+def save_checkpoint(city_key: str, district_key: Optional[str], page: int, index: int = 0, pending: Optional[List[int]] = None):
+    """запоминает позицию обхода; pending=None - страницу надо обработать целиком"""
+    if checkpoint:
+        # сначала данные, потом позиция: чекпоинт не должен обгонять ни один вывод
+        after_output(partial(checkpoint.save, city=city_key, district=district_key, page=page, index=index, pending=pending))
+
+
+def search_page_url(city_key: str, district_slug: Optional[str], page: int) -> str:
+    if district_slug:
+        # используем слаг напрямую: almaty-bostandykskij/
+        page_url = f"https://krisha.kz/prodazha/kvartiry/{district_slug}/"
+    else:
+        page_url = BASE_URLS[city_key]
+    if page > 1:
+        page_url += f"?page={page}"
+    return page_url
+
+
+def district_files(city_key: str, district_key: Optional[str]) -> Tuple[str, str]:
+    """(csv, jsonl) района"""
     safe_city = city_key.lower()
     safe_district = district_key if district_key else 'all'
-    csv_file = f'./krisha_{safe_city}_{safe_district}_clean.csv'
-    jsonl_file = f'./krisha_{safe_city}_{safe_district}_raw.jsonl'
+    return f'./krisha_{safe_city}_{safe_district}_clean.csv', f'./krisha_{safe_city}_{safe_district}_raw.jsonl'
+
+
+class ListingSink:
+    """вывод района: JSONL сразу, CSV/Parquet пачками по SAVE_EVERY строк
+    пишет стадия записи конвейера (Writer): write() только ставит запись в её очередь
+    в памяти держится только текущая пачка; чекпоинты и отметки seen_index
+    ждут её сброса (after_flush), чтобы не обогнать вывод
+    """
+
+    def __init__(self, csv_file: str, jsonl_file: str):
+        self.csv_file = csv_file
+        self.jsonl_file = jsonl_file
+        self.buffer = RowBuffer(LISTING_FIELDS)
+        self.count = 0
+        self.waiting = []  # действия до следующего сброса
+        self.writer = Writer(PIPELINE_QUEUE)
+        listing_sinks.append(self)
+
+    def write(self, listing: Listing):
+        self.count += 1
+        self.writer.put(self._write, listing)
+
+    def after_flush(self, action: Callable):
+        """action после сброса всех уже записанных строк (сразу, если сбрасывать нечего)"""
+        self.writer.put(self._after_flush, action)
+
+    def close(self):
+        """дописывает очередь и последнюю пачку; после ошибки записи отложенные действия не выполняются"""
+        if self in listing_sinks:
+            listing_sinks.remove(self)
+        try:
+            self.writer.put(self._flush)
+            self.writer.close()
+        finally:
+            close_writers()
+
+    # дальше - поток записи
+
+    def _write(self, listing: Listing):
+        with metrics.stage('write'):
+            save_jsonl(listing, self.jsonl_file)
+            self.buffer.append(listing)
+            if len(self.buffer) >= SAVE_EVERY:
+                self._flush()
+
+    def _after_flush(self, action: Callable):
+        if len(self.buffer):
+            self.waiting.append(action)
+        else:
+            action()
+
+    def _flush(self):
+        """пачка в CSV/Parquet, JSONL с fsync, затем отложенные действия"""
+        save_rows(self.buffer, self.csv_file)
+        writer = jsonl_writers.get(self.jsonl_file)
+        if writer is not None:
+            writer.flush(sync=True)
+        waiting, self.waiting = self.waiting, []
+        for action in waiting:
+            action()
+
+
+def iter_listings(city_key: str, district_key: Optional[str] = None, resume: Optional[Dict] = None) -> Iterator[Listing]:
+    """объявления района по мере разбора (district_key=None - весь город)
+    отдаются только подходящие записи: пустые и из другого района пропускаются
+    генератор: следующая загрузка идёт, когда потребитель обработал уже отданное,
+    поэтому память не растёт с числом страниц и районов, а чекпоинт не обгоняет вывод
+    resume - состояние из Checkpoint.load() для этого района
+    """
+    global iteration_cnt, break_threshold
+    
+    city_name, all_districts = CITIES[city_key]
+    district_name, district_slug = all_districts[district_key] if district_key else (None, None)
+    
+    stats = Counter()  # saved, empty, wrong_district, seen, unchanged
+    known_streak = 0  # страниц подряд только из уже известных ID
+    page = 1
+    resume_ids = None
+    resume_index = 0
+    if resume:
+        page = resume['page']
+        resume_ids = resume.get('pending')
+        resume_index = resume.get('index', 0)
+        print(f"продолжаем со страницы {page}")
     
     print(f"\n{'='*60}")
     if district_name:
@@ -570,123 +531,285 @@ def parse_city_district(city_key: str, city_name: str, district_key: str = None,
         print(f"(двойная фильтрация: URL + проверка района)")
     else:
         print(f"парсинг: {city_name}")
-    print(f"csv: {csv_file}")
-    print(f"jsonl: {jsonl_file}")
     print(f"{'='*60}")
     
-    while page <= MAX_PAGES:
-        try:
-            # строим URL с правильным слагом
-            if district_slug:
-                # используем слаг напрямую: almaty-bostandykskij/
-                page_url = f"https://krisha.kz/prodazha/kvartiry/{district_slug}/"
-                if page > 1:
-                    page_url += f"?page={page}"
-            else:
-                page_url = BASE_URLS[city_key]
-                if page > 1:
-                    page_url += f"?page={page}"
+    def parse_stage(item):
+        """поток разбора: HTML -> запись + соответствие району"""
+        link, listing_id, html = item
+        with metrics.stage('parse'):
+            soup = make_soup(html)
+        with metrics.stage('extract'):
+            listing_data = parse_listing_page(soup, city_name, link)
+        # фильтруем по району (сайт может показывать объявления из других районов)
+        with metrics.stage('district'):
+            wrong_district = bool(district_key and not matches_district(listing_data, district_key, all_districts))
+        return listing_id, listing_data, wrong_district
+    
+    def deliver(results):
+        """отдаёт разобранные записи; в seen_index - после того, как потребитель их обработал"""
+        for result in results:
+            if result is None:
+                continue
+            listing_id, listing_data, wrong_district = result
             
-            print(f"\nстраница {page}: {page_url}")
+            if wrong_district:
+                parsed_district = listing_data.district or 'неизвестен'
+                print(f"  -> {listing_id} пропуск: район '{parsed_district}' != '{district_name}'")
+                stats['wrong_district'] += 1
+                metrics.inc('listings_total', result='wrong_district')
+                wrong_district_ids.add((district_key, listing_id))
+                continue
             
-            soup = make_request(page_url)
-            if not soup:
-                print(f"не удалось загрузить страницу {page}")
-                break
+            if not (listing_data.title_raw or listing_data.description_raw):
+                print(f"  -> {listing_id}: пустое объявление")
+                stats['empty'] += 1
+                metrics.inc('listings_total', result='empty')
+                continue
             
-            links = get_listing_links(soup)
-            print(f"найдено: {len(links)}")
+            # краткий вывод
+            rooms = listing_data.rooms or '?'
+            area = listing_data.area_total or '?'
+            price = listing_data.price_kzt
+            price_str = f"{price:,}".replace(',', ' ') if price else '?'
+            print(f"  -> {listing_id}: {rooms} комн, {area} м², {price_str} тг")
             
-            if not links:
-                print("объявления не найдены")
-                break
+            yield listing_data
             
-            for i, link in enumerate(links, 1):
-                print(f"[{i}/{len(links)}] {link}")
+            stats['saved'] += 1
+            metrics.inc('listings_total', result='saved')
+            if seen_index:
+                # отметка не должна обгонять вывод: иначе после падения запись пропадёт из CSV/Parquet
+                after_output(partial(seen_index.mark, listing_id, listing_data.price_kzt, listing_data.scraped_at.isoformat()))
+    
+    # загрузка идёт в этом потоке, разбор - в потоках конвейера, запись - в потоке ListingSink
+    pipeline = Pipeline(parse_stage, PIPELINE_WORKERS, PIPELINE_QUEUE,
+                        on_error=lambda stage, e: metrics.error(e, stage))
+    
+    try:
+        while page <= MAX_PAGES:
+            try:
+                page_url = search_page_url(city_key, district_slug, page)
+                print(f"\nстраница {page}: {page_url}")
                 
-                random_delay()
+                search = fetch_search_page(page_url)
+                if not search:
+                    print(f"не удалось загрузить страницу {page}")
+                    if checkpoint:
+                        raise CrawlStopped(f"страница {page} не загрузилась")
+                    break
                 
-                listing_soup = make_request(link)
-                if not listing_soup:
-                    print("не удалось загрузить")
-                    continue
+                print(f"найдено: {len(search.ids)}")
+                metrics.inc('pages_total')
+                if not search.ids and resume_ids is None:
+                    print("объявления не найдены")
+                    break
                 
-                # парсим в структурированные данные
-                listing_data = parse_listing_page(listing_soup, city_name, link)
+                # известные - собранные раньше и отсеянные как чужие на прошлых страницах;
+                # считаем до плана: он отсеивает чужие карточки этой страницы, а они впервые встреченные
+                if seen_index and search.ids:
+                    foreign = {i for i in search.ids if (district_key, i) in wrong_district_ids}
+                    known_streak = known_streak + 1 if len(seen_index.known(search.ids) | foreign) == len(set(search.ids)) else 0
+                else:
+                    known_streak = 0
                 
-                # фильтруем по району (сайт может показывать объявления из других районов)
-                if district_key and all_districts:
-                    if not matches_district(listing_data, district_key, all_districts):
-                        parsed_district = listing_data.get('district', 'неизвестен')
-                        print(f"  -> пропуск: район '{parsed_district}' != '{district_name}'")
-                        skipped_wrong_district += 1
-                        continue
+                # карточки поиска: детали грузим только для новых и подешевевших/подорожавших
+                links, repriced, counts = plan_detail_fetches(search, city_name, district_key, all_districts)
+                
+                stats['unchanged'] += counts['unchanged']
+                stats['wrong_district'] += counts['wrong_district']
+                metrics.inc('listings_total', counts['unchanged'], result='unchanged')
+                metrics.inc('listings_total', counts['wrong_district'], result='wrong_district')
+                print(f"к загрузке: {len(links)} (новых {counts['new']}, цена изменилась {counts['repriced']}), "
+                      f"без изменений {counts['unchanged']}, другой район {counts['wrong_district']}")
+                
+                offset = 0
+                if resume_ids is not None:
+                    # страницу начали в прошлый раз - берём только необработанные
+                    links = [listing_url(listing_id) for listing_id in resume_ids]
+                    offset = resume_index
+                    resume_ids = None
+                    print(f"осталось с прошлого запуска: {len(links)}")
                 
-                if listing_data['title_raw'] or listing_data['description_raw']:
-                    all_listings.append(listing_data)
+                for i, link in enumerate(links, 1):
+                    yield from deliver(pipeline.take())
                     
-                    # сохраняем сырые данные в JSONL
-                    save_jsonl(listing_data, jsonl_file)
+                    print(f"[{offset + i}/{offset + len(links)}] {link}")
                     
-                    # добавляем в DataFrame для CSV
-                    new_row = pd.DataFrame([listing_data])
-                    df = pd.concat([df, new_row], ignore_index=True, sort=False)
+                    # в чекпоинт попадают и загруженные, но ещё не отданные объявления
+                    in_flight = pipeline.in_flight()
+                    save_checkpoint(city_key, district_key, page, offset + i - 1 - len(in_flight),
+                                    in_flight + [extract_id_from_url(l) for l in links[i - 1:]])
                     
-                    # краткий вывод
-                    rooms = listing_data['rooms'] or '?'
-                    area = listing_data['area_total'] or '?'
-                    price = listing_data['price_kzt']
-                    price_str = f"{price:,}".replace(',', ' ') if price else '?'
-                    print(f"  -> {rooms} комн, {area} м², {price_str} тг")
-                else:
-                    print("пустое объявление")
+                    listing_id = extract_id_from_url(link)
+                    if seen_index and listing_id not in repriced and listing_id in seen_index:
+                        print("  -> уже собрано ранее")
+                        stats['seen'] += 1
+                        metrics.inc('listings_total', result='seen')
+                        continue
+                    
+                    random_delay()
+                    
+                    html = fetch_page(link, city_name)
+                    if html is None:
+                        print("не удалось загрузить")
+                        continue
+                    
+                    # ждёт, только если разбор отстал на PIPELINE_QUEUE страниц
+                    pipeline.submit((link, listing_id, html), key=listing_id)
+                    
+                    iteration_cnt += 1
+                    if iteration_cnt >= break_threshold:
+                        long_break()
+                        iteration_cnt = 0
+                        break_threshold = random.randint(BREAK_AFTER_MIN + 3, BREAK_AFTER_MAX + 5)
                 
-                iteration_cnt += 1
-                save_cnt += 1
-                overall_cnt += 1
+                # страница целиком отдана - только теперь чекпоинт может перейти дальше
+                yield from deliver(pipeline.drain())
+                export_metrics()
                 
-                if save_cnt >= SAVE_EVERY:
-                    save_csv(df, csv_file)
-                    save_cnt = 0
-                    df = pd.DataFrame()
+                if INCREMENTAL_PAGES and known_streak >= INCREMENTAL_PAGES:
+                    print(f"\n{known_streak} стр. подряд без новых объявлений, дальше всё собрано")
+                    break
                 
-                if iteration_cnt >= break_threshold:
-                    long_break()
-                    iteration_cnt = 0
-                    break_threshold = random.randint(BREAK_AFTER_MIN + 3, BREAK_AFTER_MAX + 5)
-            
-            if not check_next_page(soup):
-                print("\nпоследняя страница")
-                break
-            
-            page += 1
-            if page <= MAX_PAGES:
-                print("\nпауза между страницами")
-                random_delay(MIN_PAGE_DELAY, MAX_PAGE_DELAY)
+                if not search.has_next:
+                    print("\nпоследняя страница")
+                    break
                 
-        except Exception as e:
-            print(f"\nошибка: {e}")
-            if not df.empty:
-                save_csv(df, csv_file)
-                df = pd.DataFrame()
-            print(f"остановка на странице {page}, собрано: {overall_cnt}")
-            break
-    
-    if not df.empty:
-        save_csv(df, csv_file)
-        df = pd.DataFrame()
+                page += 1
+                save_checkpoint(city_key, district_key, page)
+                if page <= MAX_PAGES:
+                    print("\nпауза между страницами")
+                    random_delay(MIN_PAGE_DELAY, MAX_PAGE_DELAY)
+                    
+            except (CrawlStopped, KeyboardInterrupt):
+                # отдаём уже загруженное: разбор без сети занимает секунды
+                pipeline.close()
+                yield from deliver(pipeline.take())
+                raise
+            except Exception as e:
+                print(f"\nошибка: {e}")
+                metrics.error(e, 'crawl')
+                pipeline.close()
+                yield from deliver(pipeline.take())
+                print(f"остановка на странице {page}, собрано: {stats['saved']}")
+                if checkpoint:
+                    raise CrawlStopped(f"ошибка на странице {page}: {e}") from e
+                break
+        
+        pipeline.close()
+        yield from deliver(pipeline.take())
+    finally:
+        # в т.ч. если потребитель бросил генератор на середине
+        pipeline.close()
     
     location_str = f"{city_name} - {district_name}" if district_name else city_name
-    print(f"\n{location_str}: собрано {len(all_listings)}")
-    if skipped_wrong_district > 0:
-        print(f"пропущено (другой район): {skipped_wrong_district}")
-    return all_listings
+    print(f"\n{location_str}: собрано {stats['saved']}")
+    if stats['wrong_district'] > 0:
+        print(f"пропущено (другой район): {stats['wrong_district']}")
+    if stats['seen'] > 0:
+        print(f"пропущено (уже собраны): {stats['seen']}")
+    if stats['unchanged'] > 0:
+        print(f"пропущено (карточка не изменилась): {stats['unchanged']}")
+    if LOCATOR_STATS:
+        print(f"локаторы: {locator_summary()}")
+    if fetcher and fetcher.stats:
+        print(f"http: {fetcher.summary()}")
+    export_metrics()
+
+
+def parse_city_district(city_key: str, district_key: str = None, resume: Dict = None) -> int:
+    """собирает район в CSV/JSONL (и Parquet), возвращает число записей"""
+    csv_file, jsonl_file = district_files(city_key, district_key)
+    print(f"\ncsv: {csv_file}")
+    print(f"jsonl: {jsonl_file}")
+    
+    sink = ListingSink(csv_file, jsonl_file)
+    listings = iter_listings(city_key, district_key, resume)
+    try:
+        for listing in listings:
+            sink.write(listing)
+    finally:
+        # сначала генератор (останавливает разбор), потом файлы
+        listings.close()
+        sink.close()
+    return sink.count
+
+
+def replay_store(store_dir: str):
+    """перепарсивает сохранённые страницы без сети"""
+    store = PageStore(store_dir)
+    csv_file = './krisha_replay_clean.csv'
+    jsonl_file = './krisha_replay_raw.jsonl'
+    
+    print(f"replay: {store_dir}")
+    print(f"csv: {csv_file}")
+    print(f"jsonl: {jsonl_file}")
+    
+    buffer = RowBuffer(LISTING_FIELDS)
+    total = 0
+    for entry, html in store.iter_listing_pages():
+        listing_data = extract_listing(html, entry['url'], entry.get('city') or '', entry['fetched_at'])
+        if not (listing_data.title_raw or listing_data.description_raw):
+            continue
+        
+        save_jsonl(listing_data, jsonl_file)
+        buffer.append(listing_data)
+        total += 1
+        if len(buffer) >= 1000:
+            save_rows(buffer, csv_file)
+    
+    save_rows(buffer, csv_file)
+    close_writers()
+    print(f"\nreplay: собрано {total}")
+    if LOCATOR_STATS:
+        print(f"локаторы: {locator_summary()}")
 
 
 def main():
+    global page_store, seen_index, checkpoint, parquet_sink, INCREMENTAL_PAGES
+    
+    parser = argparse.ArgumentParser(description="krisha.kz parser")
+    parser.add_argument("--replay", action="store_true", help="перепарсить сохранённые страницы без сети")
+    parser.add_argument("--resume", action="store_true", help="продолжить с последнего чекпоинта")
+    parser.add_argument("--incremental", type=int, metavar="N",
+                        help="закончить район после N страниц подряд из уже собранных ID (0 - выкл)")
+    args = parser.parse_args()
+    
+    if args.incremental is not None:
+        INCREMENTAL_PAGES = args.incremental
+    
+    if 'parquet' in OUTPUT_FORMATS:
+        parquet_sink = ParquetSink(PARQUET_DIR, LISTING_SCHEMA, 'scraped_at')
+        print(f"parquet: {PARQUET_DIR}")
+    
+    if args.replay:
+        if not PAGE_STORE_DIR:
+            print("PAGE_STORE_DIR не задан, нечего перепарсивать")
+            return
+        replay_store(PAGE_STORE_DIR)
+        return
+    
+    if PAGE_STORE_DIR:
+        page_store = PageStore(PAGE_STORE_DIR)
+    if SEEN_INDEX_PATH:
+        seen_index = SeenIndex(SEEN_INDEX_PATH)
+        print(f"ранее собрано: {seen_index.count()}")
+    
+    resume = None
+    if CHECKPOINT_PATH:
+        checkpoint = Checkpoint(CHECKPOINT_PATH)
+        if args.resume:
+            resume = checkpoint.load()
+            if resume:
+                print(f"чекпоинт: {resume['city']} / {resume['district'] or 'все'}, страница {resume['page']}")
+            else:
+                print("чекпоинт не найден, начинаем сначала")
+    
     config_city = PARSE_CONFIG['city']
     config_districts = PARSE_CONFIG['districts']
     
+    metrics.info.update(script='krisha_parser', city=config_city, districts=config_districts)
+    
     print("krisha.kz parser v3")
     print("с очисткой и структурированием данных")
     print(f"\nконфиг:")
@@ -695,41 +818,50 @@ def main():
     print(f"  страниц: {MAX_PAGES}")
     print(f"  задержка: {MIN_DELAY}-{MAX_DELAY} сек")
     
-    all_data = []
+    total = 0
     
     if config_city == 'all':
-        cities = [
-            ('almaty', 'Алматы', ALMATY_DISTRICTS),
-            ('astana', 'Астана', ASTANA_DISTRICTS)
-        ]
-    elif config_city == 'almaty':
-        cities = [('almaty', 'Алматы', ALMATY_DISTRICTS)]
-    elif config_city == 'astana':
-        cities = [('astana', 'Астана', ASTANA_DISTRICTS)]
+        cities = list(CITIES)
+    elif config_city in CITIES:
+        cities = [config_city]
     else:
         print(f"неизвестный город: {config_city}")
         return
     
-    for city_idx, (city_key, city_name, all_districts) in enumerate(cities):
+    for city_idx, city_key in enumerate(cities):
+        if resume and resume['city'] != city_key:
+            continue
+        city_name, all_districts = CITIES[city_key]
+        
         if config_districts:
-            # all_districts[key] = (название, слаг)
-            districts = [(k, v[0], v[1]) for k, v in all_districts.items() if k in config_districts]
+            districts = [k for k in all_districts if k in config_districts]
             if not districts:
                 print(f"\nне найдены районы {config_districts} для {city_name}")
                 continue
         else:
-            districts = [(None, None, None)]
+            districts = [None]
         
-        for district_idx, (district_key, district_name, district_slug) in enumerate(districts):
+        for district_idx, district_key in enumerate(districts):
+            district_resume = None
+            if resume:
+                if resume['district'] != district_key:
+                    continue
+                district_resume, resume = resume, None
+            else:
+                save_checkpoint(city_key, district_key, 1)
+            
             try:
-                data = parse_city_district(city_key, city_name, district_key, district_name, district_slug, all_districts)
-                all_data.extend(data)
+                total += parse_city_district(city_key, district_key, district_resume)
                 
                 if district_idx < len(districts) - 1:
                     print(f"\nпауза перед следующим районом")
                     time.sleep(60)
+            except CrawlStopped as e:
+                print(f"\nобход остановлен: {e}")
+                print("продолжить: python krisha_parser.py --resume")
+                return
             except Exception as e:
-                loc = f"{city_name} - {district_name}" if district_name else city_name
+                loc = f"{city_name} - {all_districts[district_key][0]}" if district_key else city_name
                 print(f"\nошибка при парсинге {loc}: {e}")
                 continue
         
@@ -737,9 +869,12 @@ def main():
             print(f"\nпауза перед следующим городом")
             time.sleep(60)
     
-    if all_data:
+    if checkpoint and not resume:
+        checkpoint.clear()
+    
+    if total:
         print(f"\n{'='*60}")
-        print(f"итого собрано: {len(all_data)}")
+        print(f"итого собрано: {total}")
         print(f"{'='*60}")
     else:
         print("\nданные не собраны")
@@ -748,6 +883,13 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nпрервано")
+    finally:
+        # дописываем буферы JSONL при любом выходе, в т.ч. по Ctrl+C
+        close_writers()
+        export_metrics()
 
 
@@ -5,39 +5,30 @@
 import os
 import re
 import sys
-import csv
-import json
 import time
 import random
 import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple, Any
-from urllib.parse import urljoin
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, List, Dict, Tuple, Any
 
-# Selenium
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+# Selenium, webdriver_manager и selenium_stealth импортируются в load_browser()
+# при создании драйвера: --replay и разбор сохранённых страниц стартуют без них
+if TYPE_CHECKING:
+    from selenium import webdriver
 
-# WebDriver manager
-from webdriver_manager.chrome import ChromeDriverManager
+HAS_STEALTH = None  # None - браузерный стек ещё не загружен
 
-# Stealth mode
-try:
-    from selenium_stealth import stealth
-    HAS_STEALTH = True
-except ImportError:
-    HAS_STEALTH = False
-    print("[WARN] selenium_stealth не установлен, режим stealth отключен")
-
-# BeautifulSoup для парсинга HTML
-from bs4 import BeautifulSoup
+# Парсинг HTML (BeautifulSoup, бэкенд настраивается)
+from krisha_html import make_soup, set_backend, BACKENDS
+from krisha_io import RowBuffer, CsvWriter, JsonlWriter, ParquetSink, PhoneListing, PHONE_SCHEMA, schema_fields
+from krisha_store import PageStore, SeenIndex, Checkpoint, listing_id
+# Слаг района из адреса - district_slug (в krisha_parser extract_district_clean даёт название района)
+from krisha_extract import extract_listing, parse_listing_page, district_slug, ALMATY_TZ
+from krisha_search import scan_search_page
+from krisha_pipeline import Pipeline, Writer
+from krisha_metrics import Metrics
 
 
 
@@ -63,28 +54,22 @@ CAPSOLVER_EXTENSION_PATH = "/Users/toast/Desktop/pars/kolesa_parser/CapSolver.Br
 # Глобальные состояния
 IS_LOGGED_IN = False
 PROCESSED_URLS_HISTORY = []
+RESULT_WRITERS = {}  # путь -> открытый CsvWriter/JsonlWriter
+RESULT_SINKS = []  # открытые ResultSink: after_output ждёт сброса пачки текущего
+METRICS = Metrics("krisha_phone")  # Время по стадиям и счётчики запуска
+METRICS_TEXTFILE = None  # Задаются из --metrics-textfile / --run-summary
+RUN_SUMMARY_PATH = None
 
 
 
-ALMATY_DISTRICTS = {
-    "almaty-alatauskij": ["Алатауский", "Алатауский район", "Алатауский р-н"],
-    "almaty-almalinskij": ["Алмалинский", "Алмалинский район", "Алмалинский р-н"],
-    "almaty-aujezovskij": ["Ауэзовский", "Ауэзовский район", "Ауэзовский р-н"],
-    "almaty-bostandykskij": ["Бостандыкский", "Бостандыкский район", "Бостандыкский р-н"],
-    "almaty-zhetysuskij": ["Жетысуский", "Жетысуский район", "Жетысуский р-н"],
-    "almaty-medeuskij": ["Медеуский", "Медеуский район", "Медеуский р-н"],
-    "almaty-nauryzbajskiy": ["Наурызбайский", "Наурызбайский район", "Наурызбайский р-н"],
-    "almaty-turksibskij": ["Турксибский", "Турксибский район", "Турксибский р-н"],
-}
+# Колонки CSV/Parquet: запись krisha_extract + телефоны
+RESULT_FIELDS = schema_fields(PHONE_SCHEMA)
 
-ASTANA_DISTRICTS = {
-    "astana-almatinskij": ["Алматы", "Алматы район", "Алматы р-н"],
-    "astana-esilskij": ["Есильский", "Есильский район", "Есильский р-н", "Есиль"],
-    "astana-nura": ["Нуринский", "Нуринский район", "Нуринский р-н", "Нура"],
-    "astana-saryarkinskij": ["Сарыаркинский", "Сарыаркинский район", "Сарыаркинский р-н", "Сарыарка"],
-    "r-n-bajkonur": ["Байконурский", "Байконурский район", "Байконурский р-н", "Байконур"],
-    "astana-saraishyk": ["Сарайшық", "Сарайшықский", "Сарайшық район", "Сарайшық р-н"],
-}
+PARQUET_FLUSH_EVERY = 50  # строк на один Parquet-файл; после сброса пачки двигаются чекпоинт и seen_index
+
+# Конвейер: драйвер загружает страницы в главном потоке, разбор HTML и запись - в фоне
+PIPELINE_WORKERS = 2  # потоков разбора
+PIPELINE_QUEUE = 8  # страниц в очереди между стадиями
 
 # Распределение на 4 человек
 PERSON_CONFIGS = {
@@ -97,14 +82,15 @@ PERSON_CONFIGS = {
 
 
 def now_iso() -> str:
-    """Текущее время в ISO формате"""
-    return datetime.now().isoformat()
+    """Текущее время в ISO формате (часовой пояс Алматы, как scraped_at в записи)"""
+    return datetime.now(ALMATY_TZ).isoformat()
 
 def sleep_range(r: Tuple[int, int]):
     """Случайная пауза в диапазоне"""
-    time.sleep(random.uniform(r[0], r[1]))
+    with METRICS.stage("delay"):
+        time.sleep(random.uniform(r[0], r[1]))
 
-def human_like_click(driver: webdriver.Chrome, element):
+def human_like_click(driver: 'webdriver.Chrome', element):
     """Имитация человеческого клика"""
     actions = ActionChains(driver)
     actions.move_to_element(element)
@@ -112,7 +98,7 @@ def human_like_click(driver: webdriver.Chrome, element):
     actions.click()
     actions.perform()
 
-def random_scroll(driver: webdriver.Chrome):
+def random_scroll(driver: 'webdriver.Chrome'):
     """Случайный скролл страницы"""
     scroll_amount = random.randint(200, 600)
     driver.execute_script(f"window.scrollBy(0, {scroll_amount});")
@@ -133,9 +119,40 @@ def handle_ban_cooldown():
 
 
 
-def make_driver(headless: bool = False, mobile_ua: bool = False, use_profile: bool = False) -> webdriver.Chrome:
+def load_browser():
+    """Импорт браузерного стека в глобальные имена модуля (один раз)"""
+    global webdriver, Service, Options, By, ActionChains, WebDriverWait, EC
+    global TimeoutException, NoSuchElementException, ChromeDriverManager, stealth, HAS_STEALTH
+    
+    if HAS_STEALTH is not None:
+        return
+    
+    # Selenium
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException, NoSuchElementException
+    
+    # WebDriver manager
+    from webdriver_manager.chrome import ChromeDriverManager
+    
+    # Stealth mode
+    try:
+        from selenium_stealth import stealth
+        HAS_STEALTH = True
+    except ImportError:
+        HAS_STEALTH = False
+        print("[WARN] selenium_stealth не установлен, режим stealth отключен")
+
+
+def make_driver(headless: bool = False, mobile_ua: bool = False, use_profile: bool = False) -> 'webdriver.Chrome':
     """Создание Chrome драйвера с CapSolver расширением"""
     
+    load_browser()
     opts = Options()
     
     # НЕ используем профиль - будем логиниться вручную через скрипт
@@ -190,7 +207,7 @@ def make_driver(headless: bool = False, mobile_ua: bool = False, use_profile: bo
 
 
 
-def detect_recaptcha(driver: webdriver.Chrome) -> bool:
+def detect_recaptcha(driver: 'webdriver.Chrome') -> bool:
     """Проверка наличия reCAPTCHA на странице"""
     try:
         iframes = driver.find_elements(By.TAG_NAME, "iframe")
@@ -208,7 +225,7 @@ def detect_recaptcha(driver: webdriver.Chrome) -> bool:
     except:
         return False
 
-def try_solve_recaptcha(driver: webdriver.Chrome, timeout: int = 120) -> bool:
+def try_solve_recaptcha(driver: 'webdriver.Chrome', timeout: int = 120) -> bool:
     """Ожидание решения капчи от CapSolver"""
     print(f"[CAPTCHA] Ожидание решения (до {timeout} сек)...")
     start = time.time()
@@ -230,7 +247,7 @@ def try_solve_recaptcha(driver: webdriver.Chrome, timeout: int = 120) -> bool:
     print("[CAPTCHA] ✗ Таймаут решения капчи")
     return False
 
-def try_get_phones(driver: webdriver.Chrome, timeout: int = 10) -> Optional[List[str]]:
+def try_get_phones(driver: 'webdriver.Chrome', timeout: int = 10) -> Optional[List[str]]:
     """Извлечение телефонов со страницы (links + text regex)"""
     start = time.time()
     
@@ -280,7 +297,7 @@ def try_get_phones(driver: webdriver.Chrome, timeout: int = 10) -> Optional[List
 
 
 
-def perform_login(driver: webdriver.Chrome, phone: str, password: str) -> bool:
+def perform_login(driver: 'webdriver.Chrome', phone: str, password: str) -> bool:
     """Авторизация на krisha.kz"""
     global IS_LOGGED_IN
     
@@ -373,115 +390,9 @@ def perform_login(driver: webdriver.Chrome, phone: str, password: str) -> bool:
 
 
 
-def extract_district_clean(address_text: str) -> Optional[str]:
-    """Извлечение района из адреса"""
-    
-    all_districts = {}
-    all_districts.update(ALMATY_DISTRICTS)
-    all_districts.update(ASTANA_DISTRICTS)
-    
-    # Паттерн: "р-н Байконур" (район ПЕРЕД названием)
-    match = re.search(r'р-н\s+(\w+)', address_text)
-    if match:
-        district_name = match.group(1)
-        for slug, aliases in all_districts.items():
-            for alias in aliases:
-                if district_name.lower() in alias.lower() or alias.lower() in district_name.lower():
-                    return slug
-    
-    # Паттерн: "Алматы р-н" (название БЕЗ "инский")
-    match = re.search(r'(\w+)\s+р-н', address_text)
-    if match:
-        district_name = match.group(1)
-        for slug, aliases in all_districts.items():
-            for alias in aliases:
-                if district_name.lower() in alias.lower() or alias.lower().startswith(district_name.lower()):
-                    return slug
-    
-    # Паттерн: стандартный "Xxxский район" или "Xxxский р-н"
-    match = re.search(r'(\w+(?:ий|ый|ой))\s*(?:район|р-н)?', address_text)
-    if match:
-        district_adj = match.group(1)
-        for slug, aliases in all_districts.items():
-            for alias in aliases:
-                if district_adj.lower() in alias.lower():
-                    return slug
-    
-    return None
+# Названия городов для записи, если на странице нет window.data
+CITY_NAMES = {"almaty": "Алматы", "astana": "Астана"}
 
-def parse_listing_details(html: str, url: str) -> Dict[str, Any]:
-    """Парсинг деталей объявления"""
-    soup = BeautifulSoup(html, 'html.parser')
-    data = {"url": url, "id": None, "city": None, "district": None}
-    
-    # ID из URL
-    m = re.search(r'/(\d+)/?$', url)
-    if m:
-        data["id"] = m.group(1)
-    
-    # Заголовок
-    title_el = soup.find("h1") or soup.find(class_=re.compile(r'title'))
-    if title_el:
-        data["title_raw"] = title_el.get_text(strip=True)
-    
-    # Адрес и район
-    addr_el = soup.find("div", class_=re.compile(r'address|location'))
-    if addr_el:
-        addr_text = addr_el.get_text(separator="\n", strip=True)
-        lines = addr_text.split("\n")
-        
-        for line in lines[1:15]:
-            line = line.replace("показать на карте", "").strip()
-            if not line:
-                continue
-            
-            # Город
-            if "Алматы" in line and "р-н" not in line.replace("Алматы р-н", ""):
-                data["city"] = "Алматы"
-            elif "Астана" in line:
-                data["city"] = "Астана"
-            
-            # Район
-            district = extract_district_clean(line)
-            if district:
-                data["district"] = district
-                data["address"] = line
-                break
-    
-    # Цена
-    price_el = soup.find(class_=re.compile(r'price'))
-    if price_el:
-        price_text = price_el.get_text(strip=True)
-        price_num = re.sub(r'\D', '', price_text)
-        if price_num:
-            data["price_kzt"] = int(price_num)
-    
-    # Характеристики
-    for param_el in soup.find_all(class_=re.compile(r'param|offer__info')):
-        text = param_el.get_text(strip=True).lower()
-        
-        if "комнат" in text:
-            m = re.search(r'(\d+)', text)
-            if m:
-                data["rooms"] = int(m.group(1))
-        
-        if "площадь" in text or "м²" in text:
-            m = re.search(r'(\d+(?:[.,]\d+)?)', text)
-            if m:
-                data["area_total"] = float(m.group(1).replace(',', '.'))
-        
-        if "этаж" in text:
-            m = re.search(r'(\d+)\s*из\s*(\d+)', text)
-            if m:
-                data["floor"] = int(m.group(1))
-                data["floors_total"] = int(m.group(2))
-        
-        if "год постройки" in text:
-            m = re.search(r'(\d{4})', text)
-            if m:
-                data["year_built"] = int(m.group(1))
-    
-    return data
 
 def build_search_url(city: str, district: str, page: int = 1) -> str:
     """Построение URL поиска"""
@@ -506,26 +417,16 @@ def build_search_url(city: str, district: str, page: int = 1) -> str:
 
 
 
-def get_listing_urls(driver: webdriver.Chrome, search_url: str) -> List[str]:
+def get_listing_urls(driver: 'webdriver.Chrome', search_url: str) -> List[str]:
     """Получение списка URL объявлений со страницы поиска"""
     
     driver.get(search_url)
     time.sleep(random.uniform(3, 5))
     
-    urls = []
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    
-    # Ищем ссылки на объявления
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-        if re.match(r'/a/show/\d+', href):
-            full_url = urljoin(BASE_URL, href)
-            if full_url not in urls:
-                urls.append(full_url)
-    
-    return urls
+    # Разбор без дерева: ID по порядку, без повторов
+    return scan_search_page(driver.page_source).urls()
 
-def reveal_phone_on_page(driver: webdriver.Chrome, url: str, phone: str, password: str) -> Tuple[Optional[List[str]], Dict]:
+def reveal_phone_on_page(driver: 'webdriver.Chrome', url: str, phone: str, password: str) -> Tuple[Optional[List[str]], Dict]:
     """Получение телефона со страницы объявления"""
     global IS_LOGGED_IN, PROCESSED_URLS_HISTORY
     
@@ -676,185 +577,453 @@ def reveal_phone_on_page(driver: webdriver.Chrome, url: str, phone: str, passwor
     else:
         return None, {**meta, "error": "no_phone_no_captcha"}
 
-def save_results(filepath: str, data: List[Dict], mode: str = 'a'):
-    """Сохранение результатов в CSV и JSONL"""
+def save_results(filepath: str, data: List[PhoneListing], with_csv: bool = True, compress: bool = False):
+    """Сохранение результатов в CSV и JSONL (файлы открыты до close_result_writers)"""
     if not data:
         return
     
-    # CSV
     csv_path = filepath if filepath.endswith('.csv') else filepath.replace('.jsonl', '.csv')
-    file_exists = os.path.exists(csv_path)
+    jsonl_path = csv_path.replace('.csv', '.jsonl')
     
-    with open(csv_path, mode, newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=data[0].keys())
-        if not file_exists or mode == 'w':
-            writer.writeheader()
-        writer.writerows(data)
+    writers = []
+    if with_csv:
+        if csv_path not in RESULT_WRITERS:
+            RESULT_WRITERS[csv_path] = CsvWriter(csv_path, RESULT_FIELDS)
+        writers.append(RESULT_WRITERS[csv_path])
+    if jsonl_path not in RESULT_WRITERS:
+        RESULT_WRITERS[jsonl_path] = JsonlWriter(jsonl_path, compress=compress)
+    writers.append(RESULT_WRITERS[jsonl_path])
     
-    # JSONL
-    jsonl_path = csv_path.replace('.csv', '.jsonl')
-    with open(jsonl_path, mode, encoding='utf-8') as f:
+    for writer in writers:
         for row in data:
-            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+            writer.write(row)
+
 
+def after_output(action: Callable):
+    """Выполнить action (чекпоинт, отметка в seen_index), когда всё уже записанное будет на диске:
+    сразу, если несброшенных строк нет, иначе после ближайшего сброса пачки (досрочно пачки не пишутся)
+    """
+    if RESULT_SINKS:
+        RESULT_SINKS[-1].after_flush(action)
+    else:
+        action()
 
 
-def main():
-    global IS_LOGGED_IN, CAPSOLVER_API_KEY, CONSECUTIVE_ERRORS
+def close_result_writers():
+    for writer in RESULT_WRITERS.values():
+        writer.close()
+    RESULT_WRITERS.clear()
+
+
+class ResultSink:
+    """Вывод результатов: CSV/JSONL построчно, Parquet пачками по PARQUET_FLUSH_EVERY
+    Пишет стадия записи конвейера (Writer): write() только ставит строку в её очередь.
+    Сброс пачки - граница, до которой вывод на диске: на ней выполняются отложенные
+    чекпоинты и отметки seen_index (after_flush)
+    """
     
-    parser = argparse.ArgumentParser(description="Krisha.kz Phone Parser")
-    parser.add_argument("--city", required=True, choices=["almaty", "astana"], help="Город")
-    parser.add_argument("--district", required=True, help="Район (slug без города)")
-    parser.add_argument("--pages", type=int, default=1, help="Количество страниц")
-    parser.add_argument("--max-listings", type=int, default=0, help="Макс. объявлений (0 = все)")
-    parser.add_argument("--output", type=str, default="", help="Файл вывода")
-    parser.add_argument("--headless", action="store_true", help="Режим без GUI")
-    parser.add_argument("--phone", type=str, default=os.getenv("KRISHA_PHONE"), help="Телефон для входа")
-    parser.add_argument("--password", type=str, default=os.getenv("KRISHA_PASSWORD"), help="Пароль")
-    parser.add_argument("--capsolver-key", type=str, default=os.getenv("CAPSOLVER_API_KEY"), help="CapSolver API key")
-    parser.add_argument("--person", type=int, choices=[1, 2, 3, 4], help="Конфиг для человека 1-4")
+    def __init__(self, output_file: str, with_csv: bool = True, parquet_sink: Optional[ParquetSink] = None, compress: bool = False):
+        self.output_file = output_file
+        self.with_csv = with_csv
+        self.parquet_sink = parquet_sink
+        self.compress = compress
+        self.buffer = RowBuffer(RESULT_FIELDS)
+        self.count = 0
+        self.with_phones = 0
+        self.waiting = []  # Действия до следующего сброса
+        self.writer = Writer(PIPELINE_QUEUE)
+        RESULT_SINKS.append(self)
     
-    args = parser.parse_args()
+    def write(self, listing_data: PhoneListing):
+        self.count += 1
+        if listing_data.phones:
+            self.with_phones += 1
+        self.writer.put(self._write, listing_data)
     
-    # Если указан person, используем готовый конфиг
-    if args.person:
-        config = PERSON_CONFIGS[args.person]
-        districts = config["districts"]
-        city = config["city"]
-        print(f"[CONFIG] Человек {args.person}: {city}, районы: {districts}")
-    else:
-        districts = [args.district]
-        city = args.city
+    def after_flush(self, action: Callable):
+        """action после сброса всех уже записанных строк (сразу, если сбрасывать нечего)"""
+        self.writer.put(self._after_flush, action)
     
-    if args.capsolver_key:
-        CAPSOLVER_API_KEY = args.capsolver_key
-        print(f"[CAPSOLVER] ✓ API ключ установлен")
+    def close(self):
+        """Дописывает очередь и последнюю пачку; после ошибки записи отложенные действия не выполняются"""
+        if self in RESULT_SINKS:
+            RESULT_SINKS.remove(self)
+        try:
+            self.writer.put(self._flush)
+            self.writer.close()
+        finally:
+            close_result_writers()
     
-    if not args.phone or not args.password:
-        print("[WARN] ⚠️ Логин/пароль не заданы! Телефоны могут быть недоступны.")
+    # Дальше - поток записи
     
-    # Выходной файл
-    output_file = args.output or f"krisha_{city}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    def _write(self, listing_data: PhoneListing):
+        with METRICS.stage("write"):
+            save_results(self.output_file, [listing_data], with_csv=self.with_csv, compress=self.compress)
+            self.buffer.append(listing_data)
+            if len(self.buffer) >= PARQUET_FLUSH_EVERY:
+                self._flush()
     
-    print(f"\n{'='*60}")
-    print(f"KRISHA.KZ PHONE PARSER")
-    print(f"{'='*60}")
-    print(f"Город: {city}")
-    print(f"Районы: {districts}")
-    print(f"Страниц: {args.pages}")
-    print(f"Вывод: {output_file}")
-    print(f"{'='*60}\n")
+    def _after_flush(self, action: Callable):
+        if len(self.buffer):
+            self.waiting.append(action)
+        else:
+            action()
+    
+    def _flush(self):
+        """Пачка в Parquet, CSV/JSONL с fsync, затем отложенные действия"""
+        if self.parquet_sink:
+            self.parquet_sink.write(self.buffer)
+        self.buffer.clear()
+        for writer in RESULT_WRITERS.values():
+            writer.flush(sync=True)
+        waiting, self.waiting = self.waiting, []
+        for action in waiting:
+            action()
+
+
+def export_metrics():
+    """Выгрузка метрик в METRICS_TEXTFILE / RUN_SUMMARY_PATH"""
+    METRICS.export(METRICS_TEXTFILE, RUN_SUMMARY_PATH)
+
+
+def replay_store(store_dir: str, output_file: str, with_csv: bool = True, parquet_sink: Optional[ParquetSink] = None, compress: bool = False):
+    """Перепарсинг сохранённых страниц без сети (телефоны не запрашиваются)"""
+    store = PageStore(store_dir)
+    print(f"[REPLAY] {store_dir} -> {output_file}")
+    
+    sink = ResultSink(output_file, with_csv, parquet_sink, compress)
+    try:
+        for entry, html in store.iter_listing_pages():
+            listing = extract_listing(html, entry["url"], entry.get("city") or "", entry["fetched_at"])
+            sink.write(PhoneListing.extend(listing, phones="", phone_status="replay"))
+    finally:
+        sink.close()
+    print(f"[REPLAY] ✓ Обработано: {sink.count}")
+
+
+def iter_listings(city: str, districts: List[str], pages: int = 1, phone: Optional[str] = None, password: Optional[str] = None,
+                  headless: bool = False, max_listings: int = 0, incremental: int = 0,
+                  page_store: Optional[PageStore] = None, seen_index: Optional[SeenIndex] = None,
+                  checkpoint: Optional[Checkpoint] = None, resume: Optional[Dict] = None,
+                  output: Optional[str] = None) -> Iterator[PhoneListing]:
+    """Объявления с результатом запроса телефона, по мере обхода (генератор)
+    Драйвер создаётся и закрывается внутри. Следующее объявление грузится, когда
+    потребитель обработал уже отданные: память не растёт, чекпоинт не обгоняет вывод.
+    output - файл вывода, запоминается в чекпоинте для --resume
+    """
+    global IS_LOGGED_IN, CONSECUTIVE_ERRORS
     
-    # Создаём драйвер
-    driver = make_driver(headless=args.headless, mobile_ua=False)
+    driver = make_driver(headless=headless, mobile_ua=False)
     
-    all_results = []
-    processed = 0
-    next_pause = random.randint(*LONG_PAUSE_EVERY)
+    processed = resume.get("processed", 0) if resume else 0
+    next_pause = processed + random.randint(*LONG_PAUSE_EVERY)
+    
+    def save_checkpoint(district: str, page: int, index: int = 0, pending: Optional[List[str]] = None):
+        """Позиция обхода; pending=None - страницу нужно загрузить целиком"""
+        if checkpoint:
+            # Сначала данные, потом позиция
+            after_output(partial(checkpoint.save, city=city, district=district, page=page, index=index,
+                                 pending=pending, processed=processed, output=output))
+    
+    def parse_stage(item: Tuple) -> PhoneListing:
+        """Поток разбора: HTML + результат телефона -> строка вывода"""
+        listing_url, html, phones, meta, fetched_at = item
+        # Стадии как в krisha_parser: parse - дерево HTML, extract - поля записи
+        with METRICS.stage("parse"):
+            soup = make_soup(html)
+        with METRICS.stage("extract"):
+            listing = parse_listing_page(soup, CITY_NAMES.get(city, ""), listing_url, fetched_at)
+        if phones:
+            return PhoneListing.extend(listing, phones=",".join(phones), phone_status="ok")
+        return PhoneListing.extend(listing, phones="", phone_status=meta.get("error", "unknown"))
+    
+    def deliver(results: List[Optional[PhoneListing]]) -> Iterator[PhoneListing]:
+        """Отдаёт разобранные записи; в seen_index - после того, как потребитель их обработал"""
+        for listing_data in results:
+            if listing_data is None:
+                continue
+            yield listing_data
+            METRICS.inc("listings_total", result="phone" if listing_data.phones else "no_phone")
+            METRICS.inc("phone_status_total", status=listing_data.phone_status)
+            # Без телефона объявление не считается собранным - повторим в следующий раз
+            if seen_index and listing_data.phones:
+                # Отметка не должна обгонять вывод
+                after_output(partial(seen_index.mark, listing_data.id, listing_data.price_kzt, listing_data.scraped_at.isoformat()))
+    
+    pipeline = Pipeline(parse_stage, PIPELINE_WORKERS, PIPELINE_QUEUE,
+                        on_error=lambda stage, e: METRICS.error(e, stage))
     
     try:
         for district in districts:
+            start_page = 1
+            pending = None
+            if resume:
+                if resume["city"] != city or resume["district"] != district:
+                    continue
+                start_page = resume["page"]
+                pending = resume.get("pending")
+                resume = None
+            else:
+                save_checkpoint(district, 1)
+            
             print(f"\n{'='*60}")
             print(f"РАЙОН: {district}")
             print(f"{'='*60}")
             
-            for page in range(1, args.pages + 1):
+            known_streak = 0  # Страниц подряд только из уже собранных ID
+            for page in range(start_page, pages + 1):
                 search_url = build_search_url(city, district, page)
                 print(f"\n[PAGE {page}] {search_url}")
                 
-                listing_urls = get_listing_urls(driver, search_url)
-                print(f"[PAGE {page}] Найдено {len(listing_urls)} объявлений")
+                if pending is not None:
+                    # Страница начата в прошлом запуске - берём необработанные
+                    listing_urls = pending
+                    pending = None
+                    print(f"[RESUME] Осталось {len(listing_urls)} объявлений")
+                else:
+                    with METRICS.stage("search"):
+                        listing_urls = get_listing_urls(driver, search_url)
+                    print(f"[PAGE {page}] Найдено {len(listing_urls)} объявлений")
+                    METRICS.inc("pages_total")
+                    
+                    ids = [listing_id(url) for url in listing_urls]
+                    if seen_index and ids and len(seen_index.known(ids)) == len(ids):
+                        known_streak += 1
+                    else:
+                        known_streak = 0
                 
                 if not listing_urls:
                     print("[WARN] Нет объявлений на странице")
                     continue
                 
                 for idx, listing_url in enumerate(listing_urls, 1):
-                    if args.max_listings > 0 and processed >= args.max_listings:
-                        print(f"\n[LIMIT] Достигнут лимит {args.max_listings} объявлений")
+                    yield from deliver(pipeline.take())
+                    
+                    if max_listings > 0 and processed >= max_listings:
+                        print(f"\n[LIMIT] Достигнут лимит {max_listings} объявлений")
                         break
                     
+                    # Загруженные, но ещё не отданные тоже остаются в pending
+                    in_flight = pipeline.in_flight()
+                    save_checkpoint(district, page, idx - 1 - len(in_flight), in_flight + listing_urls[idx - 1:])
+                    
+                    if seen_index and listing_id(listing_url) in seen_index:
+                        print(f"[SKIP] Уже собрано: {listing_url}")
+                        METRICS.inc("listings_total", result="seen")
+                        continue
+                    
                     processed += 1
                     print(f"\n[{idx}/{len(listing_urls)} | #{processed}] {listing_url}")
                     
                     try:
-                        # Парсим данные объявления
-                        driver.get(listing_url)
-                        time.sleep(random.uniform(2, 4))
+                        # Загружаем страницу объявления; разбирается она в потоке конвейера
+                        with METRICS.stage("fetch"):
+                            driver.get(listing_url)
+                        with METRICS.stage("delay"):
+                            time.sleep(random.uniform(2, 4))
                         
-                        listing_data = parse_listing_details(driver.page_source, listing_url)
+                        with METRICS.stage("fetch"):
+                            html = driver.page_source
+                            if page_store:
+                                page_store.put(listing_url, html)
                         
                         # Получаем телефон
-                        phones, meta = reveal_phone_on_page(driver, listing_url, args.phone, args.password)
+                        with METRICS.stage("phone"):
+                            phones, meta = reveal_phone_on_page(driver, listing_url, phone, password)
                         
                         if phones:
-                            listing_data["phones"] = ",".join(phones)
-                            listing_data["phone_status"] = "ok"
                             print(f"[OK] ✓ {', '.join(phones)}")
                             CONSECUTIVE_ERRORS = 0
                         else:
-                            listing_data["phones"] = ""
-                            listing_data["phone_status"] = meta.get("error", "unknown")
-                            
                             if meta.get("is_ban"):
                                 CONSECUTIVE_ERRORS += 1
+                                METRICS.inc("ban_suspected_total")
                                 print(f"[BAN?] ⚠️ Ошибка ({CONSECUTIVE_ERRORS}/{MAX_ERRORS_BEFORE_BAN})")
                                 
                                 if CONSECUTIVE_ERRORS >= MAX_ERRORS_BEFORE_BAN:
-                                    handle_ban_cooldown()
+                                    with METRICS.stage("ban_cooldown"):
+                                        handle_ban_cooldown()
                                     CONSECUTIVE_ERRORS = 0
                                     
                                     driver.quit()
-                                    driver = make_driver(headless=args.headless, mobile_ua=False)
+                                    driver = make_driver(headless=headless, mobile_ua=False)
                                     IS_LOGGED_IN = False
                             else:
                                 CONSECUTIVE_ERRORS = 0
                             
                             print(f"[MISS] ✗ {meta.get('error', '?')}")
                         
-                        listing_data["parsed_at"] = now_iso()
-                        all_results.append(listing_data)
-                        
-                        # Инкрементальное сохранение
-                        save_results(output_file, [listing_data])
+                        # Ждёт, только если разбор отстал на PIPELINE_QUEUE страниц
+                        pipeline.submit((listing_url, html, phones, meta, now_iso()), key=listing_url)
                         
                     except KeyboardInterrupt:
                         raise
                     except Exception as e:
                         print(f"[ERR] ✗ {e!r}")
+                        METRICS.error(e, "fetch")
                         
                         if "session" in str(e).lower():
                             driver.quit()
-                            driver = make_driver(headless=args.headless, mobile_ua=False)
+                            driver = make_driver(headless=headless, mobile_ua=False)
                             IS_LOGGED_IN = False
                     
                     # Долгая пауза
                     if processed >= next_pause:
                         pause = random.randint(*LONG_PAUSE_DURATION)
                         print(f"\n[PAUSE] ⏸ {pause} сек...")
-                        time.sleep(pause)
+                        with METRICS.stage("delay"):
+                            time.sleep(pause)
                         next_pause = processed + random.randint(*LONG_PAUSE_EVERY)
                     
                     # Пауза между объявлениями
                     sleep_range(SLEEP_BETWEEN_ADS)
                 
+                # Страница отдана целиком - чекпоинт может перейти на следующую
+                yield from deliver(pipeline.drain())
+                save_checkpoint(district, page + 1)
+                export_metrics()
+                
+                if incremental and known_streak >= incremental:
+                    print(f"\n[INCREMENTAL] {known_streak} стр. подряд без новых объявлений, район обновлён")
+                    break
+                
                 # Пауза между страницами
                 sleep_range(SLEEP_BETWEEN_PAGES)
         
-        print(f"\n{'='*60}")
-        print(f"✓ ГОТОВО!")
-        print(f"Обработано: {processed}")
-        print(f"С телефонами: {sum(1 for r in all_results if r.get('phones'))}")
-        print(f"Файл: {output_file}")
-        print(f"{'='*60}")
+        pipeline.close()
+        yield from deliver(pipeline.take())
+        if checkpoint and not resume:
+            # После отложенных сохранений, иначе они вернут файл
+            after_output(checkpoint.clear)
         
     except KeyboardInterrupt:
-        print(f"\n\n⚠ [INTERRUPT] | Обработано: {processed}")
+        # Отдаём уже загруженное: разбор без сети занимает секунды
+        pipeline.close()
+        yield from deliver(pipeline.take())
+        raise
     finally:
+        pipeline.close()
         try:
             driver.quit()
         except:
             pass
+    
+    print(f"\n[DONE] Обработано объявлений: {processed}")
+
+
+def main():
+    global CAPSOLVER_API_KEY, METRICS_TEXTFILE, RUN_SUMMARY_PATH
+    
+    parser = argparse.ArgumentParser(description="Krisha.kz Phone Parser")
+    parser.add_argument("--city", choices=["almaty", "astana"], help="Город")
+    parser.add_argument("--district", help="Район (slug без города)")
+    parser.add_argument("--pages", type=int, default=1, help="Количество страниц")
+    parser.add_argument("--max-listings", type=int, default=0, help="Макс. объявлений (0 = все)")
+    parser.add_argument("--output", type=str, default="", help="Файл вывода")
+    parser.add_argument("--headless", action="store_true", help="Режим без GUI")
+    parser.add_argument("--phone", type=str, default=os.getenv("KRISHA_PHONE"), help="Телефон для входа")
+    parser.add_argument("--password", type=str, default=os.getenv("KRISHA_PASSWORD"), help="Пароль")
+    parser.add_argument("--capsolver-key", type=str, default=os.getenv("CAPSOLVER_API_KEY"), help="CapSolver API key")
+    parser.add_argument("--person", type=int, choices=[1, 2, 3, 4], help="Конфиг для человека 1-4")
+    parser.add_argument("--page-store", type=str, default="krisha_pages", help="Папка для сырых HTML ('' = не сохранять)")
+    parser.add_argument("--seen-index", type=str, default="krisha_phone_seen.sqlite", help="База уже собранных ID ('' = собирать всё)")
+    parser.add_argument("--checkpoint", type=str, default="krisha_phone_checkpoint.json", help="Файл состояния обхода ('' = не сохранять)")
+    parser.add_argument("--resume", action="store_true", help="Продолжить с последнего чекпоинта")
+    parser.add_argument("--incremental", type=int, default=0, metavar="N",
+                        help="Закончить район после N страниц подряд из уже собранных ID (0 = выкл)")
+    parser.add_argument("--replay", action="store_true", help="Перепарсить сохранённые страницы без сети")
+    parser.add_argument("--format", choices=["csv", "parquet", "both"], default="csv", help="Формат вывода (JSONL пишется всегда)")
+    parser.add_argument("--jsonl-zstd", action="store_true", help="Сжимать JSONL (zstd, нужен zstandard)")
+    parser.add_argument("--parquet-dir", type=str, default="krisha_parquet", help="Папка Parquet-датасета")
+    parser.add_argument("--metrics-textfile", type=str, default="krisha_phone_metrics.prom", help="Метрики для node_exporter textfile collector ('' = не писать)")
+    parser.add_argument("--run-summary", type=str, default="krisha_phone_run_summary.json", help="JSON-итог запуска ('' = не писать)")
+    parser.add_argument("--html-backend", choices=BACKENDS, default=None, help="Парсер HTML (по умолчанию KRISHA_HTML_BACKEND или html.parser)")
+    
+    args = parser.parse_args()
+    METRICS_TEXTFILE = args.metrics_textfile or None
+    RUN_SUMMARY_PATH = args.run_summary or None
+    
+    if args.html_backend:
+        set_backend(args.html_backend)
+    
+    with_csv = args.format in ("csv", "both")
+    parquet_sink = ParquetSink(args.parquet_dir, PHONE_SCHEMA, "scraped_at") if args.format in ("parquet", "both") else None
+    
+    if args.replay:
+        if not args.page_store:
+            parser.error("--replay требует --page-store")
+        replay_store(args.page_store, args.output or "krisha_replay.csv", with_csv, parquet_sink, args.jsonl_zstd)
+        return
+    
+    if not args.city or not args.district:
+        parser.error("нужны --city и --district")
+    
+    page_store = PageStore(args.page_store) if args.page_store else None
+    seen_index = SeenIndex(args.seen_index) if args.seen_index else None
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    resume = None
+    if args.resume:
+        resume = checkpoint.load() if checkpoint else None
+        if resume:
+            print(f"[RESUME] Район {resume['district']}, страница {resume['page']}, осталось {len(resume['pending'] or [])}")
+        else:
+            print("[RESUME] Чекпоинт не найден, начинаем сначала")
+    
+    # Если указан person, используем готовый конфиг
+    if args.person:
+        config = PERSON_CONFIGS[args.person]
+        districts = config["districts"]
+        city = config["city"]
+        print(f"[CONFIG] Человек {args.person}: {city}, районы: {districts}")
+    else:
+        districts = [args.district]
+        city = args.city
+    
+    if args.capsolver_key:
+        CAPSOLVER_API_KEY = args.capsolver_key
+        print(f"[CAPSOLVER] ✓ API ключ установлен")
+    
+    if not args.phone or not args.password:
+        print("[WARN] ⚠️ Логин/пароль не заданы! Телефоны могут быть недоступны.")
+    
+    # Выходной файл (при --resume дописываем в файл прошлого запуска)
+    output_file = args.output or (resume and resume.get("output")) or f"krisha_{city}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    
+    print(f"\n{'='*60}")
+    print(f"KRISHA.KZ PHONE PARSER")
+    print(f"{'='*60}")
+    print(f"Город: {city}")
+    print(f"Районы: {districts}")
+    print(f"Страниц: {args.pages}")
+    print(f"Вывод: {output_file}")
+    print(f"{'='*60}\n")
+    
+    METRICS.info.update(script="krisha_parser_phone", city=city, districts=districts)
+    
+    sink = ResultSink(output_file, with_csv, parquet_sink, args.jsonl_zstd)
+    listings = iter_listings(city, districts, args.pages, args.phone, args.password, args.headless,
+                             args.max_listings, args.incremental, page_store, seen_index, checkpoint,
+                             resume, output_file)
+    try:
+        for listing_data in listings:
+            sink.write(listing_data)
+        
+        print(f"\n{'='*60}")
+        print(f"✓ ГОТОВО!")
+        print(f"Записано: {sink.count}")
+        print(f"С телефонами: {sink.with_phones}")
+        print(f"Файл: {output_file}")
+        print(f"{'='*60}")
+        
+    except KeyboardInterrupt:
+        print(f"\n\n⚠ [INTERRUPT] | Записано: {sink.count}")
+        if checkpoint:
+            print("[RESUME] Продолжить: добавьте --resume")
+    finally:
+        # Генератор закрывает драйвер и конвейер, синк дописывает файлы
+        listings.close()
+        sink.close()
+        export_metrics()
 
 
 if __name__ == "__main__":
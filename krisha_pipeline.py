@@ -0,0 +1,169 @@
+import queue
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+
+# конвейер обхода: загрузка (вызывающий поток) -> разбор (пул потоков) -> запись (один поток)
+# генератор iter_listings забирает готовые результаты через take() и отдаёт их наружу,
+# синки вывода передают запись в Writer: диск не стоит на пути загрузки
+# очереди ограничены: если разбор или запись отстают, submit() / put() ждут (backpressure)
+# потоки, а не процессы: загрузка почти всё время спит между запросами, GIL не мешает
+
+_STOP = object()
+
+
+class PipelineError(RuntimeError):
+    """стадия записи упала, вывод дальше не принимается"""
+
+# как часто ожидание в drain() перепроверяет состояние
+POLL_SECONDS = 0.5
+
+
+class Pipeline:
+    """parse(item) -> result в пуле потоков; take() отдаёт результаты в порядке submit()
+    если parse упал, результатом будет None (ошибка уходит в on_error('parse', e))
+    элемент считается "в полёте", пока его результат не забран take()
+    """
+
+    def __init__(self, parse: Callable[[Any], Any], workers: int = 2, queue_size: int = 8,
+                 on_error: Optional[Callable[[str, Exception], None]] = None):
+        self.parse = parse
+        self.on_error = on_error
+        self.lock = threading.RLock()
+        self._parsed = threading.Condition(self.lock)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._in_flight = OrderedDict()  # номер -> ключ, ещё не забранные
+        self._done = {}  # номер -> результат, разобранные, но не забранные
+        self._seq = 0
+        self._next = 0  # номер, который take() отдаст следующим
+        self._closed = False
+
+        self._workers = [
+            threading.Thread(target=self._parse_loop, name=f'parse-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._workers:
+            thread.start()
+
+    def submit(self, item: Any, key: Optional[Hashable] = None):
+        """отдаёт загруженную страницу на разбор; ждёт, если очередь полна"""
+        with self.lock:
+            seq = self._seq
+            self._seq += 1
+            self._in_flight[seq] = key
+        self._queue.put((seq, item))
+
+    def take(self) -> List[Any]:
+        """готовые результаты по порядку, без ожидания (может быть пусто)"""
+        with self.lock:
+            results = []
+            while self._next in self._done:
+                results.append(self._done.pop(self._next))
+                self._in_flight.pop(self._next, None)
+                self._next += 1
+            return results
+
+    def drain(self) -> List[Any]:
+        """ждёт разбора всего отданного и забирает результаты"""
+        with self._parsed:
+            while len(self._done) < len(self._in_flight):
+                self._parsed.wait(POLL_SECONDS)
+            return self.take()
+
+    def in_flight(self) -> List[Hashable]:
+        """ключи отданных, но ещё не забранных элементов, в порядке submit()"""
+        with self.lock:
+            return list(self._in_flight.values())
+
+    def close(self):
+        """останавливает потоки; уже отданное успевает разобраться, забрать его - take()"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for thread in self._workers:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _parse_loop(self):
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                return
+            seq, item = task
+            try:
+                result = self.parse(item)
+            except Exception as e:
+                print(f"ошибка разбора: {e!r}")
+                if self.on_error:
+                    self.on_error('parse', e)
+                result = None
+            with self._parsed:
+                self._done[seq] = result
+                self._parsed.notify_all()
+
+
+class Writer:
+    """стадия записи: один поток выполняет вызовы put(func, *args) в порядке поступления
+    вывод (файлы, чекпоинт, seen_index) трогает только этот поток, поэтому без блокировок
+    после ошибки оставшиеся вызовы пропускаются, ошибка поднимается в следующем put() или в close()
+    """
+
+    def __init__(self, queue_size: int = 8, name: str = 'write'):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._reported = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, func: Callable, *args):
+        """ставит вызов в очередь; ждёт, если очередь полна"""
+        self._raise_error()
+        while True:
+            try:
+                self._queue.put((func, args), timeout=POLL_SECONDS)
+                return
+            except queue.Full:
+                self._raise_error()
+
+    def close(self):
+        """выполняет всё отданное и останавливает поток"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _raise_error(self):
+        # поднимается один раз: повторный close() в обработчике её не дублирует
+        if self._error is not None and not self._reported:
+            self._reported = True
+            raise PipelineError(f"стадия записи упала: {self._error!r}") from self._error
+
+    def _loop(self):
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                return
+            if self._error is not None:
+                continue
+            func, args = task
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"ошибка записи: {e!r}")
+                self._error = e
@@ -0,0 +1,213 @@
+import os
+import re
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from krisha_io import RowBuffer, CsvWriter, JsonlWriter, ParquetSink, Listing, PhoneListing, SCHEMAS, schema_fields, read_archive, upgrade_record
+from krisha_store import PageStore
+
+
+# массовый перепарсинг архива без сети, на всех ядрах
+# источник: папка PageStore (index.jsonl + blobs), папка *.html / *.html.gz или raw JSONL
+# запуск: python krisha_reparse.py krisha_pages --parser listing --out reparsed.csv
+#         python krisha_reparse.py krisha_almaty_all_raw.jsonl --out backfill.jsonl --workers 8
+# порядок записей в выводе - порядок источника, от числа процессов не зависит
+
+CHUNK_SIZE = 64  # страниц в одной единице работы
+QUEUE_PER_WORKER = 4  # единиц работы в полёте на процесс
+
+PAGE_NAME_RE = re.compile(r'(?:listing_)?(\d+)\.html(?:\.gz)?')
+
+# парсер -> тип записи вывода
+RECORD_TYPES = {'listing': Listing, 'phone': PhoneListing}
+
+_stores = {}  # корень PageStore -> объект, свой в каждом процессе
+
+
+def iter_items(source: str) -> Iterator[tuple]:
+    """единицы источника: ('store', корень, запись журнала), ('file', путь, ID) или ('record', словарь)"""
+    path = Path(source)
+    if path.is_dir() and (path / 'index.jsonl').is_file():
+        for entry in PageStore(source).latest_listings():
+            yield ('store', source, entry)
+    elif path.is_dir():
+        for file in sorted(path.rglob('*.html*')):
+            match = PAGE_NAME_RE.fullmatch(file.name)
+            if match:
+                yield ('file', str(file), match.group(1))
+    else:
+        for record in read_archive(source):
+            yield ('record', record)
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_page(item: tuple) -> tuple:
+    """(url, html, время загрузки, город) для страницы из PageStore или файла"""
+    kind, location, meta = item
+    if kind == 'store':
+        store = _stores.get(location)
+        if store is None:
+            store = _stores[location] = PageStore(location)
+        return meta['url'], store.get(meta['sha256']), meta['fetched_at'], meta.get('city') or ''
+
+    if location.endswith('.gz'):
+        import gzip
+        with gzip.open(location, 'rb') as f:
+            html = f.read().decode('utf-8')
+    else:
+        html = Path(location).read_text(encoding='utf-8')
+    fetched_at = datetime.fromtimestamp(os.path.getmtime(location)).astimezone().isoformat()
+    return f'https://krisha.kz/a/show/{meta}', html, fetched_at, ''
+
+
+def rederive(record: Dict) -> Dict:
+    """пересчитывает производные поля записи из сохранённых сырых текстов
+    записи krisha_parser_phone старого формата сначала приводятся к общей схеме
+    """
+    import krisha_extract
+
+    data = upgrade_record(dict(record))
+    if data.get('id') not in (None, ''):
+        data['id'] = int(data['id'])
+    if data.get('title_raw'):
+        parsed = krisha_extract.parse_title(data['title_raw'])
+        data.update({key: value for key, value in parsed.items() if value is not None})
+    if data.get('price_raw'):
+        data['price_kzt'] = krisha_extract.parse_price(data['price_raw']) or data.get('price_kzt')
+    if 'description_raw' in data:
+        data['description_clean'] = krisha_extract.clean_description(data['description_raw'] or '')
+    if data.get('address'):
+        data['district'] = krisha_extract.extract_district_clean(data['address']) or data.get('district')
+        data['district_slug'] = krisha_extract.district_slug(data['address']) or data.get('district_slug')
+    data['microdistrict'] = krisha_extract.extract_microdistrict((data.get('title_raw') or '') + ' ' + (data.get('address') or ''))
+    return data
+
+
+def parse_item(parser_name: str, item: tuple) -> Optional[Listing]:
+    if item[0] == 'record':
+        return RECORD_TYPES[parser_name].from_dict(rederive(item[1]))
+
+    import krisha_extract
+
+    url, html, fetched_at, city = load_page(item)
+    listing = krisha_extract.extract_listing(html, url, city, fetched_at)
+    if parser_name == 'listing':
+        if not (listing.title_raw or listing.description_raw):
+            return None
+        return listing
+    return PhoneListing.extend(listing, phones='', phone_status='replay')
+
+
+def parse_chunk(task: tuple) -> List[Listing]:
+    """единица работы процесса: список записей в порядке входа"""
+    parser_name, items = task
+    results = []
+    for item in items:
+        try:
+            data = parse_item(parser_name, item)
+        except Exception as e:
+            print(f"[WARN] {item[1]}: {e}")
+            continue
+        if data is not None:
+            results.append(data)
+    return results
+
+
+def iter_results(parser_name: str, items: Iterable[tuple], workers: int, chunk_size: int = CHUNK_SIZE) -> Iterator[Listing]:
+    """записи в порядке источника
+    пул получает не больше workers * QUEUE_PER_WORKER единиц вперёд, результаты забираются по порядку
+    """
+    tasks = ((parser_name, chunk) for chunk in chunked(items, chunk_size))
+    if workers <= 1:
+        for task in tasks:
+            yield from parse_chunk(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(parse_chunk, task))
+            if len(pending) >= workers * QUEUE_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def reparse(source: str, parser_name: str, out: Optional[str], parquet_dir: Optional[str] = None,
+            workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """перепарсивает источник в CSV / JSONL(.zst) и/или Parquet, возвращает число записей"""
+    schema, date_column = SCHEMAS[parser_name]
+    fields = schema_fields(schema)
+    workers = workers or os.cpu_count() or 1
+
+    writer = None
+    if out:
+        if out.endswith('.jsonl') or out.endswith('.jsonl.zst'):
+            writer = JsonlWriter(out[:-4] if out.endswith('.zst') else out, compress=out.endswith('.zst'))
+        else:
+            writer = CsvWriter(out, fields, encoding='utf-8-sig')
+    sink = ParquetSink(parquet_dir, schema, date_column) if parquet_dir else None
+    buffer = RowBuffer(fields)
+
+    total = 0
+    start = time.perf_counter()
+    try:
+        for data in iter_results(parser_name, iter_items(source), workers, chunk_size):
+            if writer:
+                writer.write(data)
+            if sink:
+                buffer.append(data)
+                if len(buffer) >= 50000:
+                    sink.write(buffer)
+                    buffer.clear()
+            total += 1
+            if total % 10000 == 0:
+                print(f"  {total} записей, {total / (time.perf_counter() - start):.0f}/сек")
+        if sink:
+            sink.write(buffer)
+    finally:
+        if writer:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"перепарсено {total} записей за {elapsed:.1f} сек ({workers} процессов)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="массовый перепарсинг сохранённых страниц krisha")
+    parser.add_argument("source", help="папка PageStore, папка *.html или raw JSONL(.zst)")
+    parser.add_argument("--parser", choices=sorted(SCHEMAS), default='listing',
+                        help="listing - запись krisha_parser, phone - запись krisha_parser_phone (с пустыми телефонами)")
+    parser.add_argument("--out", help="файл вывода: .csv, .jsonl или .jsonl.zst")
+    parser.add_argument("--parquet-dir", help="папка Parquet-датасета")
+    parser.add_argument("--workers", type=int, default=None, help="процессов (по умолчанию все ядра)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="страниц в единице работы")
+    args = parser.parse_args()
+
+    if not args.out and not args.parquet_dir:
+        parser.error("нужен --out и/или --parquet-dir")
+    if args.out and os.path.exists(args.out):
+        parser.error(f"{args.out} уже существует")
+
+    reparse(args.source, args.parser, args.out, args.parquet_dir, args.workers, args.chunk_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import re
+import html
+from typing import Dict, Iterable, List, Optional, Union
+
+
+# страница поиска без построения дерева: один проход регуляркой по сырым байтам
+# ID объявлений (по порядку, без повторов), карточки и состояние пагинации
+
+
+SEARCH_RE = re.compile(
+    # кнопка "Дальше": <a class="... paginator__btn--next ..." href="?page=3">
+    rb'<a\b(?P<next>[^>]{0,500}?paginator__btn--next[^>]{0,500})>'
+    # начало карточки: <div class="a-card ..." data-id="681234567">, атрибуты в любом порядке
+    rb'|<div\b(?=[^>]{0,600}?(?<![\w-])a-card(?![\w-]))[^>]{0,600}?\sdata-id="(?P<card>\d+)"'
+    # поля карточки: текст до первого тега внутри a-card__title / __price / __subtitle
+    # (у цены это число без значка валюты)
+    rb'|class="[^"]{0,200}?(?<![\w-])a-card__(?P<field>title|price|subtitle)(?![\w-])[^>]{0,300}>\s*(?P<text>[^<]{0,500})'
+    # ссылка на объявление, как в href="/a/show/681234567" или абсолютная
+    rb'|href=["\'][^"\'<>]{0,200}?/a/show/(?P<id>\d+)'
+)
+DISABLED_RE = re.compile(rb'\sdisabled(?:[\s=/]|$)')
+NEXT_PAGE_RE = re.compile(rb'[?&]page=(\d+)')
+
+# хвост буфера, который переносится в следующий кусок:
+# больше самого длинного совпадения SEARCH_RE, чтобы не разрезать его
+OVERLAP = 2048
+
+
+class SearchScanner:
+    """потоковый разбор страницы поиска: feed() по кускам, close() в конце"""
+
+    def __init__(self):
+        self.ids = []
+        self.cards = {}  # ID -> частичная запись из карточки
+        self.has_next = False
+        self.next_page = None
+        self._seen = set()
+        self._card = None
+        self._tail = b''
+
+    def feed(self, chunk: bytes):
+        buffer = self._tail + chunk
+        cut = max(len(buffer) - OVERLAP, 0)
+        self._scan(buffer, cut)
+        self._tail = buffer[cut:]
+
+    def close(self) -> 'SearchScanner':
+        self._scan(self._tail, len(self._tail))
+        self._tail = b''
+        return self
+
+    def _scan(self, buffer: bytes, cut: int):
+        # совпадения, начавшиеся в хвосте, найдутся ещё раз в следующем буфере
+        for match in SEARCH_RE.finditer(buffer, 0, len(buffer)):
+            if match.start() >= cut:
+                break
+            listing_id, card_id, field, next_attrs = match.group('id', 'card', 'field', 'next')
+            if listing_id is not None:
+                self._add_id(int(listing_id))
+            elif card_id is not None:
+                card_id = int(card_id)
+                self._add_id(card_id)
+                self._card = self.cards.setdefault(card_id, {})
+            elif field is not None:
+                if self._card is not None:
+                    self._card.setdefault(field.decode(), match.group('text'))
+            elif not DISABLED_RE.search(next_attrs):
+                self.has_next = True
+                page = NEXT_PAGE_RE.search(next_attrs)
+                if page:
+                    self.next_page = int(page.group(1))
+
+    def _add_id(self, listing_id: int):
+        if listing_id not in self._seen:
+            self._seen.add(listing_id)
+            self.ids.append(listing_id)
+
+    def card_records(self) -> List[Dict]:
+        """карточки в порядке страницы: id, title_raw, price_kzt, address"""
+        records = []
+        for listing_id in self.ids:
+            card = self.cards.get(listing_id)
+            if card is None:
+                continue
+            record = {'id': listing_id, 'title_raw': '', 'price_kzt': None, 'address': ''}
+            if 'title' in card:
+                record['title_raw'] = _text(card['title'])
+            if 'price' in card:
+                digits = re.sub(r'\D', '', _text(card['price']))
+                record['price_kzt'] = int(digits) if digits else None
+            if 'subtitle' in card:
+                record['address'] = _text(card['subtitle'])
+            records.append(record)
+        return records
+
+    def urls(self) -> List[str]:
+        return [listing_url(listing_id) for listing_id in self.ids]
+
+
+def _text(raw: bytes) -> str:
+    return ' '.join(html.unescape(raw.decode('utf-8', errors='replace')).split())
+
+
+def listing_url(listing_id: int) -> str:
+    return f'https://krisha.kz/a/show/{listing_id}'
+
+
+def scan_search_page(source: Union[bytes, str, Iterable[bytes]]) -> SearchScanner:
+    """разбирает страницу поиска из байтов, строки или итератора кусков (iter_content)"""
+    scanner = SearchScanner()
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    if isinstance(source, bytes):
+        scanner.feed(source)
+    else:
+        for chunk in source:
+            scanner.feed(chunk)
+    return scanner.close()
@@ -0,0 +1,182 @@
+import os
+import re
+import gzip
+import json
+import sqlite3
+import threading
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# локальные хранилища краулера
+
+
+def listing_id(url: str) -> Optional[str]:
+    """ID объявления из URL вида /a/show/123456"""
+    match = re.search(r'/a/show/(\d+)', url)
+    if match:
+        return match.group(1)
+    return None
+
+
+class PageStore:
+    """хранилище сырых HTML страниц
+    содержимое лежит один раз по sha256 (blobs/ab/abcd....html.gz),
+    index.jsonl - журнал загрузок: id, url, время, хэш и доп. поля
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.blobs_dir = os.path.join(root, 'blobs')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self._by_url = None  # url -> последняя запись журнала, строится при первом latest()
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest[:2], digest + '.html.gz')
+
+    def put(self, url: str, html: str, fetched_at: Optional[str] = None, **meta) -> str:
+        """сохраняет страницу, возвращает её хэш"""
+        raw = html.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + '.tmp'
+            with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                f.write(raw)
+            os.replace(tmp_path, path)
+
+        entry = {
+            'id': listing_id(url),
+            'url': url,
+            'fetched_at': fetched_at or datetime.now().astimezone().isoformat(),
+            'sha256': digest,
+        }
+        entry.update(meta)
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        if self._by_url is not None:
+            self._by_url[url] = entry
+        return digest
+
+    def get(self, digest: str) -> str:
+        with gzip.open(self._blob_path(digest), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def latest(self, url: str) -> Optional[Dict]:
+        """последняя загрузка URL: хэш и валидаторы etag / last_modified, если сервер их прислал"""
+        if self._by_url is None:
+            self._by_url = {entry['url']: entry for entry in self.entries()}
+        return self._by_url.get(url)
+
+    def entries(self) -> Iterator[Dict]:
+        """записи журнала в порядке загрузки"""
+        if not os.path.isfile(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def latest_listings(self) -> Iterator[Dict]:
+        """последняя загрузка каждого объявления, в порядке первого появления"""
+        # запись заменяется целиком, как в latest(): валидаторы старой загрузки не переживают новую
+        # (ключ dict при замене остаётся на своём месте)
+        latest = {}
+        for entry in self.entries():
+            if entry.get('id'):
+                latest[entry['id']] = entry
+        return iter(latest.values())
+
+    def iter_listing_pages(self) -> Iterator[tuple]:
+        """(запись журнала, html) для последней версии каждого объявления"""
+        for entry in self.latest_listings():
+            yield entry, self.get(entry['sha256'])
+
+
+class SeenIndex:
+    """ID уже собранных объявлений между запусками (sqlite)
+    для каждого ID хранится время последнего сбора и цена
+    одно соединение на все потоки конвейера, запросы по очереди под lock
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS seen ('
+            'id INTEGER PRIMARY KEY, last_seen TEXT NOT NULL, price INTEGER)'
+        )
+
+    def __contains__(self, listing_id) -> bool:
+        return self.get(listing_id) is not None
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def get(self, listing_id) -> Optional[Tuple[str, Optional[int]]]:
+        """(last_seen, price) или None, если ID не встречался"""
+        if listing_id is None:
+            return None
+        with self.lock:
+            return self.conn.execute(
+                'SELECT last_seen, price FROM seen WHERE id = ?', (int(listing_id),)
+            ).fetchone()
+
+    def known(self, listing_ids) -> set:
+        """какие из ID уже есть в индексе (одним запросом)"""
+        ids = [int(i) for i in listing_ids if i is not None]
+        if not ids:
+            return set()
+        placeholders = ','.join('?' * len(ids))
+        with self.lock:
+            rows = self.conn.execute(f'SELECT id FROM seen WHERE id IN ({placeholders})', ids).fetchall()
+        return {row[0] for row in rows}
+
+    def mark(self, listing_id, price: Optional[int] = None, seen_at: Optional[str] = None):
+        """отмечает объявление как собранное"""
+        if listing_id is None:
+            return
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO seen (id, last_seen, price) VALUES (?, ?, ?)',
+                (int(listing_id), seen_at or datetime.now().astimezone().isoformat(), price),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class Checkpoint:
+    """состояние обхода для --resume
+    файл перезаписывается атомарно: пишем во временный и подменяем через os.replace
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        if not os.path.isfile(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, **state):
+        state['updated_at'] = datetime.now().astimezone().isoformat()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,150 @@
+# генерирует districts_legacy.json: выводы сопоставления районов до krisha_districts
+# old_extract_district_clean и old_matches_district - код krisha_parser_phone / krisha_parser
+# до перехода на DistrictResolver, с таблицами районов того времени
+# folding_differences - входы, где новый результат отличается (свёртка ё и казахских букв)
+# запуск из корня репозитория: python tests/fixtures/gen_districts_legacy.py
+import json
+import random
+import re
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT_DIR))
+
+PHONE_DISTRICTS = {
+    "almaty-alatauskij": ["Алатауский", "Алатауский район", "Алатауский р-н"],
+    "almaty-almalinskij": ["Алмалинский", "Алмалинский район", "Алмалинский р-н"],
+    "almaty-aujezovskij": ["Ауэзовский", "Ауэзовский район", "Ауэзовский р-н"],
+    "almaty-bostandykskij": ["Бостандыкский", "Бостандыкский район", "Бостандыкский р-н"],
+    "almaty-zhetysuskij": ["Жетысуский", "Жетысуский район", "Жетысуский р-н"],
+    "almaty-medeuskij": ["Медеуский", "Медеуский район", "Медеуский р-н"],
+    "almaty-nauryzbajskiy": ["Наурызбайский", "Наурызбайский район", "Наурызбайский р-н"],
+    "almaty-turksibskij": ["Турксибский", "Турксибский район", "Турксибский р-н"],
+    "astana-almatinskij": ["Алматы", "Алматы район", "Алматы р-н"],
+    "astana-esilskij": ["Есильский", "Есильский район", "Есильский р-н", "Есиль"],
+    "astana-nura": ["Нуринский", "Нуринский район", "Нуринский р-н", "Нура"],
+    "astana-saryarkinskij": ["Сарыаркинский", "Сарыаркинский район", "Сарыаркинский р-н", "Сарыарка"],
+    "r-n-bajkonur": ["Байконурский", "Байконурский район", "Байконурский р-н", "Байконур"],
+    "astana-saraishyk": ["Сарайшық", "Сарайшықский", "Сарайшық район", "Сарайшық р-н"],
+}
+
+
+def old_extract_district_clean(address_text):
+    all_districts = PHONE_DISTRICTS
+    match = re.search(r'р-н\s+(\w+)', address_text)
+    if match:
+        district_name = match.group(1)
+        for slug, aliases in all_districts.items():
+            for alias in aliases:
+                if district_name.lower() in alias.lower() or alias.lower() in district_name.lower():
+                    return slug
+    match = re.search(r'(\w+)\s+р-н', address_text)
+    if match:
+        district_name = match.group(1)
+        for slug, aliases in all_districts.items():
+            for alias in aliases:
+                if district_name.lower() in alias.lower() or alias.lower().startswith(district_name.lower()):
+                    return slug
+    match = re.search(r'(\w+(?:ий|ый|ой))\s*(?:район|р-н)?', address_text)
+    if match:
+        district_adj = match.group(1)
+        for slug, aliases in all_districts.items():
+            for alias in aliases:
+                if district_adj.lower() in alias.lower():
+                    return slug
+    return None
+
+
+ALMATY = {
+    'alatauskij': ('Алатауский р-н', 'almaty-alatauskij'), 'almalinskij': ('Алмалинский р-н', 'almaty-almalinskij'),
+    'aujezovskij': ('Ауэзовский р-н', 'almaty-aujezovskij'), 'bostandykskij': ('Бостандыкский р-н', 'almaty-bostandykskij'),
+    'zhetysuskij': ('Жетысуский р-н', 'almaty-zhetysuskij'), 'medeuskij': ('Медеуский р-н', 'almaty-medeuskij'),
+    'nauryzbajskij': ('Наурызбайский р-н', 'almaty-nauryzbajskiy'), 'turksibskij': ('Турксибский р-н', 'almaty-turksibskij'),
+}
+ASTANA = {
+    'almatinskij': ('Алматинский р-н', 'astana-almatinskij'), 'esilskij': ('Есильский р-н', 'astana-esilskij'),
+    'nura': ('Нура р-н', 'astana-nura'), 'saryarkinskij': ('Сарыаркинский р-н', 'astana-saryarkinskij'),
+    'bajkonur': ('Байконурский р-н', 'r-n-bajkonur'), 'saraishyk': ('Сарайшык р-н', 'astana-saraishyk'),
+}
+ALIASES = {
+    'alatauskij': ['алатау'], 'almalinskij': ['алмалин'], 'aujezovskij': ['ауэзов'], 'bostandykskij': ['бостандык', 'бостандыкс'],
+    'zhetysuskij': ['жетысу'], 'medeuskij': ['медеу'], 'nauryzbajskij': ['наурызбай'], 'turksibskij': ['турксиб'],
+    'almatinskij': ['алматы'], 'esilskij': ['есиль', 'есил', 'есильск'], 'nura': ['нура'],
+    'saryarkinskij': ['сарыарк', 'сарыарка'], 'bajkonur': ['байконыр', 'байконур'], 'saraishyk': ['сарайшык'],
+}
+
+
+def old_matches_district(parsed_district, target_district, all_districts):
+    if not parsed_district:
+        return False
+    info = all_districts.get(target_district)
+    target_name = info[0].lower() if info else ''
+    parsed_lower = parsed_district.lower()
+    if target_name and target_name in parsed_lower:
+        return True
+    if parsed_lower in target_name:
+        return True
+    return any(alias in parsed_lower for alias in ALIASES.get(target_district, []))
+
+# входы: адреса корпуса + адреса и названия районов в разных форматах, регистрах и обрезках
+EXTRA_WORDS = ['Сарайшык', 'Сарайшыкский', 'Есиль', 'Есил', 'Байконыр', 'Алатау', 'Медеу', 'Нуринский', 'Жетысу', 'Ёлочный',
+               'Каменский', 'Центральный', 'Новый', 'Золотой', 'Сарыарка', 'Алматинский', 'Әуезов', 'Жетісу', 'Қазыбек', 'Алмалы']
+STREETS = ['ул. Розыбакиева 99', 'пр. Абая 10', 'мкр Самал-2', 'ул. Сыганак', 'мкр. Орбита-1 12', 'пр. Кабанбай батыра 5', '']
+CITY_NAMES = ['Алматы', 'Астана', '']
+FORMATS = ['{city}, {w} р-н, {street}', '{w} р-н, {street}', '{city}, р-н {w}, {street}', 'р-н {w}', '{city}, {w} район, {street}',
+           '{city}, {w}, {street}', '{w}', '{street}, {w} р-н', '{city} {w}']
+CITIES = {'almaty': ALMATY, 'astana': ASTANA}
+
+
+def rows(items):
+    return ',\n'.join('    ' + json.dumps(item, ensure_ascii=False) for item in items)
+
+
+def main():
+    import krisha_extract
+    import krisha_parser
+
+    random.seed(11)
+    names = sorted({a for v in PHONE_DISTRICTS.values() for a in v} | {n for n, _ in {**ALMATY, **ASTANA}.values()})
+    words = sorted({w for n in names for w in n.split() if w not in ('р-н', 'район')})
+    pool = words + EXTRA_WORDS
+
+    addresses = json.load(open(ROOT_DIR / 'bench_corpus' / 'texts.json', encoding='utf-8'))['addresses']
+    for w in pool:
+        for fmt in FORMATS:
+            addresses.append(fmt.format(city=random.choice(CITY_NAMES), w=w, street=random.choice(STREETS)))
+    for _ in range(600):
+        w = random.choice(pool)
+        w = random.choice([w, w.lower(), w.upper(), w[:random.randint(3, max(3, len(w)))]])
+        addresses.append(random.choice(FORMATS).format(city=random.choice(CITY_NAMES), w=w, street=random.choice(STREETS)))
+    addresses = list(dict.fromkeys(a.strip(', ') for a in addresses))
+
+    parsed = sorted(set(names + words + EXTRA_WORDS + [w.lower() for w in pool]
+                        + [w[:random.randint(2, len(w))] for w in pool for _ in range(2)]
+                        + [f'{w} р-н' for w in pool] + [f'р-н {w}' for w in pool]))
+
+    address_slugs = [[a, old_extract_district_clean(a)] for a in addresses]
+    district_matches = [[p, city_key, [key for key in city if old_matches_district(p, key, city)]]
+                        for city_key, city in CITIES.items() for p in parsed]
+
+    def new_keys(p, city_key):
+        return [key for key in CITIES[city_key] if key in krisha_parser.DISTRICT_MATCHER.match(p)]
+
+    slug_diffs = [[a, s, krisha_extract.district_slug(a)] for a, s in address_slugs if krisha_extract.district_slug(a) != s]
+    match_diffs = [[p, c, m, new_keys(p, c)] for p, c, m in district_matches if new_keys(p, c) != m]
+
+    text = ('{\n'
+            '  "address_slugs": [\n' + rows(address_slugs) + '\n  ],\n'
+            '  "district_matches": [\n' + rows(district_matches) + '\n  ],\n'
+            '  "folding_differences": {\n'
+            '    "address_slugs": [\n' + rows(slug_diffs) + '\n    ],\n'
+            '    "district_matches": [\n' + rows(match_diffs) + '\n    ]\n'
+            '  }\n}\n')
+    Path(__file__).with_name('districts_legacy.json').write_text(text, encoding='utf-8')
+    print(f"адресов {len(address_slugs)}, названий {len(district_matches)}, "
+          f"отличий из-за свёртки {len(slug_diffs)} + {len(match_diffs)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import csv
+import os
+
+import pytest
+
+import krisha_store
+from krisha_store import Checkpoint
+
+
+# Checkpoint подменяется атомарно; чекпоинт краулера ждёт, пока пачка строк окажется в CSV
+
+STATE = {'city': 'almaty', 'district': 'medeuskij', 'page': 3, 'index': 2, 'pending': [681000001]}
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / 'checkpoint.json')
+    checkpoint = Checkpoint(path)
+    assert checkpoint.load() is None
+    checkpoint.save(**STATE)
+    state = Checkpoint(path).load()
+    assert state.pop('updated_at')
+    assert state == STATE
+    assert os.listdir(tmp_path) == ['checkpoint.json']  # временный файл не остаётся
+    checkpoint.clear()
+    assert checkpoint.load() is None
+    checkpoint.clear()
+
+
+def test_failed_save_keeps_previous_checkpoint(tmp_path, monkeypatch):
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.json'))
+    checkpoint.save(**STATE)
+
+    def replace(src, dst):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(krisha_store.os, 'replace', replace)
+    with pytest.raises(OSError):
+        checkpoint.save(**dict(STATE, page=4))
+    assert checkpoint.load()['page'] == 3
+
+
+@pytest.fixture
+def sink(tmp_path, monkeypatch):
+    krisha_parser = pytest.importorskip('krisha_parser')
+    monkeypatch.setattr(krisha_parser, 'SAVE_EVERY', 3)
+    monkeypatch.setattr(krisha_parser, 'OUTPUT_FORMATS', ['csv'])
+    monkeypatch.setattr(krisha_parser, 'parquet_sink', None)
+    monkeypatch.setattr(krisha_parser, 'listing_sinks', [])
+    monkeypatch.setattr(krisha_parser, 'jsonl_writers', {})
+    csv_file = str(tmp_path / 'listings.csv')
+    sink = krisha_parser.ListingSink(csv_file, str(tmp_path / 'listings.jsonl'))
+    yield krisha_parser, sink, csv_file
+    if sink in krisha_parser.listing_sinks:
+        sink.close()
+
+
+def _csv_rows(csv_file: str) -> int:
+    if not os.path.isfile(csv_file):
+        return 0
+    with open(csv_file, encoding='utf-8-sig', newline='') as f:
+        return sum(1 for _ in csv.reader(f)) - 1
+
+
+def _listing(krisha_parser, listing_id: int):
+    return krisha_parser.Listing(id=listing_id, url=f'https://krisha.kz/a/show/{listing_id}')
+
+
+def test_after_output_waits_for_batch_flush(sink):
+    krisha_parser, sink, csv_file = sink
+    on_disk = []
+    for listing_id in (681000001, 681000002):
+        sink.write(_listing(krisha_parser, listing_id))
+    krisha_parser.after_output(lambda: on_disk.append(_csv_rows(csv_file)))
+    sink.write(_listing(krisha_parser, 681000003))  # третья строка - сброс пачки
+    krisha_parser.after_output(lambda: on_disk.append(_csv_rows(csv_file)))
+    sink.close()
+    # первое действие - после сброса пачки, а не досрочным сбросом двух строк; второе - сразу
+    assert on_disk == [3, 3]
+
+
+def test_close_runs_waiting_actions_after_last_batch(sink):
+    krisha_parser, sink, csv_file = sink
+    on_disk = []
+    sink.write(_listing(krisha_parser, 681000001))
+    krisha_parser.after_output(lambda: on_disk.append(_csv_rows(csv_file)))
+    sink.close()
+    assert on_disk == [1]
+    assert krisha_parser.listing_sinks == []
+
+
+def test_after_output_without_sink_runs_at_once(sink):
+    krisha_parser, sink, csv_file = sink
+    sink.close()
+    on_disk = []
+    krisha_parser.after_output(lambda: on_disk.append(_csv_rows(csv_file)))
+    assert on_disk == [0]
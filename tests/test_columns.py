@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+import krisha_columns
+from krisha_extract import parse_title, parse_price, extract_district_clean, extract_microdistrict
+
+
+# пакетные разборщики krisha_columns совпадают с построчными krisha_extract;
+# целое вне диапазона колонки даёт null, остальные строки пачки не страдают
+
+TEXTS = json.loads((Path(__file__).resolve().parent.parent / 'bench_corpus' / 'texts.json').read_text(encoding='utf-8'))
+
+TITLES = [
+    '3-комнатная квартира · 107 м² · 4/10 этаж',
+    '1-комнатная квартира · 38,5 м² · 2 из 5 эт',
+    '2 комнатная квартира · 64.2м² · 9/13 этаж',
+    'Студия · 25 м²',
+    '٣-комнатная квартира · 40 м² · 1/5 этаж',  # арабско-индийские цифры: построчный путь
+    '',
+    None,
+]
+
+PRICES = ['54 999 000〒', '112 254 000 〒', 'договорная', '', None, '٥٠٠٠٠ 〒']
+
+OVERFLOW_PRICE = '12345678901234567890 〒'  # 20 цифр: не помещается в int64
+
+
+def test_title_batch_matches_scalar():
+    table = krisha_columns.parse_title_batch(pa.array(TITLES, type=pa.string()))
+    for i, title in enumerate(TITLES):
+        expected = parse_title(title) if title else {}
+        for name in krisha_columns.TITLE_TYPES:
+            assert table.column(name)[i].as_py() == expected.get(name), (title, name)
+
+
+def test_price_batch_matches_scalar():
+    result = krisha_columns.parse_price_batch(pa.array(PRICES, type=pa.string()))
+    assert result.to_pylist() == [parse_price(price) if price else None for price in PRICES]
+
+
+def test_district_batches_match_scalar():
+    addresses = TEXTS['addresses'] + [None]
+    districts = krisha_columns.extract_district_clean_batch(pa.array(addresses, type=pa.string()))
+    micro = krisha_columns.extract_microdistrict_batch(pa.array(addresses, type=pa.string()))
+    for i, address in enumerate(addresses):
+        assert districts[i].as_py() == (extract_district_clean(address) if address else None), address
+        assert micro[i].as_py() == (extract_microdistrict(address) if address else None), address
+
+
+def test_out_of_range_number_is_null():
+    prices = krisha_columns.parse_price_batch(pa.array([OVERFLOW_PRICE, '5 000 〒'], type=pa.string()))
+    assert prices.to_pylist() == [None, 5000]
+    # построчный путь (не-ASCII цифры в колонке) ведёт себя так же
+    prices = krisha_columns.parse_price_batch(pa.array([OVERFLOW_PRICE, '٥ 〒'], type=pa.string()))
+    assert prices.to_pylist() == [None, 5]
+
+    titles = krisha_columns.parse_title_batch(pa.array(['99999999999-комнатная квартира · 50 м² · 3/9 этаж']))
+    assert titles.column('rooms').to_pylist() == [None]
+    assert titles.column('area_total').to_pylist() == [50.0]
+
+
+def test_pandas_input_gives_nullable_columns():
+    pd = pytest.importorskip('pandas')
+    prices = pd.Series([OVERFLOW_PRICE, '54 999 000〒', None], name='price_raw')
+    result = krisha_columns.parse_price_batch(prices)
+    assert str(result.dtype) == 'Int64' and result.name == 'price_raw'
+    assert result.isna().tolist() == [True, False, True]
+    assert result[1] == 54999000
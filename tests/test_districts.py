@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from krisha_districts import FOLD, DistrictResolver, normalize
+from krisha_extract import DISTRICT_RESOLVER, SLUG_ALIASES
+
+
+# сопоставление районов против замороженных выводов реализации до krisha_districts
+# (fixtures/gen_districts_legacy.py): слаги и совпадения должны остаться прежними,
+# кроме явно перечисленных в folding_differences - там свёртка ё и казахских букв
+# находит район, который старый код не видел ("Сарайшык" против алиаса "Сарайшық")
+
+LEGACY = json.loads((Path(__file__).parent / 'fixtures' / 'districts_legacy.json').read_text(encoding='utf-8'))
+FOLDED_SLUGS = {address: (old, new) for address, old, new in LEGACY['folding_differences']['address_slugs']}
+FOLDED_MATCHES = {(parsed, city): (old, new) for parsed, city, old, new in LEGACY['folding_differences']['district_matches']}
+
+FOLDED_CHARS = set(FOLD)  # коды ё и казахских букв
+
+
+def _has_folded(text: str) -> bool:
+    return any(ord(c) in FOLDED_CHARS for c in text.lower())
+
+
+@pytest.fixture(scope='module')
+def district_matcher():
+    krisha_parser = pytest.importorskip('krisha_parser')
+    return krisha_parser.DISTRICT_MATCHER, {'almaty': krisha_parser.ALMATY_DISTRICTS, 'astana': krisha_parser.ASTANA_DISTRICTS}
+
+
+def test_address_slugs_match_legacy():
+    for address, slug in LEGACY['address_slugs']:
+        old, expected = FOLDED_SLUGS.get(address, (slug, slug))
+        assert old == slug
+        assert DISTRICT_RESOLVER.resolve(address) == expected, address
+
+
+def test_district_matches_match_legacy(district_matcher):
+    matcher, cities = district_matcher
+    for parsed, city, keys in LEGACY['district_matches']:
+        old, expected = FOLDED_MATCHES.get((parsed, city), (keys, keys))
+        assert old == keys
+        found = [key for key in cities[city] if key in matcher.match(parsed)]
+        assert found == expected, (parsed, city)
+
+
+def test_folding_differences_are_folding():
+    """каждое отличие от старого кода объясняется свёрткой: в адресе или алиасе найденного района есть ё/казахская буква"""
+    assert FOLDED_SLUGS or FOLDED_MATCHES
+    for address, (_, slug) in FOLDED_SLUGS.items():
+        assert _has_folded(address) or any(_has_folded(alias) for alias in SLUG_ALIASES[slug]), address
+    for (parsed, _), (old, new) in FOLDED_MATCHES.items():
+        assert set(old) < set(new)
+        assert _has_folded(parsed), parsed
+
+
+def test_resolver_lookups_match_scan():
+    """containing / contained_in - то же, что перебор алиасов с подстроками после normalize"""
+    resolver = DistrictResolver(SLUG_ALIASES)
+    aliases = [[normalize(alias) for alias in values] for values in SLUG_ALIASES.values()]
+    tokens = {alias for values in SLUG_ALIASES.values() for alias in values}
+    tokens |= {token[:n] for token in list(tokens) for n in range(1, len(token))}
+    tokens |= {'р-н Сарайшык', 'Есильский р-н', 'ЁЛКА', 'Жетісу', 'мкр Алатау', 'ул. Абая'}
+    for token in sorted(tokens):
+        folded = normalize(token)
+        assert resolver.containing(token) == tuple(i for i, values in enumerate(aliases) if any(folded in a for a in values)), token
+        assert resolver.contained_in(token) == tuple(i for i, values in enumerate(aliases) if any(a in folded for a in values)), token
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from krisha_embedded import advert_fields
+
+
+# текстовые поля window.data: объект или число на месте строки не попадает в запись строкой
+
+TEXT_FIELDS = ['title', 'city', 'district', 'address', 'building_type', 'complex_name']
+
+NESTED = {'id': 7, 'name': 'Медеуский'}
+
+
+def _state(advert):
+    return {'advert': advert}
+
+
+def _nested_advert():
+    return {
+        'title': {'ru': '2-комнатная квартира'},
+        'price': 54999000,
+        'rooms': 2,
+        'address': {'city': NESTED, 'district': ['Медеуский']},
+        'addressTitle': 12345,
+        'building': {'year': 2015, 'type': NESTED, 'complex': {'id': 1}},
+    }
+
+
+def test_nested_objects_in_text_fields_are_dropped():
+    fields = advert_fields(_state(_nested_advert()))
+    assert not set(TEXT_FIELDS) & set(fields)
+    # числовые поля того же состояния разбираются как обычно
+    assert fields == {'price_kzt': 54999000, 'rooms': 2, 'year_built': 2015}
+
+
+def test_text_fields_are_stripped_strings():
+    advert = {
+        'title': ' 2-комнатная квартира ',
+        'address': {'city': 'Алматы', 'district': 'Медеуский р-н'},
+        'addressTitle': 'Алматы, Медеуский р-н, Достык 5',
+        'building': {'type': 'Монолитный', 'complex': ' Нурлы Тау '},
+    }
+    assert advert_fields(_state(advert)) == {
+        'title': '2-комнатная квартира',
+        'city': 'Алматы',
+        'district': 'Медеуский р-н',
+        'address': 'Алматы, Медеуский р-н, Достык 5',
+        'building_type': 'монолитный',
+        'complex_name': 'Нурлы Тау',
+    }
+
+
+def test_nested_state_does_not_reach_listing():
+    pytest.importorskip('bs4')
+    from krisha_extract import extract_listing
+
+    html = (
+        '<html><body><h1>2-комнатная квартира · 54 м² · 3/9 этаж</h1>'
+        f'<script id="jsdata">window.data = {json.dumps(_state(_nested_advert()), ensure_ascii=False)};</script>'
+        '</body></html>'
+    )
+    listing = extract_listing(html, 'https://krisha.kz/a/show/681234567', 'Алматы')
+    assert listing.price_kzt == 54999000
+    for name in ('city', 'district', 'address', 'building_type', 'complex_name'):
+        value = listing.get(name)
+        assert value is None or ('{' not in value and '[' not in value), (name, value)
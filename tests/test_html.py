@@ -0,0 +1,20 @@
+from pathlib import Path
+
+import pytest
+
+import krisha_html
+
+
+# страницы объявлений и поиска из bench_corpus разбираются одинаково всеми установленными бэкендами,
+# а разбор поиска по дереву совпадает со сканером krisha_search
+
+CORPUS = Path(__file__).resolve().parent.parent / 'bench_corpus'
+
+
+def test_backends_agree_on_corpus():
+    pytest.importorskip('bs4')
+    assert krisha_html.compare_backends(str(CORPUS))
+
+
+def test_corpus_has_search_pages():
+    assert sorted(CORPUS.glob('search_*.html'))
@@ -0,0 +1,109 @@
+import io
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+import krisha_http
+from krisha_http import Fetcher, retry_after
+
+
+# Fetcher: условные заголовки, 304, повторы временных ошибок с Retry-After / backoff
+
+
+def _response(status: int, **headers) -> 'requests.Response':
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response.url = 'https://krisha.kz/a/show/1'
+    response.raw = io.BytesIO(b'')  # повтор закрывает ответ
+    return response
+
+
+class Session:
+    """отдаёт заготовленные ответы (или бросает исключения) по очереди и запоминает заголовки"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.headers = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.headers.append(headers)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(krisha_http.time, 'sleep', waits.append)
+    return waits
+
+
+def test_conditional_request_returns_304(sleeps):
+    session = Session(_response(304))
+    fetcher = Fetcher(session)
+    response = fetcher.get('https://krisha.kz/a/show/1', validators={'etag': '"abc"', 'last_modified': 'Wed, 01 Oct 2026 10:00:00 GMT'})
+    assert response.status_code == 304
+    assert session.headers[0]['If-None-Match'] == '"abc"'
+    assert session.headers[0]['If-Modified-Since'] == 'Wed, 01 Oct 2026 10:00:00 GMT'
+    assert fetcher.stats == {'not_modified': 1}
+    assert sleeps == []
+
+
+def test_no_conditional_headers_without_validators(sleeps):
+    session = Session(_response(200))
+    Fetcher(session).get('https://krisha.kz/a/show/1')
+    assert 'If-None-Match' not in session.headers[0] and 'If-Modified-Since' not in session.headers[0]
+    assert session.headers[0]['Accept-Encoding'] == krisha_http.ACCEPT_ENCODING
+
+
+def test_retry_after_is_honoured_then_succeeds(sleeps):
+    session = Session(_response(503, **{'Retry-After': '7'}), _response(429), _response(200))
+    fetcher = Fetcher(session, attempts=4, backoff=2, backoff_max=3)
+    assert fetcher.get('https://krisha.kz/a/show/1').status_code == 200
+    assert sleeps[0] == 7
+    assert 0 <= sleeps[1] <= 3  # без Retry-After - backoff, не больше backoff_max
+    assert fetcher.stats == {'retry': 2, 'ok': 1}
+
+
+def test_retry_after_is_capped_by_max_wait(sleeps):
+    session = Session(_response(503, **{'Retry-After': '3600'}), _response(200))
+    Fetcher(session, max_wait=60).get('https://krisha.kz/a/show/1')
+    assert sleeps == [60]
+
+
+def test_connection_errors_exhaust_attempts(sleeps):
+    error = requests.exceptions.ConnectionError('reset')
+    fetcher = Fetcher(Session(error, error, error), attempts=3, backoff=1, backoff_max=1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        fetcher.get('https://krisha.kz/a/show/1')
+    assert len(sleeps) == 2
+    assert fetcher.stats == {'retry': 2, 'failed': 1}
+
+
+def test_permanent_error_is_not_retried(sleeps):
+    fetcher = Fetcher(Session(_response(404), _response(200)))
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetcher.get('https://krisha.kz/a/show/1')
+    assert sleeps == []
+
+
+def test_retry_after_formats():
+    assert retry_after('120') == 120.0
+    assert retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0  # дата в прошлом
+    assert retry_after('soon') is None
+    assert retry_after(None) is None
+
+
+def test_parser_fetcher_uses_current_retry_settings(monkeypatch):
+    krisha_parser = pytest.importorskip('krisha_parser')
+    monkeypatch.setattr(krisha_parser, 'fetcher', None)
+    monkeypatch.setattr(krisha_parser, 'RETRY_ATTEMPTS', 2)
+    monkeypatch.setattr(krisha_parser, 'RETRY_BACKOFF', 0.5)
+    fetcher = krisha_parser.get_fetcher()
+    assert (fetcher.attempts, fetcher.backoff) == (2, 0.5)
+    assert fetcher.session is krisha_parser.session
+    assert krisha_parser.get_fetcher() is fetcher
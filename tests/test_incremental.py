@@ -0,0 +1,61 @@
+import pytest
+
+krisha_parser = pytest.importorskip('krisha_parser')
+
+from krisha_search import scan_search_page
+from krisha_store import SeenIndex
+
+
+# --incremental: страница считается известной, только если все её ID уже собраны
+# или отсеяны как чужие на прошлых страницах; впервые встреченная чужая карточка - новая
+
+KNOWN = [681000001, 681000002]
+FOREIGN = 681000003
+PRICE = 30000000
+
+
+def _card(listing_id: int, address: str) -> str:
+    return (
+        f'<div class="a-card" data-id="{listing_id}">'
+        f'<a class="a-card__title" href="/a/show/{listing_id}">2-комнатная квартира · 50 м² · 3/9 этаж</a>'
+        f'<div class="a-card__price">{PRICE} 〒</div>'
+        f'<div class="a-card__subtitle">{address}</div></div>'
+    )
+
+
+SEARCH_PAGE = (
+    ''.join(_card(i, 'Медеуский р-н, Достык 5') for i in KNOWN)
+    + _card(FOREIGN, 'Бостандыкский р-н, Тимирязева 1')
+    + '<a class="paginator__btn paginator__btn--next" href="?page=2">Дальше</a>'
+)
+
+
+@pytest.fixture
+def crawl(tmp_path, monkeypatch):
+    seen = SeenIndex(str(tmp_path / 'seen.sqlite'))
+    for listing_id in KNOWN:
+        seen.mark(listing_id, PRICE)
+    pages = []
+
+    def fetch_search_page(url):
+        pages.append(url)
+        return scan_search_page(SEARCH_PAGE)
+
+    monkeypatch.setattr(krisha_parser, 'seen_index', seen)
+    monkeypatch.setattr(krisha_parser, 'checkpoint', None)
+    monkeypatch.setattr(krisha_parser, 'wrong_district_ids', set())
+    monkeypatch.setattr(krisha_parser, 'fetch_search_page', fetch_search_page)
+    monkeypatch.setattr(krisha_parser, 'random_delay', lambda *args: None)
+    monkeypatch.setattr(krisha_parser, 'METRICS_TEXTFILE', None)
+    monkeypatch.setattr(krisha_parser, 'RUN_SUMMARY_PATH', None)
+    monkeypatch.setattr(krisha_parser, 'MAX_PAGES', 5)
+    monkeypatch.setattr(krisha_parser, 'INCREMENTAL_PAGES', 1)
+    yield pages
+    seen.close()
+
+
+def test_first_seen_foreign_card_is_not_known(crawl):
+    assert list(krisha_parser.iter_listings('almaty', 'medeuskij')) == []
+    # страница 1: чужая карточка встречена впервые - страница не известная;
+    # страница 2: та же карточка уже отсеяна раньше - известная, обход района закончен
+    assert len(crawl) == 2
@@ -0,0 +1,150 @@
+import pytest
+
+from krisha_io import (
+    RowBuffer, ParquetSink, JsonlWriter, CsvWriter, Listing, PhoneListing,
+    schema_fields, read_archive, LISTING_SCHEMA,
+)
+
+
+# RowBuffer копит строки по колонкам в порядке схемы: словари, записи той же и другой схемы
+
+FIELDS = ['id', 'city', 'price_kzt']
+
+
+def test_row_buffer_keeps_schema_order():
+    buffer = RowBuffer(FIELDS)
+    buffer.append({'price_kzt': 54999000, 'id': 681000001, 'extra': 'x'})
+    buffer.extend([{'id': 681000002, 'city': 'Алматы'}])
+    buffer.append(Listing(id=681000003, city='Астана', price_kzt=30000000, rooms=2))
+    assert len(buffer) == 3
+    assert list(buffer.rows()) == [
+        (681000001, None, 54999000),
+        (681000002, 'Алматы', None),
+        (681000003, 'Астана', 30000000),
+    ]
+    assert buffer.column('city') == [None, 'Алматы', 'Астана']
+
+
+def test_row_buffer_record_rows():
+    buffer = RowBuffer(schema_fields(LISTING_SCHEMA))
+    listing = Listing(id=681000001, url='https://krisha.kz/a/show/681000001', scraped_at='2026-10-01T10:00:00+05:00')
+    buffer.append(listing)
+    buffer.append(PhoneListing.extend(listing, phones='+77010000000'))  # подкласс: только поля схемы буфера
+    rows = list(buffer.rows())
+    assert rows == [listing.row(), listing.row()]
+    assert rows[0][buffer.fields.index('scraped_at')] == '2026-10-01T10:00:00+05:00'
+
+
+def test_row_buffer_frame_and_clear():
+    pytest.importorskip('pandas')
+    buffer = RowBuffer(FIELDS)
+    buffer.append({'id': 681000001, 'city': 'Алматы'})
+    frame = buffer.to_frame()
+    assert list(frame.columns) == FIELDS and len(frame) == 1
+    buffer.clear()
+    assert len(buffer) == 0 and list(buffer.rows()) == []
+    assert list(buffer.to_frame().columns) == FIELDS
+
+
+# ParquetSink: строки раскладываются по city=/district=/date=, пустое значение - в партицию по умолчанию
+
+ROWS = [
+    {'id': 681000001, 'city': 'Алматы', 'district': 'Медеуский р-н', 'scraped_at': '2026-10-01T23:30:00+05:00', 'price_kzt': 54999000},
+    {'id': 681000002, 'city': 'Алматы', 'district': 'Медеуский р-н', 'scraped_at': '2026-10-02T09:00:00+05:00', 'price_kzt': '30000000'},
+    {'id': '681000003', 'city': 'Астана', 'district': None, 'scraped_at': '2026-10-01T12:00:00+05:00'},
+]
+
+
+def _partitions(root) -> dict:
+    return {
+        str(path.parent.relative_to(root)): path
+        for path in root.rglob('*.parquet')
+    }
+
+
+def test_parquet_sink_partitions(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    sink = ParquetSink(str(tmp_path), LISTING_SCHEMA, 'scraped_at')
+    buffer = RowBuffer(schema_fields(LISTING_SCHEMA))
+    buffer.extend(ROWS)
+    assert sink.write(buffer) == 3
+    assert len(buffer) == 3  # буфер очищает вызывающий
+
+    partitions = _partitions(tmp_path)
+    assert sorted(partitions) == [
+        'city=Алматы/district=Медеуский р-н/date=2026-10-01',
+        'city=Алматы/district=Медеуский р-н/date=2026-10-02',
+        f'city=Астана/district={ParquetSink.NULL_PARTITION}/date=2026-10-01',
+    ]
+    table = pq.read_table(partitions['city=Алматы/district=Медеуский р-н/date=2026-10-02'])
+    # колонки партиций в файл не пишутся, значения приводятся к типам схемы
+    assert 'city' not in table.column_names and 'district' not in table.column_names
+    assert table.column('id').to_pylist() == [681000002]
+    assert table.column('price_kzt').to_pylist() == [30000000]
+
+    # второй сброс в ту же партицию - новый файл рядом
+    assert sink.write(buffer) == 3
+    assert len(list(tmp_path.rglob('*.parquet'))) == 6
+
+
+def test_parquet_dataset_reads_back(tmp_path):
+    ds = pytest.importorskip('pyarrow.dataset')
+    sink = ParquetSink(str(tmp_path), LISTING_SCHEMA, 'scraped_at')
+    buffer = RowBuffer(schema_fields(LISTING_SCHEMA))
+    buffer.extend(ROWS)
+    sink.write(buffer)
+    table = ds.dataset(str(tmp_path), format='parquet', partitioning='hive').to_table()
+    rows = {row['id']: row for row in table.to_pylist()}
+    assert sorted(rows) == [681000001, 681000002, 681000003]
+    assert rows[681000003]['city'] == 'Астана' and rows[681000003]['district'] is None
+
+
+# BufferedWriter: строки в файле только после сброса; сжатый JSONL из нескольких фреймов читается целиком
+
+RECORDS = [{'id': 681000000 + i, 'title': f'{i}-комнатная квартира'} for i in range(1, 6)]
+
+
+def test_jsonl_zstd_round_trip(tmp_path):
+    pytest.importorskip('zstandard')
+    writer = JsonlWriter(str(tmp_path / 'listings.jsonl'), compress=True)
+    assert writer.filepath.endswith('.jsonl.zst')
+    for record in RECORDS[:2]:
+        writer.write(record)
+    writer.flush(sync=True)
+    writer.write(Listing(id=RECORDS[2]['id']))
+    writer.close()
+
+    # дописывание после перезапуска - ещё один фрейм
+    with JsonlWriter(str(tmp_path / 'listings.jsonl'), compress=True) as writer:
+        for record in RECORDS[3:]:
+            writer.write(record)
+    records = list(read_archive(writer.filepath))
+    assert [record['id'] for record in records] == [record['id'] for record in RECORDS]
+    assert records[0] == RECORDS[0]
+
+
+def test_buffered_writer_flushes_by_size(tmp_path):
+    path = tmp_path / 'listings.jsonl'
+    writer = JsonlWriter(str(path), flush_bytes=200, flush_seconds=3600)
+    writer.write(RECORDS[0])
+    assert not path.exists()  # ещё в буфере
+    for record in RECORDS[1:]:
+        writer.write(record)
+    assert 0 < len(list(read_archive(str(path)))) < len(RECORDS)
+    writer.close()
+    assert list(read_archive(str(path))) == RECORDS
+
+
+def test_csv_writer_header_once_and_rotation(tmp_path):
+    path = tmp_path / 'listings.csv'
+    for record in RECORDS[:2]:
+        with CsvWriter(str(path), FIELDS) as writer:
+            writer.write(record)
+    assert path.read_text(encoding='utf-8').splitlines()[0] == ','.join(FIELDS)
+    assert [row['id'] for row in read_archive(str(path))] == ['681000001', '681000002']
+
+    # колонки изменились - старый файл откладывается, новый с новым заголовком
+    with CsvWriter(str(path), FIELDS + ['rooms']) as writer:
+        writer.write(RECORDS[2])
+    assert [row['id'] for row in read_archive(str(path))] == ['681000003']
+    assert len(list(tmp_path.glob('listings.*.csv'))) == 1
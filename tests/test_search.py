@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from krisha_search import OVERLAP, SearchScanner, scan_search_page
+
+
+# разбор страницы поиска по кускам (iter_content) не зависит от того, где куски разрезаны
+
+CORPUS = Path(__file__).resolve().parent.parent / 'bench_corpus'
+SEARCH_PAGES = sorted(CORPUS.glob('search_*.html'))
+
+CARD = (
+    '<div class="a-card a-storage-live" data-id="681000001">'
+    '<a class="a-card__title" href="/a/show/681000001">2-комнатная квартира · 50 м² · 3/9 этаж</a>'
+    '<div class="a-card__price">30 000 000 <span>〒</span></div>'
+    '<div class="a-card__subtitle">Медеуский р-н, Достык 5</div></div>'
+)
+NEXT = '<a class="paginator__btn paginator__btn--next" href="?page=4">Дальше</a>'
+
+
+def _chunks(raw: bytes, size: int):
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+def _result(scanner: SearchScanner) -> tuple:
+    return scanner.ids, scanner.card_records(), scanner.has_next, scanner.next_page
+
+
+@pytest.mark.parametrize('size', [1, 3, 64, OVERLAP - 1, OVERLAP, OVERLAP + 1])
+def test_card_split_anywhere(size):
+    # отступ больше OVERLAP: карточка попадает на границу между сохранённым хвостом и новым куском
+    raw = ('<p>' + ' ' * (OVERLAP + 17) + '</p>' + CARD + NEXT).encode('utf-8')
+    assert _result(scan_search_page(_chunks(raw, size))) == _result(scan_search_page(raw))
+    assert scan_search_page(raw).card_records() == [{
+        'id': 681000001,
+        'title_raw': '2-комнатная квартира · 50 м² · 3/9 этаж',
+        'price_kzt': 30000000,
+        'address': 'Медеуский р-н, Достык 5',
+    }]
+
+
+@pytest.mark.parametrize('page', SEARCH_PAGES, ids=lambda path: path.stem)
+@pytest.mark.parametrize('size', [97, OVERLAP, 5000, 16384])
+def test_corpus_pages_in_chunks(page, size):
+    raw = page.read_bytes()
+    whole = scan_search_page(raw)
+    assert whole.ids
+    assert _result(scan_search_page(_chunks(raw, size))) == _result(whole)
+
+
+def test_disabled_next_button():
+    raw = CARD + '<a class="paginator__btn paginator__btn--next" disabled href="?page=4">Дальше</a>'
+    scanner = scan_search_page(raw)
+    assert scanner.ids == [681000001]
+    assert not scanner.has_next and scanner.next_page is None
@@ -0,0 +1,78 @@
+import os
+
+from krisha_store import PageStore, SeenIndex
+
+
+# PageStore: содержимое хранится один раз, последняя загрузка URL заменяет предыдущую целиком;
+# SeenIndex: собранные ID и цены переживают перезапуск
+
+FIRST = 'https://krisha.kz/a/show/681000001'
+SECOND = 'https://krisha.kz/a/show/681000002'
+
+
+def _blobs(store: PageStore) -> list:
+    return [name for _, _, names in os.walk(store.blobs_dir) for name in names]
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = PageStore(str(tmp_path))
+    digest = store.put(FIRST, '<html>1</html>')
+    assert store.put(SECOND, '<html>1</html>') == digest
+    assert len(_blobs(store)) == 1
+    assert [entry['id'] for entry in store.entries()] == ['681000001', '681000002']
+
+
+def test_latest_listing_replaces_earlier_entry(tmp_path):
+    store = PageStore(str(tmp_path))
+    store.put(FIRST, '<html>old</html>', etag='"v1"')
+    store.put(SECOND, '<html>2</html>')
+    store.put(FIRST, '<html>new</html>')  # сервер больше не прислал etag
+
+    entries = list(store.latest_listings())
+    # порядок первого появления, у первого объявления - новая загрузка без старого etag
+    assert [entry['id'] for entry in entries] == ['681000001', '681000002']
+    assert 'etag' not in entries[0]
+    assert dict((entry['id'], html) for entry, html in store.iter_listing_pages()) == {
+        '681000001': '<html>new</html>',
+        '681000002': '<html>2</html>',
+    }
+
+
+def test_latest_follows_puts_after_index_is_read(tmp_path):
+    store = PageStore(str(tmp_path))
+    store.put(FIRST, '<html>old</html>', etag='"v1"')
+    assert store.latest(FIRST)['etag'] == '"v1"'
+    store.put(FIRST, '<html>new</html>', last_modified='Wed, 01 Oct 2026 10:00:00 GMT')
+    latest = store.latest(FIRST)
+    assert 'etag' not in latest and store.get(latest['sha256']) == '<html>new</html>'
+    # новый экземпляр читает тот же журнал
+    assert PageStore(str(tmp_path)).latest(FIRST) == latest
+    assert store.latest(SECOND) is None
+
+
+def test_seen_index_survives_reopen(tmp_path):
+    path = str(tmp_path / 'seen.sqlite')
+    seen = SeenIndex(path)
+    seen.mark(681000001, 30000000, '2026-10-01T10:00:00+05:00')
+    seen.mark('681000002')
+    seen.mark(None)
+    seen.close()
+
+    seen = SeenIndex(path)
+    try:
+        assert seen.count() == 2
+        assert seen.get('681000001') == ('2026-10-01T10:00:00+05:00', 30000000)
+        assert '681000002' in seen and 681000003 not in seen and None not in seen
+        assert seen.known(['681000001', 681000003, None]) == {681000001}
+        assert seen.known([]) == set()
+    finally:
+        seen.close()
+
+
+def test_seen_index_keeps_last_price(tmp_path):
+    seen = SeenIndex(str(tmp_path / 'seen.sqlite'))
+    seen.mark(681000001, 30000000, '2026-10-01T10:00:00+05:00')
+    seen.mark(681000001, 28500000, '2026-10-08T10:00:00+05:00')
+    assert seen.count() == 1
+    assert seen.get(681000001) == ('2026-10-08T10:00:00+05:00', 28500000)
+    seen.close()